@@ -10,8 +10,11 @@ develop a new k8s charm using the Operator Framework:
 https://discourse.charmhub.io/t/4208
 """
 
+import json
 import logging
+import math
 import os
+import time
 
 from charms.data_platform_libs.v0.data_models import TypedCharmBase
 from charms.grafana_k8s.v0.grafana_dashboard import GrafanaDashboardProvider
@@ -19,7 +22,7 @@ from charms.loki_k8s.v1.loki_push_api import LogForwarder
 from charms.nginx_ingress_integrator.v0.nginx_route import require_nginx_route
 from charms.prometheus_k8s.v0.prometheus_scrape import MetricsEndpointProvider
 from charms.redis_k8s.v0.redis import RedisRelationCharmEvents
-from ops import ModelError, SecretNotFoundError, pebble
+from ops import ModelError, SecretNotFoundError, StoredState, pebble
 from ops.charm import ConfigChangedEvent, PebbleReadyEvent
 from ops.main import main
 from ops.model import (
@@ -32,26 +35,51 @@ from ops.pebble import CheckStatus
 from pydantic import ValidationError
 
 from literals import (
+    ALLOWED_ROLES_KEY,
+    ALLOWED_ROLES_TTL,
     APP_NAME,
     APPLICATION_PORT,
     CONFIG_PATH,
     DB_RELATION_NAME,
+    DEFAULT_DB_CONCURRENCY,
     DEFAULT_ROLES,
+    GUNICORN_WORKER_CLASS,
+    GUNICORN_WORKER_CONNECTIONS,
     LOG_FILE,
+    MAX_POD_DB_CONNECTIONS,
+    PEER_RELATION_NAME,
+    PROFILE_TIMEOUT_GRACE,
     PROMETHEUS_METRICS_PORT,
     REDIS_RELATION_NAME,
+    SLO_OPTIONS,
     SQL_AB_ROLE,
+    STATSD_MAPPING_PATH,
     STATSD_PORT,
     SUPERSET_VERSION,
     TRINO_CATALOG_RELATION_NAME,
     UI_FUNCTIONS,
+    WORKER_STATSD_METRICS_PORT,
 )
 from log import log_event_handler
+from profiling import (
+    PROFILE_TARGETS,
+    build_record_command,
+    format_summary,
+    profile_output_path,
+    ptrace_denied,
+    summarize_profile,
+)
 from relations.postgresql import Database
 from relations.redis import Redis
 from relations.trino_catalog import TrinoCatalogRelationHandler
 from structured_config import CharmConfig
-from utils import load_superset_files, query_metadata_database
+from utils import (
+    MetadataDatabase,
+    load_statsd_mapping,
+    load_superset_files,
+    query_metadata_database,
+    write_alert_rules,
+)
 
 # Log messages can be retrieved using juju debug-log
 logger = logging.getLogger(__name__)
@@ -64,10 +92,12 @@ class SupersetK8SCharm(TypedCharmBase[CharmConfig]):
         external_hostname: DNS listing used for external connections.
         on: redis relation events from redis_k8s library
         config_type: the charm structured config
+        _stored: When the leader last read the Superset roles.
     """
 
     config_type = CharmConfig
     on = RedisRelationCharmEvents()
+    _stored = StoredState()
 
     @property
     def external_hostname(self):
@@ -82,9 +112,11 @@ class SupersetK8SCharm(TypedCharmBase[CharmConfig]):
         """
         super().__init__(*args)
         self.name = APP_NAME
+        self._stored.set_default(roles_fetched_at=0.0)
 
         # Handle postgresql relation
         self.database = Database(self)
+        self.metadata_db = MetadataDatabase()
 
         # Handle redis relation
         self.redis_handler = Redis(self)
@@ -99,11 +131,13 @@ class SupersetK8SCharm(TypedCharmBase[CharmConfig]):
         )
         self.framework.observe(self.on.config_changed, self._on_config_changed)
         self.framework.observe(self.on.restart_action, self._on_restart)
+        self.framework.observe(self.on.profile_action, self._on_profile)
         self.framework.observe(self.on.update_status, self._on_update_status)
         self.framework.observe(
             self.on.peer_relation_changed, self._on_peer_relation_changed
         )
         self.framework.observe(self.on.secret_changed, self._on_secret_changed)
+        self.framework.observe(self.framework.on.commit, self._on_commit)
 
         # Handle Ingress
         self._require_nginx_route()
@@ -117,19 +151,43 @@ class SupersetK8SCharm(TypedCharmBase[CharmConfig]):
         )
 
         # Prometheus
+        charm_function = self.model.config.get("charm-function")
+        metrics_targets = [f"*:{PROMETHEUS_METRICS_PORT}"]
+        if charm_function == "worker":
+            metrics_targets.append(f"*:{WORKER_STATSD_METRICS_PORT}")
         self._prometheus_scraping = MetricsEndpointProvider(
             self,
             relation_name="metrics-endpoint",
+            alert_rules_path=self._write_alert_rules(),
             jobs=[
                 {
                     "static_configs": [
-                        {"targets": [f"*:{PROMETHEUS_METRICS_PORT}"]}
+                        {
+                            "targets": metrics_targets,
+                            # Lets dashboards tell UI, worker and beat apart
+                            "labels": {"charm_function": charm_function},
+                        }
                     ]
                 }
             ],
             refresh_event=self.on.config_changed,
         )
 
+    def _write_alert_rules(self):
+        """Render the SLO alert rules with the configured thresholds.
+
+        Returns:
+            The directory holding the alert rules.
+        """
+        try:
+            thresholds = {
+                option: self.config[option] for option in SLO_OPTIONS
+            }
+        except ValidationError:
+            # Keep the previous rules until the configuration is fixed
+            thresholds = None
+        return write_alert_rules(thresholds)
+
     def _require_nginx_route(self):
         """Require nginx-route relation based on current configuration."""
         require_nginx_route(
@@ -214,7 +272,7 @@ class SupersetK8SCharm(TypedCharmBase[CharmConfig]):
 
         # Sync Trino catalog databases if the relation exists
         if self.model.get_relation(TRINO_CATALOG_RELATION_NAME):
-            self.trino_catalog_handler.sync_databases()
+            self.trino_catalog_handler.sync_databases(reconcile=True)
 
         self.unit.set_workload_version(f"v{SUPERSET_VERSION}")
         self.unit.status = ActiveStatus("Status check: UP")
@@ -240,15 +298,19 @@ class SupersetK8SCharm(TypedCharmBase[CharmConfig]):
     def _validate_self_registration_role(self, sqlalchemy_uri: str):
         """Determine allowed Superset roles.
 
+        Only UI units validate the role, since workers and beat never
+        register users.
+
         Args:
             sqlalchemy_uri (str): the SQL Alchemy URI.
 
         Raises:
             ValueError: in case role value is not allowed.
         """
-        sql = SQL_AB_ROLE
+        if self.config["charm-function"] not in UI_FUNCTIONS:
+            return
 
-        allowed_roles = query_metadata_database(sqlalchemy_uri, sql)
+        allowed_roles = self._get_allowed_roles(sqlalchemy_uri)
         if not allowed_roles:
             allowed_roles = DEFAULT_ROLES
         role = self.config["self-registration-role"]
@@ -262,6 +324,69 @@ class SupersetK8SCharm(TypedCharmBase[CharmConfig]):
                 f"The self-registration role {role} is not allowed. Use only {allowed_roles}."
             )
 
+    def _get_allowed_roles(self, sqlalchemy_uri: str):
+        """Get the Superset role names, cached in peer relation data.
+
+        The leader queries the metadata database when the cache has
+        expired or does not contain the configured role, and rewrites the
+        cache only when the roles changed, since every write makes each
+        unit handle peer-relation-changed. The time of the last query is
+        kept in the leader's local state. Other units use the cached list
+        whenever it contains the configured role, and only query the
+        database themselves until the leader has refreshed it.
+
+        Args:
+            sqlalchemy_uri (str): the SQL Alchemy URI.
+
+        Returns:
+            List of role names, empty if the query failed.
+        """
+        role = self.config["self-registration-role"]
+        peer_relation = self.model.get_relation(PEER_RELATION_NAME)
+        cached = self._get_cached_roles(peer_relation)
+        if cached and role in cached:
+            age = time.time() - self._stored.roles_fetched_at
+            if age < ALLOWED_ROLES_TTL or not self.unit.is_leader():
+                return cached
+
+        allowed_roles = query_metadata_database(
+            sqlalchemy_uri, SQL_AB_ROLE, self.metadata_db
+        )
+        if allowed_roles and peer_relation and self.unit.is_leader():
+            self._stored.roles_fetched_at = time.time()
+            if allowed_roles != cached:
+                peer_relation.data[self.app][ALLOWED_ROLES_KEY] = json.dumps(
+                    allowed_roles
+                )
+        return allowed_roles
+
+    def _get_cached_roles(self, peer_relation):
+        """Read the role names cached in peer relation data.
+
+        Args:
+            peer_relation: the peer relation, or None.
+
+        Returns:
+            List of role names, or None if not cached.
+        """
+        if peer_relation is None:
+            return None
+        try:
+            cached = json.loads(
+                peer_relation.data[self.app].get(ALLOWED_ROLES_KEY, "")
+            )
+        except ValueError:
+            return None
+        return cached if isinstance(cached, list) else None
+
+    def _on_commit(self, event):
+        """Close metadata database connections at the end of the dispatch.
+
+        Args:
+            event: The framework commit event.
+        """
+        self.metadata_db.dispose()
+
     def _restart_application(self, container):
         """Restart application.
 
@@ -329,6 +454,66 @@ class SupersetK8SCharm(TypedCharmBase[CharmConfig]):
 
         event.set_results({"result": f"{APP_NAME} successfully restarted"})
 
+    def _on_profile(self, event):
+        """Profile the live Superset processes, action handler.
+
+        Args:
+            event: The event triggered by the profile action
+        """
+        container = self.unit.get_container(self.name)
+        if not container.can_connect():
+            event.fail("could not connect to container")
+            return
+
+        target = event.params["target"]
+        fmt = event.params["format"]
+        charm_function = self.config["charm-function"].value
+        profile_target = PROFILE_TARGETS[target]
+        if charm_function not in profile_target.charm_functions:
+            event.fail(
+                f"{target} processes do not run on {charm_function} units"
+            )
+            return
+
+        try:
+            pid, _ = container.exec(
+                ["pgrep", "-o", "-f", profile_target.process_pattern]
+            ).wait_output()
+        except pebble.Error:
+            event.fail(f"no running {target} process found")
+            return
+
+        duration = event.params["duration"]
+        path = profile_output_path(target, fmt, int(time.time()))
+        event.log(f"sampling {target} processes for {duration}s")
+        try:
+            container.exec(
+                build_record_command(pid.strip(), duration, fmt, path),
+                timeout=duration + PROFILE_TIMEOUT_GRACE,
+            ).wait_output()
+            content = container.pull(path).read()
+        except pebble.ExecError as e:
+            if ptrace_denied(e.stderr or ""):
+                event.fail(
+                    "py-spy was denied access to the Superset processes: "
+                    "the container needs the CAP_SYS_PTRACE capability"
+                )
+            else:
+                event.fail(f"profiling failed: {e}")
+            return
+        except (pebble.Error, OSError) as e:
+            event.fail(f"profiling failed: {e}")
+            return
+
+        samples, rows = summarize_profile(content, fmt, event.params["top"])
+        event.set_results(
+            {
+                "path": path,
+                "samples": samples,
+                "summary": format_summary(rows),
+            }
+        )
+
     def _get_smtp_config(self):
         """Return SMTP variables."""
         ret = {}
@@ -393,6 +578,40 @@ class SupersetK8SCharm(TypedCharmBase[CharmConfig]):
 
         return ret
 
+    def _get_pool_config(self):
+        """Size the metadata database pool of each Superset process.
+
+        Unless set explicitly, the pool and its overflow together match
+        the concurrent requests a process serves, so requests do not fail
+        waiting on the pool. A gevent worker serves up to
+        GUNICORN_WORKER_CONNECTIONS requests, so its share is capped at
+        MAX_POD_DB_CONNECTIONS / `server-worker-amount`, but not below the
+        DEFAULT_DB_CONCURRENCY other processes get.
+
+        Returns:
+            env: pool size environment variables
+        """
+        concurrency = DEFAULT_DB_CONCURRENCY
+        if self.config["charm-function"] == "app-gunicorn":
+            workers = self.config["server-worker-amount"]
+            concurrency = min(
+                GUNICORN_WORKER_CONNECTIONS,
+                max(DEFAULT_DB_CONCURRENCY, MAX_POD_DB_CONNECTIONS // workers),
+            )
+
+        pool_size = self.config["sqlalchemy-pool-size"]
+        if pool_size is None:
+            pool_size = math.ceil(concurrency / 2)
+
+        max_overflow = self.config["sqlalchemy-max-overflow"]
+        if max_overflow is None:
+            max_overflow = max(concurrency - pool_size, 0)
+
+        return {
+            "SQLALCHEMY_POOL_SIZE": pool_size,
+            "SQLALCHEMY_MAX_OVERFLOW": max_overflow,
+        }
+
     def _create_env(self):
         """Create state values from config to be used as environment variables.
 
@@ -418,11 +637,23 @@ class SupersetK8SCharm(TypedCharmBase[CharmConfig]):
             "ADMIN_PASSWORD": self.config["admin-password"],
             "CHARM_FUNCTION": self.config["charm-function"].value,
             "SQL_ALCHEMY_URI": sqlalchemy_uri,
+            "SQL_ALCHEMY_READ_ONLY_URI": self.database.get_read_only_db_uri(),
             "REDIS_HOST": redis_hostname,
             "REDIS_PORT": redis_port,
-            "SQLALCHEMY_POOL_SIZE": self.config["sqlalchemy-pool-size"],
             "SQLALCHEMY_POOL_TIMEOUT": self.config["sqlalchemy-pool-timeout"],
-            "SQLALCHEMY_MAX_OVERFLOW": self.config["sqlalchemy-max-overflow"],
+            "SQLALCHEMY_POOL_PRE_PING": self.config[
+                "sqlalchemy-pool-pre-ping"
+            ],
+            "SQLALCHEMY_POOL_RECYCLE": self.config["sqlalchemy-pool-recycle"],
+            "SQLALCHEMY_STATEMENT_TIMEOUT": self.config[
+                "sqlalchemy-statement-timeout"
+            ],
+            "SQLALCHEMY_KEEPALIVES_IDLE": self.config[
+                "sqlalchemy-keepalives-idle"
+            ],
+            "SQLALCHEMY_APPLICATION_NAME": (
+                f"{self.unit.name}:{self.config['charm-function'].value}"
+            ),
             "GOOGLE_KEY": self.config["google-client-id"],
             "GOOGLE_SECRET": self.config["google-client-secret"],
             "OAUTH_DOMAIN": self.config["oauth-domain"],
@@ -445,16 +676,37 @@ class SupersetK8SCharm(TypedCharmBase[CharmConfig]):
             "SENTRY_ENVIRONMENT": self.config["sentry-environment"],
             "SENTRY_REDACT_PARAMS": self.config["sentry-redact-params"],
             "SENTRY_SAMPLE_RATE": self.config["sentry-sample-rate"],
+            "SENTRY_TRACES_SAMPLE_RATE": self.config[
+                "sentry-traces-sample-rate"
+            ],
+            "SENTRY_PROFILES_SAMPLE_RATE": self.config[
+                "sentry-profiles-sample-rate"
+            ],
+            "SENTRY_TRACES_SAMPLE_RULES": json.dumps(
+                self.config["sentry-traces-sample-rules"] or {}
+            ),
+            "TRACING_OTLP_ENDPOINT": self.config["tracing-otlp-endpoint"],
+            "TRACING_SAMPLE_RATE": self.config["tracing-sample-rate"],
+            "TRACING_SERVICE_NAME": self.app.name,
+            "TRACING_SERVICE_INSTANCE": self.unit.name,
             "SERVER_ALIAS": self.config["server-alias"],
             "APPLICATION_PORT": APPLICATION_PORT,
             "WEBSERVER_TIMEOUT": self.config["webserver-timeout"],
             "SERVER_WORKER_AMOUNT": self.config["server-worker-amount"],
+            "SERVER_WORKER_CLASS": GUNICORN_WORKER_CLASS,
+            "SERVER_WORKER_CONNECTIONS": GUNICORN_WORKER_CONNECTIONS,
             "GUNICORN_TIMEOUT": self.config["gunicorn-timeout"],
             "CELERY_WORKER_CONCURRENCY": self.config[
                 "celery-worker-concurrency"
             ],
             "STATSD_PORT": STATSD_PORT,
+            "STATSD_PREFIX": self.unit.name.replace("/", "-"),
+            "SLOW_REQUEST_THRESHOLD": self.config["slow-request-threshold"],
             "LOG_FILE": LOG_FILE,
+            "LOG_LEVEL": self.config["log-level"].value,
+            "CELERY_LOG_LEVEL": self.config["celery-log-level"].value,
+            "GUNICORN_LOG_LEVEL": self.config["gunicorn-log-level"].value,
+            "LOG_FORMAT": self.config["log-format"].value,
             "CACHE_WARMUP": self.config["cache-warmup"],
             "REDIS_TIMEOUT": self.config["redis-timeout"],
             "DASHBOARD_SIZE_LIMIT": self.config["dashboard-size-limit"],
@@ -463,6 +715,7 @@ class SupersetK8SCharm(TypedCharmBase[CharmConfig]):
             "MAX_FORM_PARTS": self.config["max-form-parts"],
             "DATA_ACCESS_REQUEST_URL": self.config["data-access-request-url"],
         }
+        env.update(self._get_pool_config())
         if self.config["feature-flags"]:
             env.update(self.config["feature-flags"])
         env.update(self._get_smtp_config())
@@ -509,11 +762,19 @@ class SupersetK8SCharm(TypedCharmBase[CharmConfig]):
             redis_port,
         ) = self.redis_handler.get_redis_relation_data()
 
-        metrics_exporter_command = (
-            f"/usr/bin/celery-exporter --broker-url redis://{redis_hostname}:{redis_port}/4 --port {PROMETHEUS_METRICS_PORT}"
-            if self.config["charm-function"] == "worker"
-            else "/usr/bin/statsd_exporter"
-        )
+        buckets = self.config["metrics-histogram-buckets"]
+        mapping_changed = load_statsd_mapping(container, buckets)
+        statsd_exporter_command = f"/usr/bin/statsd_exporter --statsd.mapping-config={STATSD_MAPPING_PATH}"
+
+        # Workers export Celery metrics, plus queue-wait timings through
+        # their own statsd_exporter
+        is_worker = self.config["charm-function"] == "worker"
+        if is_worker:
+            metrics_exporter_command = f"/usr/bin/celery-exporter --broker-url redis://{redis_hostname}:{redis_port}/4 --port {PROMETHEUS_METRICS_PORT} --buckets {','.join(str(b) for b in buckets)}"
+            statsd_service = "statsd-exporter"
+        else:
+            metrics_exporter_command = statsd_exporter_command
+            statsd_service = "metrics-exporter"
 
         logger.info("planning %s execution", APP_NAME)
         pebble_layer = {
@@ -538,6 +799,15 @@ class SupersetK8SCharm(TypedCharmBase[CharmConfig]):
             },
         }
 
+        if is_worker:
+            pebble_layer["services"][statsd_service] = {
+                "override": "replace",
+                "summary": "statsd metrics exporter",
+                "command": f"{statsd_exporter_command} --web.listen-address=:{WORKER_STATSD_METRICS_PORT}",
+                "startup": "enabled",
+                "after": [self.name],
+            }
+
         if self.config["charm-function"] in UI_FUNCTIONS:
             pebble_layer.update(
                 {
@@ -562,6 +832,13 @@ class SupersetK8SCharm(TypedCharmBase[CharmConfig]):
 
         container.add_layer(self.name, pebble_layer, combine=True)
         container.replan()
+
+        # statsd_exporter reloads its mapping on SIGHUP
+        if (
+            mapping_changed
+            and container.get_service(statsd_service).is_running()
+        ):
+            container.send_signal("SIGHUP", statsd_service)
         self.unit.status = MaintenanceStatus("replanning application")
 
 
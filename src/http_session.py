@@ -0,0 +1,62 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Pooled, retrying HTTP transport of the Superset API client."""
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# HTTP timeouts in seconds
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 30
+
+# HTTP transport defaults
+DEFAULT_POOL_SIZE = 10
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+DEFAULT_BACKOFF_JITTER = 0.25
+RETRY_STATUS_CODES = (502, 503, 504)
+# Only methods that are safe to replay are retried after the request
+# reached the server; connection errors are retried for every method.
+RETRY_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+
+def build_session(
+    pool_size: int, max_retries: int, backoff_factor: float
+) -> requests.Session:
+    """Build a pooled session that retries transient failures.
+
+    Connection resets and 502/503/504 responses are common while
+    gunicorn recycles workers, so they are retried with exponential
+    backoff and jitter instead of failing the whole sync.
+
+    Args:
+        pool_size: Number of pooled connections to keep.
+        max_retries: Retries for transient failures.
+        backoff_factor: Base of the exponential backoff, in seconds.
+
+    Returns:
+        Configured requests session.
+    """
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        allowed_methods=RETRY_METHODS,
+        status_forcelist=RETRY_STATUS_CODES,
+        backoff_factor=backoff_factor,
+        backoff_jitter=DEFAULT_BACKOFF_JITTER,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
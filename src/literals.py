@@ -9,6 +9,11 @@ DB_NAME = "superset"
 DB_RELATION_NAME = "postgresql_db"
 REDIS_RELATION_NAME = "redis"
 TRINO_CATALOG_RELATION_NAME = "trino-catalog"
+# Seconds between update-status comparisons of Trino catalog connections
+# with Superset, which read the metadata database
+TRINO_RECONCILE_INTERVAL = 3600
+PEER_RELATION_NAME = "peer"
+SUPERSET_API_TOKENS_LABEL = "superset-api-tokens"
 SUPERSET_VERSION = "6.1.0"
 REDIS_KEY_PREFIX = "superset_results"
 APP_NAME = "superset"
@@ -17,13 +22,55 @@ CONFIG_FILES = [
     "custom_sso_security_manager.py",
     "sentry_interceptor.py",
     "permission_error_messages.py",
+    "metadata_read_routing.py",
+    "gunicorn_config.py",
+    "celery_metrics.py",
+    "slow_request_recorder.py",
+    "tracing.py",
+    "logging_configurator.py",
 ]
 CONFIG_PATH = "/app/pythonpath"
 UI_FUNCTIONS = ["app", "app-gunicorn"]
 DEFAULT_ROLES = ["Public", "Gamma", "Alpha", "Admin"]
 SQL_AB_ROLE = "SELECT name FROM ab_role;"
+# Peer app data key and lifetime in seconds of the cached Superset roles
+ALLOWED_ROLES_KEY = "allowed-roles"
+ALLOWED_ROLES_TTL = 3600
+# Gunicorn worker class and connections per worker passed to run-server.sh;
+# a gevent worker serves each connection in its own greenlet
+GUNICORN_WORKER_CLASS = "gevent"
+GUNICORN_WORKER_CONNECTIONS = 1000
+# Concurrent requests per process assumed when sizing the metadata DB pool
+# of processes other than Gunicorn workers
+DEFAULT_DB_CONCURRENCY = 10
+# Metadata DB connections the default pools of a UI pod's workers share
+MAX_POD_DB_CONNECTIONS = 40
+# Connection pool used by the charm itself for metadata database queries
+METADATA_DB_POOL_SIZE = 2
+METADATA_DB_POOL_TIMEOUT = 10
 
 # Observability literals
 LOG_FILE = "/var/log/superset.log"
+# Seconds a profile may run past its sampling duration, to attach and write
+PROFILE_TIMEOUT_GRACE = 30
 PROMETHEUS_METRICS_PORT = 9102
 STATSD_PORT = 9125
+# statsd_exporter web port of worker units, where celery-exporter holds
+# PROMETHEUS_METRICS_PORT
+WORKER_STATSD_METRICS_PORT = 9103
+STATSD_MAPPING_FILE = "statsd_mapping.yaml"
+STATSD_MAPPING_PATH = "/etc/statsd_exporter/mapping.yaml"
+ALERT_RULES_PATH = "src/prometheus_alert_rules"
+# The static rules and the SLO rules rendered from the configuration are
+# gathered in this directory of the temporary directory, outside the charm
+ALERT_RULES_DIR_NAME = "superset-k8s-alert-rules"
+SLO_ALERT_RULES_FILE = "slo_alert_rules.yaml"
+# Config options holding the threshold of an SLO alert rule
+SLO_OPTIONS = [
+    "slo-chart-data-latency",
+    "slo-dashboard-load-latency",
+    "slo-sqllab-latency",
+    "slo-cache-hit-ratio",
+    "slo-celery-backlog-growth",
+    "slo-error-budget",
+]
@@ -0,0 +1,217 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Sampling profiles of live Superset processes with py-spy.
+
+py-spy attaches to the oldest process of a Superset function, the
+Gunicorn or Celery master, and samples it along with its workers. It runs
+in non-blocking mode, so the profiled processes are never paused and a
+profile can be taken under production load.
+"""
+
+import html
+import re
+from dataclasses import dataclass
+
+PROFILE_DIR = "/tmp"  # nosec B108
+# Samples per second; low enough to be negligible next to request work
+PROFILE_RATE = 50
+
+
+@dataclass(frozen=True)
+class ProfileTarget:
+    """Superset processes that can be profiled.
+
+    Attributes:
+        charm_functions: Charm functions running the processes.
+        process_pattern: pgrep pattern matching the master process.
+    """
+
+    charm_functions: tuple[str, ...]
+    process_pattern: str
+
+
+PROFILE_TARGETS = {
+    "ui": ProfileTarget(("app-gunicorn", "app"), r"gunicorn|flask run"),
+    "worker": ProfileTarget(
+        ("worker",), r"celery --app=superset\.tasks\.celery_app:app worker"
+    ),
+}
+
+# Action format to py-spy format and file extension
+PROFILE_FORMATS = {
+    "flamegraph": ("flamegraph", "svg"),
+    "collapsed": ("raw", "txt"),
+}
+
+# inferno flamegraph frames, e.g. "<title>run (app.py:12) (5 samples,
+# 2.5%)</title><rect ... fg:x="40" fg:w="5"/>", where fg:x and fg:w are the
+# offset and width of the frame in samples
+_SVG_FRAME = re.compile(
+    r"<title>([^<]*) \([\d,]+ samples?, [\d.]+%\)</title>"
+    r'<rect [^>]*fg:x="(\d+)" fg:w="(\d+)"'
+)
+
+# py-spy errors when the kernel refuses to let it read another process
+_PTRACE_DENIED = ("permission denied", "operation not permitted")
+
+
+def profile_output_path(target: str, fmt: str, timestamp: int) -> str:
+    """Build the path of a profile in the container.
+
+    Args:
+        target: Profile target, a key of PROFILE_TARGETS.
+        fmt: Profile format, a key of PROFILE_FORMATS.
+        timestamp: Epoch seconds the profile was started at.
+
+    Returns:
+        Absolute path of the profile file.
+    """
+    extension = PROFILE_FORMATS[fmt][1]
+    return f"{PROFILE_DIR}/superset-profile-{target}-{timestamp}.{extension}"
+
+
+def build_record_command(
+    pid: str, duration: int, fmt: str, output: str
+) -> list[str]:
+    """Build the py-spy command recording a process and its children.
+
+    Args:
+        pid: ID of the master process.
+        duration: Seconds to sample for.
+        fmt: Profile format, a key of PROFILE_FORMATS.
+        output: Path of the profile file.
+
+    Returns:
+        Command arguments.
+    """
+    return [
+        "py-spy",
+        "record",
+        "--pid",
+        pid,
+        "--subprocesses",
+        "--nonblocking",
+        "--rate",
+        str(PROFILE_RATE),
+        "--duration",
+        str(duration),
+        "--format",
+        PROFILE_FORMATS[fmt][0],
+        "--output",
+        output,
+    ]
+
+
+def ptrace_denied(stderr: str) -> bool:
+    """Check whether py-spy failed for lack of the CAP_SYS_PTRACE capability.
+
+    Args:
+        stderr: py-spy error output.
+
+    Returns:
+        True if py-spy was not allowed to attach to the process.
+    """
+    stderr = stderr.lower()
+    return any(error in stderr for error in _PTRACE_DENIED)
+
+
+def _is_frame(name: str) -> bool:
+    """Check whether a stack entry is a Python frame.
+
+    Args:
+        name: Stack entry from py-spy output.
+
+    Returns:
+        False for the process, thread and root entries py-spy adds.
+    """
+    return name != "all" and not name.startswith(("process ", "thread "))
+
+
+def _collapsed_counts(content: str) -> tuple[int, dict[str, int]]:
+    """Count samples per frame in collapsed stacks.
+
+    Args:
+        content: py-spy raw output, one "frame;frame;... count" per line.
+
+    Returns:
+        Tuple of (total samples, samples including each frame).
+    """
+    total = 0
+    counts: dict[str, int] = {}
+    for line in content.splitlines():
+        stack, _, count = line.rpartition(" ")
+        if not stack or not count.isdigit():
+            continue
+        total += int(count)
+        # Count recursive frames once per sample
+        for frame in set(stack.split(";")):
+            if _is_frame(frame):
+                counts[frame] = counts.get(frame, 0) + int(count)
+    return total, counts
+
+
+def _flamegraph_counts(content: str) -> tuple[int, dict[str, int]]:
+    """Count samples per frame in a flamegraph.
+
+    Args:
+        content: py-spy flamegraph SVG.
+
+    Returns:
+        Tuple of (total samples, samples including each frame).
+    """
+    total = 0
+    spans: dict[str, list[tuple[int, int]]] = {}
+    for match in _SVG_FRAME.finditer(content):
+        frame = html.unescape(match.group(1))
+        start, width = int(match.group(2)), int(match.group(3))
+        if frame == "all":
+            total = width
+        elif _is_frame(frame):
+            spans.setdefault(frame, []).append((start, start + width))
+    # A recursive frame has nested boxes over the same samples, which are
+    # counted once by merging the sample ranges of its boxes
+    counts = {}
+    for frame, ranges in spans.items():
+        count = end = 0
+        for start, stop in sorted(ranges):
+            count += max(0, stop - max(start, end))
+            end = max(end, stop)
+        counts[frame] = count
+    return total, counts
+
+
+def summarize_profile(
+    content: str, fmt: str, top: int
+) -> tuple[int, list[tuple[float, str]]]:
+    """Find the frames present in the most samples.
+
+    Args:
+        content: Profile file content.
+        fmt: Profile format, a key of PROFILE_FORMATS.
+        top: Number of frames to return.
+
+    Returns:
+        Tuple of (total samples, [(share of samples, frame)] by share).
+    """
+    if fmt == "flamegraph":
+        total, counts = _flamegraph_counts(content)
+    else:
+        total, counts = _collapsed_counts(content)
+    if not total:
+        return 0, []
+
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    return total, [(count / total, frame) for frame, count in ranked[:top]]
+
+
+def format_summary(rows: list[tuple[float, str]]) -> str:
+    """Format a profile summary for action output.
+
+    Args:
+        rows: Summary rows from ``summarize_profile``.
+
+    Returns:
+        One "share frame" line per row.
+    """
+    return "\n".join(f"{share:6.1%}  {frame}" for share, frame in rows)
@@ -4,7 +4,8 @@
 """Define the Superset server Postgresql relation."""
 
 import logging
-from typing import Dict, Optional
+from typing import Dict, List, Optional
+from urllib.parse import urlencode
 
 from charms.data_platform_libs.v0.data_interfaces import DatabaseRequires
 from ops import framework
@@ -39,6 +40,10 @@ class Database(framework.Object):
         self.framework.observe(
             charm.postgresql_db.on.endpoints_changed, self._on_database_changed
         )
+        self.framework.observe(
+            charm.postgresql_db.on.read_only_endpoints_changed,
+            self._on_database_changed,
+        )
         self.framework.observe(
             charm.on.postgresql_db_relation_changed, self._on_database_changed
         )
@@ -91,13 +96,20 @@ class Database(framework.Object):
             return None
 
         logger.debug(
-            "postgresql_db endpoints: %s", relation_data.get("endpoints")
+            "postgresql_db endpoints: %s, read-only endpoints: %s",
+            relation_data.get("endpoints"),
+            relation_data.get("read-only-endpoints"),
         )
-        host, port = relation_data.get("endpoints").split(",")[0].split(":")
+        hosts = _split_endpoints(relation_data.get("endpoints"))
+        host, port = hosts[0].split(":")
         logger.info("database host: %s, port: %s", host, port)
         return {
             "host": host,
             "port": port,
+            "hosts": hosts,
+            "read_only_hosts": _split_endpoints(
+                relation_data.get("read-only-endpoints")
+            ),
             "password": relation_data.get("password"),
             "user": relation_data.get("username"),
         }
@@ -105,6 +117,10 @@ class Database(framework.Object):
     def get_db_uri(self) -> Optional[str]:
         """Build the SQLAlchemy URI for the Superset metadata database.
 
+        When the relation lists several endpoints, the URI names every
+        host and lets libpq pick the primary, so a failover does not
+        leave Superset pointed at a dead host until the next replan.
+
         Returns:
             Optional[str]: Full postgresql:// SQLAlchemy URI, or None if the
             relation data is not available.
@@ -113,7 +129,70 @@ class Database(framework.Object):
         if db_info is None:
             return None
 
-        return (
-            f"postgresql://{db_info['user']}:{db_info['password']}"
-            f"@{db_info['host']}:{db_info['port']}/{DB_NAME}"
+        if len(db_info["hosts"]) == 1:
+            return (
+                f"postgresql://{db_info['user']}:{db_info['password']}"
+                f"@{db_info['host']}:{db_info['port']}/{DB_NAME}"
+            )
+        return _multi_host_uri(db_info, db_info["hosts"], "read-write")
+
+    def get_read_only_db_uri(self) -> Optional[str]:
+        """Build the SQLAlchemy URI for read-only metadata queries.
+
+        Standbys from the relation's read-only endpoints are preferred,
+        falling back to the primary when none of them is reachable.
+
+        Returns:
+            Optional[str]: postgresql:// SQLAlchemy URI, or None if the
+            relation does not expose read-only endpoints.
+        """
+        db_info = self.get_db_info()
+        if db_info is None or not db_info["read_only_hosts"]:
+            return None
+
+        return _multi_host_uri(
+            db_info,
+            db_info["read_only_hosts"] + db_info["hosts"],
+            "prefer-standby",
         )
+
+
+def _split_endpoints(endpoints: Optional[str]) -> List[str]:
+    """Split a comma-separated endpoints field into host:port entries.
+
+    Args:
+        endpoints: Relation endpoints, e.g. "host1:5432,host2:5432".
+
+    Returns:
+        List of host:port strings, without duplicates.
+    """
+    hosts: List[str] = []
+    for endpoint in (endpoints or "").split(","):
+        endpoint = endpoint.strip()
+        if endpoint and endpoint not in hosts:
+            hosts.append(endpoint)
+    return hosts
+
+
+def _multi_host_uri(
+    db_info: Dict, hosts: List[str], target_session_attrs: str
+) -> str:
+    """Build a libpq multi-host SQLAlchemy URI.
+
+    Args:
+        db_info: Connection info from ``get_db_info``.
+        hosts: host:port entries, tried in order.
+        target_session_attrs: libpq session type to connect to.
+
+    Returns:
+        postgresql:// SQLAlchemy URI.
+    """
+    query = urlencode(
+        [("host", host) for host in hosts]
+        + [("target_session_attrs", target_session_attrs)],
+        safe=":",
+    )
+    return (
+        f"postgresql://{db_info['user']}:{db_info['password']}"
+        f"@/{DB_NAME}?{query}"
+    )
@@ -7,19 +7,35 @@ Manages the trino-catalog relation, syncing Trino catalogs as
 Superset database connections via the Superset REST API.
 """
 
+import json
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
-from urllib.parse import quote_plus, urlsplit
+from urllib.parse import urlsplit
 
 import ops
-from charms.trino_k8s.v0.trino_catalog import (
-    TrinoCatalog,
-    TrinoCatalogRequirer,
+from charms.trino_k8s.v0.trino_catalog import TrinoCatalogRequirer
+
+from http_session import DEFAULT_POOL_SIZE
+from literals import (
+    SUPERSET_API_TOKENS_LABEL,
+    TRINO_CATALOG_RELATION_NAME,
+    TRINO_RECONCILE_INTERVAL,
+    UI_FUNCTIONS,
 )
-
-from literals import TRINO_CATALOG_RELATION_NAME, UI_FUNCTIONS
 from log import log_event_handler
-from superset_api import SupersetApiClient, SupersetApiError, TrinoConnection
+from superset_api import SupersetApiClient, SupersetApiError
+from trino_database import TrinoDatabaseSettings
+from trino_sync_plan import (
+    DesiredDatabase,
+    SyncAction,
+    SyncChange,
+    SyncPlan,
+    build_desired_state,
+    desired_state_digest,
+    plan_sync,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -30,8 +46,14 @@ class TrinoCatalogRelationHandler(ops.Object):
     Observes relation lifecycle events and synchronises Trino catalogs
     as Superset database connections.  Only active when the charm is
     running a UI function.
+
+    Attrs:
+        _stored: Digest of the desired state last applied in full, and
+            when the connections were last compared with Superset.
     """
 
+    _stored = ops.StoredState()
+
     def __init__(self, charm: ops.CharmBase):
         """Construct.
 
@@ -40,6 +62,7 @@ class TrinoCatalogRelationHandler(ops.Object):
         """
         super().__init__(charm, "trino-catalog")
         self.charm = charm
+        self._stored.set_default(sync_digest="", reconciled_at=0.0)
 
         self.trino_catalog_requirer = TrinoCatalogRequirer(
             self.charm, relation_name=TRINO_CATALOG_RELATION_NAME
@@ -58,8 +81,12 @@ class TrinoCatalogRelationHandler(ops.Object):
             self._on_secret_changed,
         )
         self.framework.observe(
-            charm.on.update_status,
-            self._on_update_status,
+            charm.on.secret_remove,
+            self._on_secret_remove,
+        )
+        self.framework.observe(
+            charm.on.trino_sync_plan_action,
+            self._on_trino_sync_plan_action,
         )
 
     @log_event_handler(logger)
@@ -104,20 +131,66 @@ class TrinoCatalogRelationHandler(ops.Object):
             self.sync_databases(force_update_credentials=True)
 
     @log_event_handler(logger)
-    def _on_update_status(self, event: ops.UpdateStatusEvent) -> None:
-        """Trigger database sync on update-status to reconcile state."""
-        self.sync_databases()
+    def _on_secret_remove(self, event: ops.SecretRemoveEvent) -> None:
+        """Prune superseded revisions of the cached API tokens secret.
+
+        Args:
+            event: The event triggered when a secret revision is unused.
+        """
+        if event.secret.label == SUPERSET_API_TOKENS_LABEL:
+            event.secret.remove_revision(event.revision)
+
+    @log_event_handler(logger)
+    def _on_trino_sync_plan_action(self, event: ops.ActionEvent) -> None:
+        """Show the changes the next Trino catalog sync would make.
+
+        Args:
+            event: The event triggered by the trino-sync-plan action.
+        """
+        sync_config = self._prepare_sync_config()
+        if sync_config is None:
+            event.fail("Trino catalog relation data is not available")
+            return
 
-    def sync_databases(self, force_update_credentials: bool = False) -> None:
+        api = self._create_api_client()
+        if api is None:
+            event.fail("Superset API client unavailable")
+            return
+
+        plan = self._plan(
+            api,
+            self._desired_state(sync_config),
+            event.params["force-update-credentials"],
+        )
+        if plan is None:
+            event.fail("Failed to read existing Trino databases")
+            return
+
+        event.set_results(
+            {
+                "changes": len(plan.changes),
+                "plan": json.dumps(plan.to_dict()),
+            }
+        )
+
+    def sync_databases(
+        self,
+        force_update_credentials: bool = False,
+        reconcile: bool = False,
+    ) -> None:
         """Synchronise Trino catalogs into Superset database connections.
 
-        For each Trino catalog, the connection is created if missing,
-        updated if the host:port has changed, or left as-is.  When
-        force_update_credentials is True, every existing connection
-        is updated unconditionally (used in case of credential rotation).
+        The relation data is turned into a desired-state model whose
+        digest is compared with the one stored after the last fully
+        applied plan; when nothing changed the sync stops there.
+        Otherwise the existing connections are read from the metadata
+        database and only the planned changes are sent to Superset.
 
         Args:
             force_update_credentials: If True, update all existing connections
+            reconcile: If True, compare against Superset even when the
+                relation data is unchanged, to repair drift. This happens
+                at most once per TRINO_RECONCILE_INTERVAL.
         """
         if not self._should_sync():
             return
@@ -127,37 +200,101 @@ class TrinoCatalogRelationHandler(ops.Object):
         if sync_config is None:
             return
 
-        # Initialize API client and get existing databases
+        desired = self._desired_state(sync_config)
+        digest = desired_state_digest(desired)
+        reconcile = reconcile and self._reconcile_due()
+        if (
+            not (force_update_credentials or reconcile)
+            and digest == self._stored.sync_digest
+        ):
+            logger.debug("Trino catalogs unchanged since last sync, skipping")
+            return
+
         api = self._create_api_client()
         if api is None:
             return
 
+        plan = self._plan(api, desired, force_update_credentials)
+        if plan is None:
+            return
+        self._stored.reconciled_at = time.time()
+
+        applied = True
+        if not plan.empty:
+            cached_tokens = self._load_api_tokens()
+            if cached_tokens:
+                api.import_tokens(cached_tokens)
+
+            try:
+                applied = self._apply_plan(
+                    api=api,
+                    plan=plan,
+                    sync_config=sync_config,
+                    max_workers=self.charm.config["trino-sync-concurrency"],
+                )
+            finally:
+                self._store_api_tokens(api, cached_tokens)
+
+        # A partially applied plan is retried on the next sync
+        self._stored.sync_digest = digest if applied else ""
+
+    def _reconcile_due(self) -> bool:
+        """Check whether the connections should be compared with Superset.
+
+        Returns:
+            True if the last comparison is older than TRINO_RECONCILE_INTERVAL.
+        """
+        elapsed = time.time() - self._stored.reconciled_at
+        return elapsed >= TRINO_RECONCILE_INTERVAL
+
+    def _desired_state(
+        self, sync_config: dict[str, Any]
+    ) -> dict[str, DesiredDatabase]:
+        """Build the desired-state model for the current relation data.
+
+        Args:
+            sync_config: Config returned by ``_prepare_sync_config``.
+
+        Returns:
+            Dict of catalog name to its desired database.
+        """
+        return build_desired_state(
+            [catalog.name for catalog in sync_config["catalogs"]],
+            host_port=sync_config["trino_url"],
+            username=sync_config["username"],
+            settings=sync_config["settings"],
+        )
+
+    def _plan(
+        self,
+        api: SupersetApiClient,
+        desired: dict[str, DesiredDatabase],
+        force_update_credentials: bool,
+    ) -> SyncPlan | None:
+        """Plan the sync against the connections already in Superset.
+
+        Args:
+            api: Superset API client.
+            desired: Desired-state model from ``_desired_state``.
+            force_update_credentials: If True, update all existing connections
+
+        Returns:
+            The sync plan, or None if existing connections are unavailable.
+        """
         metadata_db_uri = self.charm.database.get_db_uri()
         if metadata_db_uri is None:
             logger.error("Metadata database URI unavailable, skipping sync")
-            return
+            return None
 
         try:
-            existing_dbs = api.get_trino_databases(metadata_db_uri)
+            existing_dbs = api.get_trino_databases(
+                metadata_db_uri, self.charm.metadata_db
+            )
         except SupersetApiError as e:
             logger.error("Failed to fetch existing databases: %s", e)
-            return
-
-        # Resolve target role for permission grants
-        role_id = self._resolve_role_id(api)
+            return None
 
-        # Sync each catalog
-        self._sync_catalogs(
-            api=api,
-            catalogs=sync_config["catalogs"],
-            trino_url=sync_config["trino_url"],
-            username=sync_config["username"],
-            password=sync_config["password"],
-            use_ssl=sync_config["use_ssl"],
-            existing_dbs=existing_dbs,
-            role_id=role_id,
-            force_update=force_update_credentials,
-        )
+        return plan_sync(desired, existing_dbs, force_update_credentials)
 
     def _should_sync(self) -> bool:
         """Check whether this unit should perform database sync.
@@ -234,8 +371,23 @@ class TrinoCatalogRelationHandler(ops.Object):
             "username": username,
             "password": password,
             "use_ssl": use_ssl,
+            "settings": self._database_settings(),
         }
 
+    def _database_settings(self) -> TrinoDatabaseSettings:
+        """Build the managed settings of auto-created Trino databases.
+
+        Returns:
+            Settings from the charm configuration.
+        """
+        return TrinoDatabaseSettings(
+            request_timeout=self.charm.config["trino-request-timeout"],
+            metadata_cache_timeout=self.charm.config[
+                "trino-metadata-cache-timeout"
+            ],
+            cache_timeout=self.charm.config["trino-cache-timeout"],
+        )
+
     def _use_ssl(self, trino_url: str) -> bool:
         """Determine whether SSL should be used from the Trino URL port.
 
@@ -247,20 +399,6 @@ class TrinoCatalogRelationHandler(ops.Object):
         """
         return urlsplit(f"//{trino_url}").port == 443
 
-    def _catalog_display_name(self, catalog_name: str) -> str:
-        """Generate Superset database name from a catalog.
-
-        Example: google_ads -> "Google Ads (google_ads)".
-
-        Args:
-            catalog_name: Raw Trino catalog name (e.g. google_ads).
-
-        Returns:
-            Display name for the Superset database connection.
-        """
-        title = catalog_name.replace("_", " ").title()
-        return f"{title} ({catalog_name})"
-
     def _create_api_client(self) -> SupersetApiClient | None:
         """Create and authenticate Superset API client.
 
@@ -271,11 +409,65 @@ class TrinoCatalogRelationHandler(ops.Object):
             return SupersetApiClient(
                 admin_username="admin",
                 admin_password=self.charm.config["admin-password"],
+                pool_size=max(
+                    DEFAULT_POOL_SIZE,
+                    self.charm.config["trino-sync-concurrency"],
+                ),
             )
         except SupersetApiError as e:
             logger.error("Superset API unavailable, skipping sync: %s", e)
             return None
 
+    def _load_api_tokens(self) -> dict[str, str] | None:
+        """Load Superset API tokens cached by a previous hook.
+
+        Returns:
+            Cached token dict, or None if nothing is cached.
+        """
+        try:
+            secret = self.charm.model.get_secret(
+                label=SUPERSET_API_TOKENS_LABEL
+            )
+            return secret.get_content(refresh=True)
+        except ops.SecretNotFoundError:
+            return None
+        except ops.ModelError as e:
+            logger.warning("Failed to read cached Superset API tokens: %s", e)
+            return None
+
+    def _store_api_tokens(
+        self,
+        api: SupersetApiClient,
+        cached_tokens: dict[str, str] | None,
+    ) -> None:
+        """Cache the client's API tokens in a charm-owned secret.
+
+        The secret is only written when the tokens changed, so hooks that
+        reuse a still-valid token do not create new secret revisions.
+
+        Args:
+            api: Superset API client used for this sync.
+            cached_tokens: Tokens loaded at the start of the sync.
+        """
+        tokens = api.export_tokens()
+        if not tokens or tokens == cached_tokens:
+            return
+
+        try:
+            if cached_tokens is None:
+                self.charm.app.add_secret(
+                    tokens,
+                    label=SUPERSET_API_TOKENS_LABEL,
+                    description="Superset API tokens used by the charm",
+                )
+            else:
+                secret = self.charm.model.get_secret(
+                    label=SUPERSET_API_TOKENS_LABEL
+                )
+                secret.set_content(tokens)
+        except ops.ModelError as e:
+            logger.warning("Failed to cache Superset API tokens: %s", e)
+
     def _resolve_role_id(self, api: SupersetApiClient) -> int | None:
         """Resolve the role ID for permission grants.
 
@@ -306,123 +498,180 @@ class TrinoCatalogRelationHandler(ops.Object):
 
         return role_id
 
-    def _sync_catalogs(  # pylint: disable=too-many-positional-arguments
+    def _apply_plan(
         self,
         api: SupersetApiClient,
-        catalogs: list[TrinoCatalog],
-        trino_url: str,
-        username: str,
-        password: str,
-        use_ssl: bool,
-        existing_dbs: list[TrinoConnection],
-        role_id: int | None,
-        force_update: bool,
-    ) -> None:
-        """Sync all catalogs to Superset.
+        plan: SyncPlan,
+        sync_config: dict[str, Any],
+        max_workers: int = 1,
+    ) -> bool:
+        """Apply a sync plan to Superset.
+
+        Changes are applied in parallel, up to ``max_workers`` at a time,
+        since every database create triggers a Superset connection test
+        against Trino. A failed change does not affect the others.
 
         Args:
             api: Authenticated Superset API client.
-            catalogs: List of Trino catalog objects.
-            trino_url: Trino server URL (host:port).
-            username: Trino username.
-            password: Trino password.
-            use_ssl: Whether to use SSL.
-            existing_dbs: List of existing Trino connections in Superset.
-            role_id: Role ID for permission grants, or None.
-            force_update: Whether to force update all connections.
+            plan: Plan returned by ``plan_sync``.
+            sync_config: Config returned by ``_prepare_sync_config``.
+            max_workers: Maximum number of changes applied concurrently.
+
+        Returns:
+            True if every change was applied.
         """
-        for catalog in catalogs:
-            db_name = self._catalog_display_name(catalog.name)
-            existing_connections = [
-                conn for conn in existing_dbs if conn.catalog == catalog.name
-            ]
-
-            if not existing_connections:
-                self._create_new_connection(
-                    api=api,
-                    db_name=db_name,
-                    catalog_name=catalog.name,
-                    trino_url=trino_url,
-                    username=username,
-                    password=password,
-                    use_ssl=use_ssl,
+        start = time.monotonic()
+        workers = max(1, min(max_workers, len(plan.changes)))
+        results = self._run_changes(api, plan.changes, sync_config, workers)
+
+        failed = results.count(False)
+        created = {
+            change.database_name
+            for change, ok in zip(plan.changes, results)
+            if ok and change.action is SyncAction.CREATE
+        }
+
+        # The role is only looked up when there is something to grant
+        grants = [name for name in plan.grants if name in created]
+        if grants:
+            self._grant_database_access(
+                api, grants, self._resolve_role_id(api)
+            )
+
+        logger.info(
+            "Applied %d Trino catalog changes (%d failed, %d created) "
+            "in %.2fs with %d workers",
+            len(plan.changes),
+            failed,
+            len(created),
+            time.monotonic() - start,
+            workers,
+        )
+        return not failed
+
+    def _run_changes(
+        self,
+        api: SupersetApiClient,
+        changes: list[SyncChange],
+        sync_config: dict[str, Any],
+        workers: int,
+    ) -> list[bool]:
+        """Apply changes on a thread pool.
+
+        Args:
+            api: Authenticated Superset API client.
+            changes: Changes to apply.
+            sync_config: Config returned by ``_prepare_sync_config``.
+            workers: Number of changes applied concurrently.
+
+        Returns:
+            Whether each change was applied, in the order of ``changes``.
+        """
+        with ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="trino-sync"
+        ) as pool:
+            return list(
+                pool.map(
+                    lambda change: self._try_apply_change(
+                        api, change, sync_config
+                    ),
+                    changes,
                 )
+            )
 
-                self._grant_database_access(api, db_name, role_id)
+    def _try_apply_change(
+        self,
+        api: SupersetApiClient,
+        change: SyncChange,
+        sync_config: dict[str, Any],
+    ) -> bool:
+        """Apply one change, logging rather than raising on failure.
 
-            self._update_existing_connections(
-                api=api,
-                connections=existing_connections,
-                catalog_name=catalog.name,
-                trino_url=trino_url,
-                username=username,
-                password=password,
-                use_ssl=use_ssl,
-                force_update=force_update,
+        Args:
+            api: Authenticated Superset API client.
+            change: Change to apply.
+            sync_config: Config returned by ``_prepare_sync_config``.
+
+        Returns:
+            True if the change was applied.
+        """
+        try:
+            return self._apply_change(api, change, sync_config)
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.exception(
+                "Failed to %s database for catalog '%s'",
+                change.action.value,
+                change.catalog,
             )
+            return False
 
-    def _update_existing_connections(  # pylint: disable=too-many-positional-arguments
+    def _apply_change(
         self,
         api: SupersetApiClient,
-        connections: list[TrinoConnection],
-        catalog_name: str,
-        trino_url: str,
-        username: str,
-        password: str,
-        use_ssl: bool,
-        force_update: bool,
-    ) -> None:
-        """Update existing database connections for a catalog.
+        change: SyncChange,
+        sync_config: dict[str, Any],
+    ) -> bool:
+        """Apply a single planned change to Superset.
+
+        Runs in a worker thread, so it must only use the API client and
+        never the Juju model.
 
         Args:
             api: Authenticated Superset API client.
-            connections: Existing connections for this catalog.
-            catalog_name: Trino catalog name.
-            trino_url: Trino server URL (host:port).
-            username: Trino username.
-            password: Trino password.
-            use_ssl: Whether to use SSL.
-            force_update: Whether to force update all connections.
+            change: Planned change.
+            sync_config: Config returned by ``_prepare_sync_config``.
+
+        Returns:
+            True if the change was applied.
         """
-        for conn in connections:
-            uri_user = f"trino://{quote_plus(username)}"
-            has_current_user = (
-                f"{uri_user}:" in conn.sqlalchemy_uri  # user:password@host
-                or f"{uri_user}@" in conn.sqlalchemy_uri  # user@host
+        if change.action is SyncAction.CREATE:
+            return self._create_new_connection(
+                api=api,
+                db_name=change.database_name,
+                catalog_name=change.catalog,
+                trino_url=sync_config["trino_url"],
+                username=sync_config["username"],
+                password=sync_config["password"],
+                use_ssl=sync_config["use_ssl"],
+                settings=sync_config["settings"],
             )
-            needs_update = (
-                force_update
-                or f"@{trino_url}/" not in conn.sqlalchemy_uri
-                or not has_current_user
+
+        if change.database_id is None:
+            logger.error(
+                "Cannot update database '%s' without its id",
+                change.database_name,
             )
+            return False
 
-            if not needs_update:
-                logger.debug(
-                    "Superset database '%s' is up to date, skipping",
-                    conn.database_name,
+        logger.info(
+            "Updating Superset database '%s' (id=%s): %s",
+            change.database_name,
+            change.database_id,
+            change.action.value,
+        )
+        try:
+            if change.action is SyncAction.UPDATE_SETTINGS:
+                api.update_database_settings(
+                    change.database_id, change.settings_payload or {}
                 )
-                continue
-
-            logger.info(
-                "Updating Superset database '%s' (id=%s)",
-                conn.database_name,
-                conn.id,
-            )
-            try:
+            else:
                 api.update_trino_database(
-                    database_id=conn.id,
-                    host_port=trino_url,
-                    trino_catalog=catalog_name,
-                    username=username,
-                    password=password,
-                    use_ssl=use_ssl,
-                )
-            except SupersetApiError as e:
-                logger.error(
-                    "Failed to update database '%s': %s",
-                    conn.database_name,
-                    e,
+                    database_id=change.database_id,
+                    host_port=sync_config["trino_url"],
+                    trino_catalog=change.catalog,
+                    username=sync_config["username"],
+                    password=sync_config["password"],
+                    use_ssl=sync_config["use_ssl"],
+                    settings_payload=change.settings_payload,
                 )
+        except SupersetApiError as e:
+            logger.error(
+                "Failed to update database '%s': %s",
+                change.database_name,
+                e,
+            )
+            return False
+        return True
 
     def _create_new_connection(  # pylint: disable=too-many-positional-arguments
         self,
@@ -433,7 +682,8 @@ class TrinoCatalogRelationHandler(ops.Object):
         username: str,
         password: str,
         use_ssl: bool,
-    ) -> None:
+        settings: TrinoDatabaseSettings | None = None,
+    ) -> bool:
         """Create a new database connection for a catalog.
 
         Args:
@@ -444,6 +694,10 @@ class TrinoCatalogRelationHandler(ops.Object):
             username: Trino username.
             password: Trino password.
             use_ssl: Whether to use SSL.
+            settings: Charm-managed database settings.
+
+        Returns:
+            True if the database was created, False otherwise.
         """
         try:
             api.create_trino_database(
@@ -453,6 +707,7 @@ class TrinoCatalogRelationHandler(ops.Object):
                 username=username,
                 password=password,
                 use_ssl=use_ssl,
+                settings=settings,
             )
         except SupersetApiError as e:
             logger.error(
@@ -461,43 +716,78 @@ class TrinoCatalogRelationHandler(ops.Object):
                 catalog_name,
                 e,
             )
+            return False
+        return True
+
+    def _lookup_database_access(
+        self, api: SupersetApiClient, db_names: list[str]
+    ) -> dict[str, int | None]:
+        """Resolve database_access permission IDs for new databases.
+
+        A single database uses an exact server-side filtered lookup;
+        several databases share one index built in a single pass.
+
+        Args:
+            api: Authenticated Superset API client.
+            db_names: Database names in Superset.
+
+        Returns:
+            Dict of database name to permission ID, or None if missing.
+        """
+        if len(db_names) == 1:
+            return {
+                db_names[0]: api.get_database_access_permission_id(db_names[0])
+            }
+
+        index = api.get_database_access_permission_index()
+        return {db_name: index.get(db_name) for db_name in db_names}
 
     def _grant_database_access(
         self,
         api: SupersetApiClient,
-        db_name: str,
+        db_names: list[str],
         role_id: int | None,
     ) -> None:
         """Grant database_access permission to the configured role.
 
+        All permissions are granted in a single role update, so new
+        catalogs cost one GET and one POST of the role's permissions
+        regardless of how many were created.
+
         Args:
             api: Authenticated Superset API client.
-            db_name: Database name in Superset.
+            db_names: Database names in Superset.
             role_id: Role ID to grant permission to, or None to skip.
         """
-        if role_id is None:
+        if role_id is None or not db_names:
             return
 
         try:
-            perm_id = api.get_database_access_permission_id(db_name)
+            perm_ids = self._lookup_database_access(api, db_names)
         except SupersetApiError as e:
             logger.error(
-                "Failed to lookup database_access permission for '%s': %s",
-                db_name,
+                "Failed to lookup database_access permissions for %s: %s",
+                db_names,
                 e,
             )
             return
 
-        if perm_id is None:
-            logger.warning(
-                "database_access permission for '%s' not yet available",
-                db_name,
-            )
+        grant_ids = []
+        for db_name, perm_id in perm_ids.items():
+            if perm_id is None:
+                logger.warning(
+                    "database_access permission for '%s' not yet available",
+                    db_name,
+                )
+                continue
+            grant_ids.append(perm_id)
+
+        if not grant_ids:
             return
 
         try:
-            api.update_role_permissions(role_id, perm_id)
+            api.grant_role_permissions(role_id, grant_ids)
         except SupersetApiError as e:
             logger.error(
-                "Failed to grant database_access for '%s': %s", db_name, e
+                "Failed to grant database_access for %s: %s", db_names, e
             )
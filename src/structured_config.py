@@ -5,7 +5,7 @@
 """Structured configuration for the Superset charm."""
 import logging
 from enum import Enum
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 from charms.data_platform_libs.v0.data_models import BaseConfigModel
 from pydantic import validator
@@ -36,6 +36,23 @@ class FunctionType(str, Enum):
     beat = "beat"
 
 
+class LogLevelType(str, Enum):
+    """Enum for the log level fields."""
+
+    debug = "DEBUG"
+    info = "INFO"
+    warning = "WARNING"
+    error = "ERROR"
+    critical = "CRITICAL"
+
+
+class LogFormatType(str, Enum):
+    """Enum for the `log-format` field."""
+
+    text = "text"
+    json = "json"
+
+
 class CharmConfig(BaseConfigModel):
     """Manager for the structured configuration."""
 
@@ -46,9 +63,13 @@ class CharmConfig(BaseConfigModel):
     admin_password: str
     charm_function: FunctionType
     cache_warmup: bool
-    sqlalchemy_pool_size: int
+    sqlalchemy_pool_size: Optional[int]
     sqlalchemy_pool_timeout: int
-    sqlalchemy_max_overflow: int
+    sqlalchemy_max_overflow: Optional[int]
+    sqlalchemy_pool_pre_ping: bool
+    sqlalchemy_pool_recycle: int
+    sqlalchemy_statement_timeout: int
+    sqlalchemy_keepalives_idle: int
     self_registration_role: str
     oauth_admin_email: str
     google_client_id: Optional[str]
@@ -67,11 +88,32 @@ class CharmConfig(BaseConfigModel):
     sentry_environment: Optional[str]
     sentry_redact_params: bool
     sentry_sample_rate: Optional[str]
+    sentry_traces_sample_rate: Optional[str]
+    sentry_profiles_sample_rate: Optional[str]
+    sentry_traces_sample_rules: Optional[str]
+    tracing_otlp_endpoint: Optional[str]
+    tracing_sample_rate: Optional[str]
     server_alias: str
     webserver_timeout: int
     server_worker_amount: int
     gunicorn_timeout: int
     celery_worker_concurrency: int
+    metrics_histogram_buckets: List[float]
+    log_level: LogLevelType
+    celery_log_level: LogLevelType
+    gunicorn_log_level: LogLevelType
+    log_format: LogFormatType
+    slow_request_threshold: int
+    slo_chart_data_latency: int
+    slo_dashboard_load_latency: int
+    slo_sqllab_latency: int
+    slo_cache_hit_ratio: Optional[str]
+    slo_celery_backlog_growth: int
+    slo_error_budget: Optional[str]
+    trino_sync_concurrency: int
+    trino_request_timeout: Optional[int]
+    trino_metadata_cache_timeout: Optional[int]
+    trino_cache_timeout: Optional[int]
     feature_flags: Optional[str]
     redis_timeout: int
     smtp_secret_id: Optional[str]
@@ -111,6 +153,8 @@ class CharmConfig(BaseConfigModel):
         Raises:
             ValueError: in the case when the value is out of range
         """
+        if value is None:
+            return None
         int_value = int(value)
         if 0 <= int_value <= 300:
             return int_value
@@ -149,6 +193,8 @@ class CharmConfig(BaseConfigModel):
         Raises:
             ValueError: in the case when the value is out of range
         """
+        if value is None:
+            return None
         int_value = int(value)
         if 0 <= int_value <= 100:
             return int_value
@@ -175,16 +221,83 @@ class CharmConfig(BaseConfigModel):
             return int_value
         raise ValueError("Value out of range.")
 
-    @validator("sentry_sample_rate")
+    @validator(
+        "sentry_sample_rate",
+        "sentry_traces_sample_rate",
+        "sentry_profiles_sample_rate",
+        "slo_cache_hit_ratio",
+        "slo_error_budget",
+    )
+    @classmethod
+    def ratio_validator(cls, value: str) -> Optional[float]:
+        """Check validity of Sentry sample rate and SLO ratio fields.
+
+        Args:
+            value: ratio value
+
+        Returns:
+            float_value: float for the ratio configuration
+
+        Raises:
+            ValueError: in the case when the value is out of range
+        """
+        float_value = float(value)
+        if 0 <= float_value <= 1:
+            return float_value
+        raise ValueError("Value out of range.")
+
+    @validator("sentry_traces_sample_rules")
+    @classmethod
+    def sentry_traces_sample_rules_validator(
+        cls, value: str
+    ) -> Dict[str, float]:
+        """Check validity of `sentry_traces_sample_rules` field.
+
+        Args:
+            value: sentry_traces_sample_rules value
+
+        Returns:
+            Dict[str, float]: sample rates by route or task name prefix
+
+        Raises:
+            ValueError: in case a rule is malformed or out of range
+        """
+        rules = {}
+        for rule in value.split(","):
+            prefix, _, rate = rule.strip().rpartition("=")
+            if not prefix or not 0 <= float(rate) <= 1:
+                raise ValueError(f"Invalid sample rule {rule.strip()!r}.")
+            rules[prefix] = float(rate)
+        return rules
+
+    @validator("tracing_otlp_endpoint")
+    @classmethod
+    def tracing_otlp_endpoint_validator(cls, value: str) -> Optional[str]:
+        """Check validity of `tracing_otlp_endpoint` field.
+
+        Args:
+            value: tracing_otlp_endpoint value
+
+        Returns:
+            value: tracing_otlp_endpoint configuration
+
+        Raises:
+            ValueError: in the case when the value is not an HTTP URL
+        """
+        if value.startswith(("http://", "https://")):
+            return value
+        raise ValueError("Value must be an http or https URL.")
+
+    @validator("tracing_sample_rate")
     @classmethod
-    def sentry_sample_rate_validator(cls, value: str) -> Optional[float]:
-        """Check validity of `sentry_sample_rate` field.
+    def tracing_sample_rate_validator(cls, value: str) -> Optional[float]:
+        """Check validity of `tracing_sample_rate` field.
 
         Args:
-            value: sentry_sample_rate value
+            value: tracing_sample_rate value
 
         Returns:
-            float_value: float for sentry_sample_rate configuration
+            float_value: float for tracing_sample_rate configuration
 
         Raises:
             ValueError: in the case when the value is out of range
@@ -232,6 +345,25 @@ class CharmConfig(BaseConfigModel):
             return int_value
         raise ValueError("Value out of range.")
 
+    @validator("sqlalchemy_pool_recycle")
+    @classmethod
+    def sqlalchemy_pool_recycle_validator(cls, value: str) -> Optional[int]:
+        """Check validity of `sqlalchemy_pool_recycle` field.
+
+        Args:
+            value: sqlalchemy-pool-recycle value
+
+        Returns:
+            int_value: integer for sqlalchemy-pool-recycle configuration
+
+        Raises:
+            ValueError: in the case when the value is out of range
+        """
+        int_value = int(value)
+        if 0 <= int_value <= 86400:
+            return int_value
+        raise ValueError("Value out of range.")
+
     @validator("gunicorn_timeout")
     @classmethod
     def gunicorn_timeout_validator(cls, value: str) -> Optional[int]:
@@ -270,6 +402,46 @@ class CharmConfig(BaseConfigModel):
             return int_value
         raise ValueError("Value out of range.")
 
+    @validator("trino_sync_concurrency")
+    @classmethod
+    def trino_sync_concurrency_validator(cls, value: str) -> Optional[int]:
+        """Check validity of `trino_sync_concurrency` field.
+
+        Args:
+            value: trino-sync-concurrency value
+
+        Returns:
+            int_value: integer for trino-sync-concurrency configuration
+
+        Raises:
+            ValueError: in the case when the value is out of range
+        """
+        int_value = int(value)
+        if 1 <= int_value <= 32:
+            return int_value
+        raise ValueError("Value out of range.")
+
+    @validator("metrics_histogram_buckets", pre=True)
+    @classmethod
+    def metrics_histogram_buckets_validator(cls, value: str) -> List[float]:
+        """Check validity of `metrics_histogram_buckets` field.
+
+        Args:
+            value: metrics-histogram-buckets value
+
+        Returns:
+            List[float]: bucket upper bounds in seconds
+
+        Raises:
+            ValueError: in the case when the buckets are not increasing
+        """
+        buckets = [float(b) for b in value.split(",") if b.strip()]
+        if not buckets or buckets[0] <= 0:
+            raise ValueError("Buckets must be positive.")
+        if any(a >= b for a, b in zip(buckets, buckets[1:])):
+            raise ValueError("Buckets must be increasing.")
+        return buckets
+
     @validator("feature_flags")
     @classmethod
     def feature_flags_validator(cls, value: str) -> Dict[str, bool]:
@@ -304,6 +476,16 @@ class CharmConfig(BaseConfigModel):
         "max_content_length",
         "max_form_memory_size",
         "max_form_parts",
+        "trino_request_timeout",
+        "trino_metadata_cache_timeout",
+        "trino_cache_timeout",
+        "sqlalchemy_statement_timeout",
+        "sqlalchemy_keepalives_idle",
+        "slow_request_threshold",
+        "slo_chart_data_latency",
+        "slo_dashboard_load_latency",
+        "slo_sqllab_latency",
+        "slo_celery_backlog_growth",
     )
     @classmethod
     def non_negative_number_validator(cls, value: str) -> Optional[int]:
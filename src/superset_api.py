@@ -5,41 +5,46 @@
 
 import json
 import logging
-from dataclasses import dataclass
-from datetime import datetime, timezone
-from typing import Any
+import math
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterator
 from urllib.parse import quote_plus
 
 import jwt
 import requests
-import sqlalchemy
 from sqlalchemy.exc import SQLAlchemyError
 
+from http_session import (
+    DEFAULT_BACKOFF_FACTOR,
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_MAX_RETRIES,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_READ_TIMEOUT,
+    build_session,
+)
+from trino_database import TrinoConnection, TrinoDatabaseSettings
+from utils import MetadataDatabase
+
 logger = logging.getLogger(__name__)
 
 # Pagination defaults
 MAX_PAGE_SIZE = 100
 MAX_PAGES = 50
+# Concurrent page requests once the total count is known
+PREFETCH_WORKERS = 4
 
-# HTTP request timeout in seconds
-DEFAULT_REQUEST_TIMEOUT = 30
-
+# Permission granting access to a Superset database, and the view-menu name
+# Superset gives it, e.g. "[Google Ads (google_ads)].(id:3)"
+DATABASE_ACCESS_PERMISSION = "database_access"
+DATABASE_ACCESS_VIEW_PATTERN = re.compile(r"^\[(?P<name>.+)\]\.\(id:\d+\)$")
+PERMISSIONS_RESOURCES_ENDPOINT = "/api/v1/security/permissions-resources/"
 
-@dataclass(frozen=True)
-class TrinoConnection:
-    """Represents a Trino database connection in Superset.
-
-    Attributes:
-        id: Superset database connection ID.
-        database_name: Name of the database connection in Superset.
-        sqlalchemy_uri: Full SQLAlchemy URI for the connection.
-        catalog: Trino catalog name extracted from the URI.
-    """
-
-    id: int
-    database_name: str
-    sqlalchemy_uri: str
-    catalog: str
+# Treat tokens as expired slightly early so a request never races expiry
+TOKEN_EXPIRY_MARGIN = timedelta(seconds=30)
 
 
 class SupersetApiError(Exception):
@@ -63,12 +68,16 @@ class SupersetApiClient:
     Trino database connections and role permissions.
     """
 
-    def __init__(
+    def __init__(  # pylint: disable=too-many-positional-arguments
         self,
         admin_username: str,
         admin_password: str,
         base_url: str = "http://localhost:8088",
-        timeout: int = DEFAULT_REQUEST_TIMEOUT,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
     ):
         """Initialize the Superset API client.
 
@@ -76,17 +85,56 @@ class SupersetApiClient:
             admin_username: Superset admin username.
             admin_password: Superset admin password.
             base_url: Superset base URL (default: http://localhost:8088).
-            timeout: Request timeout in seconds (default: 30).
+            connect_timeout: Connection timeout in seconds (default: 5).
+            read_timeout: Read timeout in seconds (default: 30).
+            pool_size: Number of pooled connections to keep (default: 10).
+            max_retries: Retries for transient failures (default: 3).
+            backoff_factor: Base of the exponential backoff between
+                retries, in seconds (default: 0.5).
         """
         self.base_url = base_url.rstrip("/")
         self._admin_username = admin_username
         self._admin_password = admin_password
-        self._timeout = timeout
-        self._session = requests.Session()
+        self._timeout = (connect_timeout, read_timeout)
+        self._session = build_session(pool_size, max_retries, backoff_factor)
         self._access_token: str | None = None
         self._refresh_token: str | None = None
         self._csrf_token: str | None = None
         self._access_exp: datetime | None = None
+        self._refresh_exp: datetime | None = None
+        # Serialises login/refresh when the client is shared across threads
+        self._auth_lock = threading.RLock()
+
+    def _request(
+        self, method: str, url: str, **kwargs: Any
+    ) -> requests.Response:
+        """Send an HTTP request on the pooled session and log its latency.
+
+        Args:
+            method: HTTP method.
+            url: Full request URL.
+            kwargs: Extra arguments passed to ``requests.Session.request``.
+
+        Returns:
+            The HTTP response.
+        """
+        endpoint = url.removeprefix(self.base_url).split("?", 1)[0]
+        start = time.monotonic()
+        status = None
+        try:
+            response = self._session.request(
+                method, url, timeout=self._timeout, **kwargs
+            )
+            status = response.status_code
+            return response
+        finally:
+            logger.debug(
+                "Superset API %s %s -> %s in %.1f ms",
+                method,
+                endpoint,
+                status,
+                (time.monotonic() - start) * 1000,
+            )
 
     def _authenticate(self) -> None:
         """Authenticate with Superset and get tokens.
@@ -103,9 +151,7 @@ class SupersetApiClient:
         }
 
         try:
-            response = self._session.post(
-                login_url, json=payload, timeout=self._timeout
-            )
+            response = self._request("POST", login_url, json=payload)
             response.raise_for_status()
         except requests.RequestException as e:
             logger.error("Authentication failed: %s", e)
@@ -119,6 +165,7 @@ class SupersetApiClient:
             raise SupersetApiError("Access or refresh token not received")
 
         self._update_access_expiry()
+        self._refresh_exp = self._decode_expiry(self._refresh_token)
         self._fetch_csrf_token()
 
         logger.info("Successfully authenticated with Superset")
@@ -133,9 +180,7 @@ class SupersetApiClient:
         headers = {"Authorization": f"Bearer {self._access_token}"}
 
         try:
-            response = self._session.get(
-                csrf_url, headers=headers, timeout=self._timeout
-            )
+            response = self._request("GET", csrf_url, headers=headers)
             response.raise_for_status()
 
             self._csrf_token = response.json().get("result")
@@ -163,9 +208,7 @@ class SupersetApiClient:
         }
 
         try:
-            response = self._session.post(
-                refresh_url, headers=headers, timeout=self._timeout
-            )
+            response = self._request("POST", refresh_url, headers=headers)
             response.raise_for_status()
         except requests.RequestException as e:
             logger.error("Token refresh failed: %s", e)
@@ -180,34 +223,126 @@ class SupersetApiClient:
 
         logger.info("Successfully refreshed access token")
 
-    def _update_access_expiry(self) -> None:
-        """Decode the access token and update the cached expiry timestamp."""
+    @staticmethod
+    def _decode_expiry(token: str | None) -> datetime | None:
+        """Decode the expiry timestamp of a JWT without verifying it.
+
+        Args:
+            token: Encoded JWT.
+
+        Returns:
+            Expiry as an aware datetime, or None if unknown.
+        """
         try:
-            payload = jwt.decode(
-                self._access_token, options={"verify_signature": False}
-            )
+            payload = jwt.decode(token, options={"verify_signature": False})
             exp = payload.get("exp")
             if exp:
-                self._access_exp = datetime.fromtimestamp(exp, timezone.utc)
+                return datetime.fromtimestamp(exp, timezone.utc)
         except Exception as e:
             logger.warning("Failed to decode JWT expiry: %s", e)
+        return None
+
+    def _update_access_expiry(self) -> None:
+        """Decode the access token and update the cached expiry timestamp."""
+        exp = self._decode_expiry(self._access_token)
+        if exp:
+            self._access_exp = exp
+
+    @staticmethod
+    def _is_expired(exp: datetime | None) -> bool:
+        """Check whether an expiry timestamp has passed, with a margin.
+
+        Args:
+            exp: Expiry timestamp, or None if unknown.
+
+        Returns:
+            True if the timestamp is known and (nearly) passed.
+        """
+        return bool(
+            exp and exp - TOKEN_EXPIRY_MARGIN <= datetime.now(timezone.utc)
+        )
 
     def _ensure_authenticated(self) -> None:
         """Ensure we have valid authentication, refreshing if needed."""
-        # Initial authentication
-        if not self._access_token:
-            self._authenticate()
+        with self._auth_lock:
+            # Initial authentication, or the refresh token itself has expired
+            if not self._access_token or self._is_expired(self._refresh_exp):
+                self._authenticate()
+                return
+
+            # Check if token is expired and refresh if needed
+            if self._is_expired(self._access_exp):
+                logger.debug("Access token expired, refreshing")
+                try:
+                    self._refresh_access_token()
+                except SupersetApiError:
+                    # If refresh fails, try full re-authentication
+                    logger.warning("Token refresh failed, re-authenticating")
+                    self._authenticate()
+
+    def export_tokens(self) -> dict[str, str] | None:
+        """Export the current authentication state for reuse across hooks.
+
+        The CSRF token is bound to the Superset session cookie, so the
+        session cookies are exported alongside the JWTs.
+
+        Returns:
+            Dict of string values suitable for Juju secret content, or
+            None if the client never authenticated.
+        """
+        if not (self._access_token and self._refresh_token):
+            return None
+
+        return {
+            "access-token": self._access_token,
+            "refresh-token": self._refresh_token,
+            "csrf-token": self._csrf_token or "",
+            "access-expiry": (
+                self._access_exp.isoformat() if self._access_exp else ""
+            ),
+            "refresh-expiry": (
+                self._refresh_exp.isoformat() if self._refresh_exp else ""
+            ),
+            "cookies": json.dumps(self._session.cookies.get_dict()),
+        }
+
+    def import_tokens(self, tokens: dict[str, str]) -> None:
+        """Restore authentication state saved by ``export_tokens``.
+
+        Malformed state is ignored, so the client falls back to logging in.
+
+        Args:
+            tokens: Dict previously returned by ``export_tokens``.
+        """
+        try:
+            access_exp = tokens.get("access-expiry")
+            refresh_exp = tokens.get("refresh-expiry")
+            cookies = json.loads(tokens.get("cookies") or "{}")
+            self._access_exp = (
+                datetime.fromisoformat(access_exp) if access_exp else None
+            )
+            self._refresh_exp = (
+                datetime.fromisoformat(refresh_exp) if refresh_exp else None
+            )
+            self._access_token = tokens["access-token"]
+            self._refresh_token = tokens["refresh-token"]
+            self._csrf_token = tokens.get("csrf-token") or None
+        except (KeyError, ValueError, TypeError) as e:
+            logger.warning("Ignoring malformed cached API tokens: %s", e)
+            self._clear_tokens()
             return
 
-        # Check if token is expired and refresh if needed
-        if self._access_exp and self._access_exp <= datetime.now(timezone.utc):
-            logger.debug("Access token expired, refreshing")
-            try:
-                self._refresh_access_token()
-            except SupersetApiError:
-                # If refresh fails, try full re-authentication
-                logger.warning("Token refresh failed, re-authenticating")
-                self._authenticate()
+        self._session.cookies.update(cookies)
+        logger.debug("Reusing cached Superset API tokens")
+
+    def _clear_tokens(self) -> None:
+        """Drop all authentication state so the next request logs in."""
+        self._access_token = None
+        self._refresh_token = None
+        self._csrf_token = None
+        self._access_exp = None
+        self._refresh_exp = None
+        self._session.cookies.clear()
 
     def _send_request(
         self,
@@ -231,7 +366,44 @@ class SupersetApiClient:
             SupersetApiError: If the request fails.
         """
         self._ensure_authenticated()
+        try:
+            return self._send_authenticated_request(
+                method, endpoint, params, payload
+            )
+        except SupersetApiError as e:
+            # Tokens restored from a previous hook may have been revoked,
+            # for example after a Superset secret key rotation.
+            if e.status_code != 401:
+                raise
+            logger.info("Cached API tokens rejected, re-authenticating")
+            with self._auth_lock:
+                self._clear_tokens()
+                self._authenticate()
+            return self._send_authenticated_request(
+                method, endpoint, params, payload
+            )
 
+    def _send_authenticated_request(
+        self,
+        method: str,
+        endpoint: str,
+        params: dict[str, Any] | None,
+        payload: dict[str, Any] | None,
+    ) -> dict[str, Any]:
+        """Send a request with the current tokens, without re-authenticating.
+
+        Args:
+            method: HTTP method (GET, POST, PUT, DELETE).
+            endpoint: API endpoint path.
+            params: URL query parameters.
+            payload: JSON payload for request body.
+
+        Returns:
+            Parsed JSON response.
+
+        Raises:
+            SupersetApiError: If the request fails.
+        """
         url = f"{self.base_url}{endpoint}"
         headers = {
             "Authorization": f"Bearer {self._access_token}",
@@ -241,19 +413,19 @@ class SupersetApiClient:
         }
 
         try:
-            response = self._session.request(
+            response = self._request(
                 method,
                 url,
                 params=params,
                 headers=headers,
                 json=payload,
-                timeout=self._timeout,
             )
             response.raise_for_status()
             return response.json()
 
         except requests.RequestException as e:
-            body = getattr(getattr(e, "response", None), "text", "")
+            response = getattr(e, "response", None)
+            body = getattr(response, "text", "")
             logger.error(
                 "Request error for %s %s: %s | response: %s",
                 method,
@@ -262,15 +434,103 @@ class SupersetApiClient:
                 body,
             )
             raise SupersetApiError(
-                f"API {method} {endpoint} request failed: {e}"
+                f"API {method} {endpoint} request failed: {e}",
+                status_code=getattr(response, "status_code", None),
             ) from e
 
+    def _get_page(
+        self,
+        endpoint: str,
+        page: int,
+        page_size: int,
+        filters: list[dict[str, Any]] | None,
+    ) -> dict[str, Any]:
+        """Fetch a single page from a paginated endpoint.
+
+        Args:
+            endpoint: API endpoint path.
+            page: Zero-based page number.
+            page_size: Number of results per page.
+            filters: Server-side filter dicts.
+
+        Returns:
+            Parsed JSON response for the page.
+        """
+        q_params: dict[str, Any] = {
+            "page": page,
+            "page_size": page_size,
+        }
+        if filters:
+            q_params["filters"] = filters
+
+        q = quote_plus(json.dumps(q_params))
+        return self._send_request("GET", f"{endpoint}?q={q}")
+
+    def _iter_paginated(
+        self,
+        endpoint: str,
+        filters: list[dict[str, Any]] | None = None,
+        page_size: int = MAX_PAGE_SIZE,
+        max_pages: int = MAX_PAGES,
+        prefetch: bool = False,
+    ) -> Iterator[dict[str, Any]]:
+        """Lazily yield results from a paginated endpoint.
+
+        Pages are only requested as the caller consumes results, so a
+        caller that stops early never fetches the remaining pages. With
+        ``prefetch``, the remaining pages are requested concurrently as
+        soon as the first page reports the total count; use it only when
+        the caller needs every result.
+
+        Args:
+            endpoint: API endpoint path.
+            filters: Server-side filter dicts, for example
+                ``[{"col": "name", "opr": "eq", "value": "Admin"}]``.
+            page_size: Number of results per page.
+            max_pages: Number of pages to fetch.
+            prefetch: Whether to fetch the remaining pages concurrently.
+
+        Yields:
+            Result dicts, in page order.
+        """
+        if max_pages <= 0:
+            return
+
+        response = self._get_page(endpoint, 0, page_size, filters)
+        yield from response.get("result", [])
+
+        total = response.get("count", 0)
+        pages = min(max_pages, math.ceil(total / page_size))
+        if pages <= 1:
+            return
+
+        if not prefetch:
+            for page in range(1, pages):
+                response = self._get_page(endpoint, page, page_size, filters)
+                yield from response.get("result", [])
+            return
+
+        pool = ThreadPoolExecutor(
+            max_workers=min(PREFETCH_WORKERS, pages - 1),
+            thread_name_prefix="superset-api-page",
+        )
+        try:
+            futures = [
+                pool.submit(self._get_page, endpoint, page, page_size, filters)
+                for page in range(1, pages)
+            ]
+            for future in futures:
+                yield from future.result().get("result", [])
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
     def _paginated_get(
         self,
         endpoint: str,
         filters: list[dict[str, Any]] | None = None,
         page_size: int = MAX_PAGE_SIZE,
         max_pages: int = MAX_PAGES,
+        prefetch: bool = False,
     ) -> list[dict[str, Any]]:
         """Fetch all results from a paginated endpoint.
 
@@ -283,32 +543,16 @@ class SupersetApiClient:
                 ``[{"col": "name", "opr": "eq", "value": "Admin"}]``.
             page_size: Number of results per page.
             max_pages: Number of pages to fetch.
+            prefetch: Whether to fetch the remaining pages concurrently.
 
         Returns:
             Combined list of all result dicts.
         """
-        all_results: list[dict[str, Any]] = []
-
-        for page in range(max_pages):
-            q_params: dict[str, Any] = {
-                "page": page,
-                "page_size": page_size,
-            }
-            if filters:
-                q_params["filters"] = filters
-
-            q = quote_plus(json.dumps(q_params))
-            response = self._send_request("GET", f"{endpoint}?q={q}")
-
-            results = response.get("result", [])
-            all_results.extend(results)
-
-            total = response.get("count", 0)
-            fetched = (page + 1) * page_size
-            if fetched >= total:
-                break
-
-        return all_results
+        return list(
+            self._iter_paginated(
+                endpoint, filters, page_size, max_pages, prefetch
+            )
+        )
 
     @staticmethod
     def _build_trino_connection_string(
@@ -341,18 +585,22 @@ class SupersetApiClient:
 
     @staticmethod
     def _get_default_trino_database_payload(
-        database_name: str, sqlalchemy_uri: str
+        database_name: str,
+        sqlalchemy_uri: str,
+        settings: TrinoDatabaseSettings | None = None,
     ) -> dict[str, Any]:
         """Get the default payload for creating a Trino database in Superset.
 
         Args:
             database_name: Name for the database in Superset.
             sqlalchemy_uri: SQLAlchemy connection URI.
+            settings: Charm-managed database settings.
 
         Returns:
             Default payload dict for Trino database creation.
         """
-        return {
+        settings = settings or TrinoDatabaseSettings()
+        payload = {
             "engine": "trino",
             "database_name": database_name,
             "configuration_method": "sqlalchemy_form",
@@ -362,18 +610,25 @@ class SupersetApiClient:
                 "supports_file_upload": True,
             },
             "extra": json.dumps(
-                {
-                    "allows_virtual_table_explore": True,
-                    "cost_estimate_enabled": True,
-                }
+                settings.merge_extra(
+                    {
+                        "allows_virtual_table_explore": True,
+                        "cost_estimate_enabled": True,
+                    }
+                )
             ),
             "expose_in_sqllab": True,
             "allow_run_async": True,
             "impersonate_user": True,
         }
+        if settings.cache_timeout is not None:
+            payload["cache_timeout"] = settings.cache_timeout
+        return payload
 
     def get_trino_databases(
-        self, metadata_db_uri: str
+        self,
+        metadata_db_uri: str,
+        metadata_db: MetadataDatabase | None = None,
     ) -> list[TrinoConnection]:
         """Get existing Trino database connections via a direct DB query.
 
@@ -383,6 +638,8 @@ class SupersetApiClient:
 
         Args:
             metadata_db_uri: SQLAlchemy URI for the Superset metadata database.
+            metadata_db: Pooled accessor to reuse; when omitted, a
+                throwaway one is disposed of after the query.
 
         Returns:
             List of TrinoConnection objects for all Trino databases.
@@ -390,21 +647,23 @@ class SupersetApiClient:
         Raises:
             SupersetApiError: If querying the metadata database fails.
         """
+        db = metadata_db or MetadataDatabase(pool_size=1)
         try:
-            engine = sqlalchemy.create_engine(metadata_db_uri)
-            with engine.connect() as conn:
-                rows = conn.execute(
-                    sqlalchemy.text(
-                        "SELECT id, database_name, sqlalchemy_uri "
-                        "FROM dbs "
-                        "WHERE sqlalchemy_uri LIKE 'trino://%%'"
-                    )
-                ).fetchall()
+            rows = db.execute(
+                metadata_db_uri,
+                "SELECT id, database_name, sqlalchemy_uri, "
+                "extra, cache_timeout "
+                "FROM dbs "
+                "WHERE sqlalchemy_uri LIKE 'trino://%%'",
+            )
         except SQLAlchemyError as e:
             logger.error("Failed to query Trino databases: %s", e)
             raise SupersetApiError(
                 f"Failed to query Trino databases: {e}"
             ) from None
+        finally:
+            if metadata_db is None:
+                db.dispose()
 
         connections = [
             TrinoConnection(
@@ -412,6 +671,8 @@ class SupersetApiClient:
                 database_name=row[1],
                 sqlalchemy_uri=row[2],
                 catalog=row[2].rsplit("/", 1)[-1].split("?")[0],
+                extra=row[3],
+                cache_timeout=row[4],
             )
             for row in rows
         ]
@@ -427,6 +688,7 @@ class SupersetApiClient:
         username: str,
         password: str,
         use_ssl: bool = True,
+        settings: TrinoDatabaseSettings | None = None,
     ) -> dict[str, Any]:
         """Create a Trino database connection in Superset.
 
@@ -437,6 +699,7 @@ class SupersetApiClient:
             username: Trino username.
             password: Trino password.
             use_ssl: Whether to use SSL for the connection.
+            settings: Charm-managed database settings.
 
         Returns:
             API response dict with created database info.
@@ -446,7 +709,7 @@ class SupersetApiClient:
         )
 
         payload = self._get_default_trino_database_payload(
-            database_name, sqlalchemy_uri
+            database_name, sqlalchemy_uri, settings
         )
 
         logger.info(
@@ -473,6 +736,7 @@ class SupersetApiClient:
         username: str,
         password: str,
         use_ssl: bool = True,
+        settings_payload: dict[str, Any] | None = None,
     ) -> dict[str, Any]:
         """Update URI for an existing Trino database.
 
@@ -483,6 +747,8 @@ class SupersetApiClient:
             username: Trino username.
             password: Trino password.
             use_ssl: Whether to use SSL for the connection.
+            settings_payload: Settings fields to update in the same
+                request, from ``TrinoDatabaseSettings.update_payload``.
 
         Returns:
             API response dict.
@@ -490,7 +756,10 @@ class SupersetApiClient:
         sqlalchemy_uri = self._build_trino_connection_string(
             host_port, trino_catalog, username, password, use_ssl
         )
-        payload = {"sqlalchemy_uri": sqlalchemy_uri}
+        payload = {
+            **(settings_payload or {}),
+            "sqlalchemy_uri": sqlalchemy_uri,
+        }
 
         response = self._send_request(
             "PUT",
@@ -505,6 +774,31 @@ class SupersetApiClient:
         )
         return response
 
+    def update_database_settings(
+        self, database_id: int, settings_payload: dict[str, Any]
+    ) -> dict[str, Any]:
+        """Update the settings of an existing database, keeping its URI.
+
+        Args:
+            database_id: Superset database ID.
+            settings_payload: Fields from ``TrinoDatabaseSettings.update_payload``.
+
+        Returns:
+            API response dict.
+        """
+        response = self._send_request(
+            "PUT",
+            f"/api/v1/database/{database_id}",
+            payload=settings_payload,
+        )
+
+        logger.info(
+            "Updated settings %s of database id=%s",
+            sorted(settings_payload),
+            database_id,
+        )
+        return response
+
     def get_role_id(self, role_name: str) -> int | None:
         """Find a role by name and return its ID.
 
@@ -514,15 +808,17 @@ class SupersetApiClient:
         Returns:
             Role ID if found, None otherwise.
         """
-        results = self._paginated_get(
+        results = self._iter_paginated(
             "/api/v1/security/roles/",
             filters=[{"col": "name", "opr": "eq", "value": role_name}],
         )
 
-        if results:
-            role_id = results[0].get("id")
+        # Only the first match is needed, so later pages are never fetched
+        for role in results:
+            role_id = role.get("id")
             if role_id:
                 return role_id
+            break
 
         logger.warning("Role '%s' not found via Superset API", role_name)
         return None
@@ -532,9 +828,11 @@ class SupersetApiClient:
     ) -> int | None:
         """Find the permission_view_menu ID for database_access on a database.
 
-        Paginates through ``GET /api/v1/security/permissions-resources/``
-        to find the entry where ``permission.name == 'database_access'``
-        and ``view_menu.name`` contains the database name.
+        Filters ``GET /api/v1/security/permissions-resources/`` server-side
+        on ``permission.name`` and ``view_menu.name`` so only candidate rows
+        are returned, then picks the entry where
+        ``permission.name == 'database_access'`` and ``view_menu.name``
+        contains the database name.
 
         Args:
             database_name: The Superset database name.
@@ -542,15 +840,27 @@ class SupersetApiClient:
         Returns:
             The permission_view_menu ID if found, None otherwise.
         """
-        results = self._paginated_get(
-            "/api/v1/security/permissions-resources/"
+        results = self._iter_paginated(
+            PERMISSIONS_RESOURCES_ENDPOINT,
+            filters=[
+                {
+                    "col": "permission.name",
+                    "opr": "ct",
+                    "value": DATABASE_ACCESS_PERMISSION,
+                },
+                {
+                    "col": "view_menu.name",
+                    "opr": "ct",
+                    "value": f"[{database_name}]",
+                },
+            ],
         )
 
         for perm in results:
             perm_name = perm.get("permission", {}).get("name", "")
             view_name = perm.get("view_menu", {}).get("name", "")
             if (
-                perm_name == "database_access"
+                perm_name == DATABASE_ACCESS_PERMISSION
                 and f"[{database_name}]" in view_name
             ):
                 return perm["id"]
@@ -560,6 +870,45 @@ class SupersetApiClient:
         )
         return None
 
+    def get_database_access_permission_index(self) -> dict[str, int]:
+        """Map every database name to its database_access permission ID.
+
+        Fetches only ``database_access`` rows in a single filtered pass,
+        which is cheaper than one lookup per database when many databases
+        are created in the same sync. Every page is needed, so pages after
+        the first are prefetched concurrently.
+
+        Returns:
+            Dict of Superset database name to permission_view_menu ID.
+        """
+        results = self._iter_paginated(
+            PERMISSIONS_RESOURCES_ENDPOINT,
+            filters=[
+                {
+                    "col": "permission.name",
+                    "opr": "ct",
+                    "value": DATABASE_ACCESS_PERMISSION,
+                }
+            ],
+            prefetch=True,
+        )
+
+        index: dict[str, int] = {}
+        for perm in results:
+            if (
+                perm.get("permission", {}).get("name", "")
+                != DATABASE_ACCESS_PERMISSION
+            ):
+                continue
+            match = DATABASE_ACCESS_VIEW_PATTERN.match(
+                perm.get("view_menu", {}).get("name", "")
+            )
+            if match:
+                index.setdefault(match.group("name"), perm["id"])
+
+        logger.debug("Indexed %d database_access permissions", len(index))
+        return index
+
     def get_role_permission_ids(self, role_id: int) -> list[int]:
         """Get the current permission_view_menu IDs for a role.
 
@@ -577,30 +926,39 @@ class SupersetApiClient:
 
         return [p["id"] for p in results if isinstance(p, dict) and "id" in p]
 
-    def update_role_permissions(
-        self, role_id: int, permission_view_menu_id: int
-    ) -> None:
-        """Grant a permission to a role, preserving existing permissions.
+    def grant_role_permissions(
+        self, role_id: int, permission_view_menu_ids: list[int]
+    ) -> list[int]:
+        """Grant several permissions to a role in one update.
 
-        Fetches the role's current permission IDs, skips if already
-        present, otherwise POSTs the full list (existing + new).
+        Fetches the role's current permission IDs once and, if any of the
+        requested IDs are missing, POSTs the union back in a single call.
 
         Args:
             role_id: The Superset role ID.
-            permission_view_menu_id: The permission_view_menu ID to grant.
+            permission_view_menu_ids: The permission_view_menu IDs to grant.
+
+        Returns:
+            The IDs that were actually added, in request order.
         """
         existing_ids = self.get_role_permission_ids(role_id)
+        existing = set(existing_ids)
+
+        added: list[int] = []
+        for perm_id in permission_view_menu_ids:
+            if perm_id not in existing:
+                existing.add(perm_id)
+                added.append(perm_id)
 
-        if permission_view_menu_id in existing_ids:
+        if not added:
             logger.debug(
-                "Permission %s already granted to role %s, skipping",
-                permission_view_menu_id,
+                "Permissions %s already granted to role %s, skipping",
+                list(permission_view_menu_ids),
                 role_id,
             )
-            return
+            return added
 
-        all_ids = existing_ids + [permission_view_menu_id]
-        payload = {"permission_view_menu_ids": all_ids}
+        payload = {"permission_view_menu_ids": existing_ids + added}
 
         self._send_request(
             "POST",
@@ -608,8 +966,16 @@ class SupersetApiClient:
             payload=payload,
         )
 
-        logger.info(
-            "Granted permission %s to role %s",
-            permission_view_menu_id,
-            role_id,
-        )
+        logger.info("Granted permissions %s to role %s", added, role_id)
+        return added
+
+    def update_role_permissions(
+        self, role_id: int, permission_view_menu_id: int
+    ) -> None:
+        """Grant a permission to a role, preserving existing permissions.
+
+        Args:
+            role_id: The Superset role ID.
+            permission_view_menu_id: The permission_view_menu ID to grant.
+        """
+        self.grant_role_permissions(role_id, [permission_view_menu_id])
@@ -0,0 +1,98 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Superset database connections to Trino catalogs and their settings."""
+
+import json
+from dataclasses import dataclass
+from typing import Any
+
+
+@dataclass(frozen=True)
+class TrinoConnection:
+    """Represents a Trino database connection in Superset.
+
+    Attributes:
+        id: Superset database connection ID.
+        database_name: Name of the database connection in Superset.
+        sqlalchemy_uri: Full SQLAlchemy URI for the connection.
+        catalog: Trino catalog name extracted from the URI.
+        extra: JSON ``extra`` settings of the connection.
+        cache_timeout: Default chart data cache timeout in seconds.
+    """
+
+    id: int
+    database_name: str
+    sqlalchemy_uri: str
+    catalog: str
+    extra: str | None = None
+    cache_timeout: int | None = None
+
+
+@dataclass(frozen=True)
+class TrinoDatabaseSettings:
+    """Charm-managed settings of auto-created Trino databases.
+
+    Settings left as None are not managed, so any value set in the
+    Superset UI is preserved.
+
+    Attributes:
+        request_timeout: Trino HTTP request timeout in seconds.
+        metadata_cache_timeout: Schema and table list cache TTL in seconds.
+        cache_timeout: Default chart data cache timeout in seconds.
+    """
+
+    request_timeout: int | None = None
+    metadata_cache_timeout: int | None = None
+    cache_timeout: int | None = None
+
+    def merge_extra(self, extra: dict[str, Any]) -> dict[str, Any]:
+        """Merge the managed settings into a database's ``extra``.
+
+        Args:
+            extra: Current ``extra`` settings; left unmodified.
+
+        Returns:
+            New ``extra`` settings.
+        """
+        merged = json.loads(json.dumps(extra))
+        if self.request_timeout is not None:
+            engine_params = merged.setdefault("engine_params", {})
+            connect_args = engine_params.setdefault("connect_args", {})
+            connect_args["request_timeout"] = self.request_timeout
+        if self.metadata_cache_timeout is not None:
+            merged["metadata_cache_timeout"] = {
+                "schema_cache_timeout": self.metadata_cache_timeout,
+                "table_cache_timeout": self.metadata_cache_timeout,
+            }
+        return merged
+
+    def update_payload(
+        self, extra: str | None, cache_timeout: int | None
+    ) -> dict[str, Any]:
+        """Build the update fields needed to apply the settings.
+
+        Args:
+            extra: Current JSON ``extra`` settings of the database.
+            cache_timeout: Current chart data cache timeout.
+
+        Returns:
+            Fields to update, empty if the settings are already applied.
+        """
+        try:
+            current = json.loads(extra or "{}")
+        except ValueError:
+            current = {}
+        if not isinstance(current, dict):
+            current = {}
+
+        payload: dict[str, Any] = {}
+        merged = self.merge_extra(current)
+        if merged != current:
+            payload["extra"] = json.dumps(merged)
+        if (
+            self.cache_timeout is not None
+            and cache_timeout != self.cache_timeout
+        ):
+            payload["cache_timeout"] = self.cache_timeout
+        return payload
@@ -0,0 +1,288 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Desired-state planner for the Trino catalog sync.
+
+Compares the catalogs advertised on the trino-catalog relation with the
+Trino connections already registered in Superset and produces the
+minimal set of changes needed to reconcile the two.
+"""
+
+import enum
+import hashlib
+import json
+from dataclasses import asdict, dataclass, field
+from typing import Any
+from urllib.parse import quote_plus, unquote, urlsplit
+
+from trino_database import TrinoConnection, TrinoDatabaseSettings
+
+
+class SyncAction(str, enum.Enum):
+    """Change applied to a single Superset database connection.
+
+    Attributes:
+        CREATE: Create a connection for a catalog that has none.
+        UPDATE_URI: Point an existing connection at a new Trino host:port.
+        ROTATE_CREDENTIALS: Re-apply credentials to an existing connection.
+        UPDATE_SETTINGS: Apply charm-managed settings to a connection.
+    """
+
+    CREATE = "create"
+    UPDATE_URI = "update-uri"
+    ROTATE_CREDENTIALS = "rotate-credentials"
+    UPDATE_SETTINGS = "update-settings"
+
+
+@dataclass(frozen=True)
+class DesiredDatabase:
+    """Superset database connection expected for a Trino catalog.
+
+    Attributes:
+        catalog: Trino catalog name.
+        database_name: Display name of the database in Superset.
+        host_port: Trino server host:port.
+        username: Trino username.
+        settings: Charm-managed database settings.
+    """
+
+    catalog: str
+    database_name: str
+    host_port: str
+    username: str
+    settings: TrinoDatabaseSettings = TrinoDatabaseSettings()
+
+
+@dataclass(frozen=True)
+class SyncChange:
+    """A single planned change.
+
+    Attributes:
+        action: Change to apply.
+        catalog: Trino catalog name.
+        database_name: Name of the database in Superset.
+        database_id: Superset database ID, None for creates.
+        settings_payload: Settings fields updated along with the change.
+    """
+
+    action: SyncAction
+    catalog: str
+    database_name: str
+    database_id: int | None = None
+    settings_payload: dict[str, Any] | None = None
+
+    def to_dict(self) -> dict:
+        """Serialise the change for action output.
+
+        Returns:
+            Dict representation of the change.
+        """
+        return {
+            "action": self.action.value,
+            "catalog": self.catalog,
+            "database-name": self.database_name,
+            "database-id": self.database_id,
+            "settings": sorted(self.settings_payload or {}),
+        }
+
+
+@dataclass
+class SyncPlan:
+    """Minimal set of changes reconciling Superset with the relation.
+
+    Attributes:
+        changes: Connection changes, in catalog order.
+        grants: Database names to grant database_access for once created.
+    """
+
+    changes: list[SyncChange] = field(default_factory=list)
+    grants: list[str] = field(default_factory=list)
+
+    @property
+    def empty(self) -> bool:
+        """Whether the plan has nothing to apply."""
+        return not self.changes
+
+    def to_dict(self) -> dict:
+        """Serialise the plan for action output.
+
+        Returns:
+            Dict representation of the plan.
+        """
+        return {
+            "changes": [change.to_dict() for change in self.changes],
+            "grants": list(self.grants),
+        }
+
+
+def catalog_display_name(catalog_name: str) -> str:
+    """Generate Superset database name from a catalog.
+
+    Example: google_ads -> "Google Ads (google_ads)".
+
+    Args:
+        catalog_name: Raw Trino catalog name (e.g. google_ads).
+
+    Returns:
+        Display name for the Superset database connection.
+    """
+    title = catalog_name.replace("_", " ").title()
+    return f"{title} ({catalog_name})"
+
+
+def build_desired_state(
+    catalog_names: list[str],
+    host_port: str,
+    username: str,
+    settings: TrinoDatabaseSettings | None = None,
+) -> dict[str, DesiredDatabase]:
+    """Build the desired-state model from the relation data.
+
+    Args:
+        catalog_names: Trino catalog names advertised on the relation.
+        host_port: Trino server host:port.
+        username: Trino username.
+        settings: Charm-managed database settings.
+
+    Returns:
+        Dict of catalog name to its desired database, in relation order.
+    """
+    return {
+        name: DesiredDatabase(
+            catalog=name,
+            database_name=catalog_display_name(name),
+            host_port=host_port,
+            username=username,
+            settings=settings or TrinoDatabaseSettings(),
+        )
+        for name in catalog_names
+    }
+
+
+def desired_state_digest(desired: dict[str, DesiredDatabase]) -> str:
+    """Compute a stable digest of the desired state.
+
+    Args:
+        desired: Desired-state model from ``build_desired_state``.
+
+    Returns:
+        Hex SHA-256 digest, independent of catalog order.
+    """
+    rows = sorted(
+        (
+            db.catalog,
+            db.database_name,
+            db.host_port,
+            db.username,
+            sorted(asdict(db.settings).items()),
+        )
+        for db in desired.values()
+    )
+    return hashlib.sha256(json.dumps(rows).encode()).hexdigest()
+
+
+def index_connections(
+    connections: list[TrinoConnection],
+) -> dict[str, list[TrinoConnection]]:
+    """Index existing Superset connections by Trino catalog.
+
+    Args:
+        connections: Connections returned by ``get_trino_databases``.
+
+    Returns:
+        Dict of catalog name to its connections.
+    """
+    index: dict[str, list[TrinoConnection]] = {}
+    for conn in connections:
+        index.setdefault(conn.catalog, []).append(conn)
+    return index
+
+
+def _uri_endpoint(sqlalchemy_uri: str) -> tuple[str, str]:
+    """Extract the host:port and username from a Trino URI.
+
+    Args:
+        sqlalchemy_uri: SQLAlchemy URI of a Superset connection.
+
+    Returns:
+        Tuple of (host:port, username as written in the URI).
+    """
+    userinfo, _, host_port = urlsplit(sqlalchemy_uri).netloc.rpartition("@")
+    return host_port, userinfo.partition(":")[0]
+
+
+def _same_user(uri_user: str, username: str) -> bool:
+    """Check whether a URI username refers to the given user.
+
+    The charm writes usernames with ``quote_plus`` while Superset may
+    re-render them percent-encoded, so both forms are accepted.
+
+    Args:
+        uri_user: Username as written in the URI.
+        username: Expected Trino username.
+
+    Returns:
+        True if the URI username matches.
+    """
+    return uri_user == quote_plus(username) or unquote(uri_user) == username
+
+
+def plan_sync(
+    desired: dict[str, DesiredDatabase],
+    existing: list[TrinoConnection],
+    force_credentials: bool = False,
+) -> SyncPlan:
+    """Plan the changes reconciling Superset with the desired state.
+
+    Catalogs without a connection are created and granted to the
+    self-registration role. Connections on another host:port get their
+    URI updated, and connections using another username (or every
+    connection, when force_credentials is set) get their credentials
+    rotated. Connections whose managed settings differ get them updated,
+    along with any URI change. Connections for catalogs no longer on the
+    relation are left untouched.
+
+    Args:
+        desired: Desired-state model from ``build_desired_state``.
+        existing: Connections returned by ``get_trino_databases``.
+        force_credentials: If True, rotate credentials on every connection.
+
+    Returns:
+        The sync plan.
+    """
+    plan = SyncPlan()
+    index = index_connections(existing)
+
+    for catalog, want in desired.items():
+        connections = index.get(catalog)
+        if not connections:
+            plan.changes.append(
+                SyncChange(SyncAction.CREATE, catalog, want.database_name)
+            )
+            plan.grants.append(want.database_name)
+            continue
+
+        for conn in connections:
+            host_port, user = _uri_endpoint(conn.sqlalchemy_uri)
+            settings_payload = want.settings.update_payload(
+                conn.extra, conn.cache_timeout
+            )
+            if host_port != want.host_port:
+                action = SyncAction.UPDATE_URI
+            elif force_credentials or not _same_user(user, want.username):
+                action = SyncAction.ROTATE_CREDENTIALS
+            elif settings_payload:
+                action = SyncAction.UPDATE_SETTINGS
+            else:
+                continue
+            plan.changes.append(
+                SyncChange(
+                    action,
+                    catalog,
+                    conn.database_name,
+                    conn.id,
+                    settings_payload or None,
+                )
+            )
+
+    return plan
@@ -7,16 +7,115 @@
 import logging
 import os
 import re
+import shutil
+import tempfile
+import threading
+import time
 from pathlib import Path
+from string import Template
 
-from sqlalchemy import create_engine
+import yaml
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine, Row
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.pool import QueuePool
 
-from literals import CONFIG_FILES, CONFIG_PATH
+from literals import (
+    ALERT_RULES_DIR_NAME,
+    ALERT_RULES_PATH,
+    CONFIG_FILES,
+    CONFIG_PATH,
+    METADATA_DB_POOL_SIZE,
+    METADATA_DB_POOL_TIMEOUT,
+    SLO_ALERT_RULES_FILE,
+    STATSD_MAPPING_FILE,
+    STATSD_MAPPING_PATH,
+)
 
 logger = logging.getLogger(__name__)
 
 
+class MetadataDatabase:
+    """Pooled access to the Superset metadata database.
+
+    One engine is cached per URI, so every query made during a single
+    Juju dispatch shares a small pool of connections instead of paying a
+    new connect and authentication handshake each time. The owner must
+    call ``dispose`` once the dispatch is done.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = METADATA_DB_POOL_SIZE,
+        pool_timeout: int = METADATA_DB_POOL_TIMEOUT,
+    ):
+        """Construct.
+
+        Args:
+            pool_size: Connections kept open per engine.
+            pool_timeout: Seconds to wait for a free pooled connection.
+        """
+        self._pool_size = pool_size
+        self._pool_timeout = pool_timeout
+        self._engines: dict[str, Engine] = {}
+        self._lock = threading.Lock()
+
+    def engine(self, uri: str) -> Engine:
+        """Get the cached engine for a database URI.
+
+        Args:
+            uri: database uri string.
+
+        Returns:
+            Engine with a small pre-pinged connection pool.
+        """
+        with self._lock:
+            engine = self._engines.get(uri)
+            if engine is None:
+                engine = create_engine(
+                    uri,
+                    poolclass=QueuePool,
+                    pool_size=self._pool_size,
+                    max_overflow=0,
+                    pool_timeout=self._pool_timeout,
+                    pool_pre_ping=True,
+                )
+                self._engines[uri] = engine
+            return engine
+
+    def execute(self, uri: str, sql: str) -> list[Row]:
+        """Run a query and fetch every row, logging its duration.
+
+        Args:
+            uri: database uri string.
+            sql: SQL query to execute.
+
+        Returns:
+            List of returned rows.
+
+        Raises:
+            SQLAlchemyError: if the query fails.
+        """
+        start = time.monotonic()
+        try:
+            with self.engine(uri).connect() as connection:
+                return connection.execute(text(sql)).fetchall()
+        finally:
+            logger.debug(
+                "Metadata query took %.1f ms: %s",
+                (time.monotonic() - start) * 1000,
+                " ".join(sql.split())[:80],
+            )
+
+    def dispose(self) -> None:
+        """Close every pooled connection and forget the engines."""
+        with self._lock:
+            engines = list(self._engines.values())
+            self._engines.clear()
+        for engine in engines:
+            engine.dispose()
+
+
 def charm_path(file_path):
     """Get path for Charm.
 
@@ -61,24 +160,116 @@ def load_superset_files(container):
         push_files(container, f"templates/{file}", f"{path}/{file}", 0o744)
 
 
-def query_metadata_database(uri, sql):
+def load_statsd_mapping(container, buckets):
+    """Push the statsd_exporter mapping with the given histogram buckets.
+
+    Args:
+        container: the application container
+        buckets: histogram bucket upper bounds, in seconds
+
+    Returns:
+        True if the mapping pushed differs from the one in the container.
+    """
+    with open(charm_path(f"templates/{STATSD_MAPPING_FILE}"), "r") as file:
+        mapping = yaml.safe_load(file)
+    mapping["defaults"]["histogram_options"]["buckets"] = list(buckets)
+    content = yaml.safe_dump(mapping, sort_keys=False)
+
+    if container.exists(STATSD_MAPPING_PATH):
+        if container.pull(STATSD_MAPPING_PATH).read() == content:
+            return False
+
+    container.push(
+        STATSD_MAPPING_PATH, content, make_dirs=True, permissions=0o644
+    )
+    return True
+
+
+def render_slo_alert_rules(thresholds):
+    """Render the SLO alert rules with the configured thresholds.
+
+    Args:
+        thresholds: threshold by config option name; rules whose threshold
+            is 0 are left out.
+
+    Returns:
+        The alert rules file content.
+    """
+    with open(charm_path(f"templates/{SLO_ALERT_RULES_FILE}"), "r") as file:
+        rules_file = yaml.safe_load(file)
+
+    for group in rules_file["groups"]:
+        rules = []
+        for rule in group["rules"]:
+            threshold = thresholds[rule.pop("slo")]
+            if not threshold:
+                continue
+            rule["expr"] = Template(rule["expr"]).safe_substitute(
+                threshold=threshold
+            )
+            for key, value in rule["annotations"].items():
+                rule["annotations"][key] = Template(value).safe_substitute(
+                    threshold=threshold
+                )
+            rules.append(rule)
+        group["rules"] = rules
+    return yaml.safe_dump(rules_file, sort_keys=False, width=float("inf"))
+
+
+def write_alert_rules(thresholds):
+    """Gather the static and SLO alert rules for MetricsEndpointProvider.
+
+    The rules are written outside the charm directory, so rendered files
+    never end up in the charm source tree.
+
+    Args:
+        thresholds: threshold by config option name, or None to keep the
+            SLO rules previously rendered.
+
+    Returns:
+        The directory holding the alert rules.
+    """
+    rules_dir = Path(tempfile.gettempdir(), ALERT_RULES_DIR_NAME)
+    slo_path = rules_dir / SLO_ALERT_RULES_FILE
+    previous = slo_path.read_text() if slo_path.exists() else None
+    content = previous
+    if thresholds is not None:
+        content = render_slo_alert_rules(thresholds)
+
+    shutil.rmtree(rules_dir, ignore_errors=True)
+    shutil.copytree(
+        charm_path(ALERT_RULES_PATH),
+        rules_dir,
+        ignore=shutil.ignore_patterns("*.md"),
+    )
+    if content is not None:
+        slo_path.write_text(content)
+    if content != previous:
+        logger.info("SLO alert rules updated")
+    return str(rules_dir)
+
+
+def query_metadata_database(uri, sql, metadata_db=None):
     """Query metadata database.
 
     Args:
         uri: database uri string.
         sql: SQL query to execute.
+        metadata_db: MetadataDatabase to reuse; when omitted, a
+            throwaway one is created and disposed of after the query.
 
     Return:
         List of returned values.
     """
+    db = metadata_db or MetadataDatabase(pool_size=1)
     try:
-        engine = create_engine(uri)
-        with engine.connect() as connection:
-            result = connection.execute(sql)
-            return [row[0] for row in result.fetchall()]
+        return [row[0] for row in db.execute(uri, sql)]
     except SQLAlchemyError as e:
         logger.exception("Error accessing database: %s", str(e))
         return []
+    finally:
+        if metadata_db is None:
+            db.dispose()
 
 
 def get_supported_feature_flags():
@@ -45,10 +45,10 @@ if [[ "${CHARM_FUNCTION}" == "worker" ]]; then
   if [[ "${CELERY_WORKER_CONCURRENCY:-0}" != "0" ]]; then
     celery_worker_args+=("--concurrency=${CELERY_WORKER_CONCURRENCY}")
   fi
-  celery --app=superset.tasks.celery_app:app worker -O fair -l INFO --uid 0 --without-mingle "${celery_worker_args[@]}"
+  celery --app=superset.tasks.celery_app:app worker -O fair -l "${CELERY_LOG_LEVEL:-INFO}" --uid 0 --without-mingle "${celery_worker_args[@]}"
 elif [[ "${CHARM_FUNCTION}" == "beat" ]]; then
   echo "Starting Celery beat..."
-  celery --app=superset.tasks.celery_app:app beat --pidfile /tmp/celerybeat.pid -l INFO -s "${SUPERSET_HOME}"/celerybeat-schedule
+  celery --app=superset.tasks.celery_app:app beat --pidfile /tmp/celerybeat.pid -l "${CELERY_LOG_LEVEL:-INFO}" -s "${SUPERSET_HOME}"/celerybeat-schedule
 elif [[ "${CHARM_FUNCTION}" == "app" ]]; then
   echo "Starting web app..."
   flask run -p 8088 --with-threads --reload --debugger --host=0.0.0.0
@@ -19,11 +19,31 @@
 #
 HYPHEN_SYMBOL='-'
 SUPERSET_APP='superset.app'
+GUNICORN_CONFIG="${GUNICORN_CONFIG:-/app/pythonpath/gunicorn_config.py}"
+
+# Report request, status and worker metrics to the local statsd_exporter
+GUNICORN_EXTRA_ARGS=()
+if [ -n "${STATSD_PORT}" ]; then
+    GUNICORN_EXTRA_ARGS+=(
+        --statsd-host "localhost:${STATSD_PORT}"
+        --statsd-prefix "${STATSD_PREFIX:-superset}"
+    )
+fi
+# One JSON object per access log line, matching the application logs
+if [ "${LOG_FORMAT}" == "json" ]; then
+    GUNICORN_EXTRA_ARGS+=(
+        --access-logformat '{"time": "%(t)s", "remote": "%(h)s", "method": "%(m)s", "path": "%(U)s", "status": "%(s)s", "bytes": "%(B)s", "duration_us": "%(D)s"}'
+    )
+fi
+if [ -f "${GUNICORN_CONFIG}" ]; then
+    GUNICORN_EXTRA_ARGS+=(--config "${GUNICORN_CONFIG}")
+fi
 
 gunicorn \
     --bind "${SUPERSET_BIND_ADDRESS:-0.0.0.0}:${SUPERSET_PORT:-8088}" \
     --access-logfile "${ACCESS_LOG_FILE:-$HYPHEN_SYMBOL}" \
     --error-logfile "${ERROR_LOG_FILE:-$HYPHEN_SYMBOL}" \
+    --log-level "${GUNICORN_LOG_LEVEL:-info}" \
     --workers "${SERVER_WORKER_AMOUNT:-1}" \
     --worker-class "${SERVER_WORKER_CLASS:-gevent}" \
     --worker-connections "${SERVER_WORKER_CONNECTIONS:-1000}" \
@@ -33,4 +53,5 @@ gunicorn \
     --max-requests-jitter "${WORKER_MAX_REQUESTS_JITTER:-100}" \
     --limit-request-line "${SERVER_LIMIT_REQUEST_LINE:-0}" \
     --limit-request-field_size "${SERVER_LIMIT_REQUEST_FIELD_SIZE:-0}" \
+    "${GUNICORN_EXTRA_ARGS[@]}" \
     "${FLASK_APP:-$SUPERSET_APP}:create_app()"
@@ -0,0 +1,56 @@
+"""Report how long Celery tasks wait in the queue before they start."""
+
+import socket
+import time
+
+from celery.signals import before_task_publish, task_prerun
+
+# Message header stamped by the publisher, in seconds since the epoch
+PUBLISHED_AT_HEADER = "superset_published_at"
+
+# Mapped to the celery_task_queue_wait_seconds histogram by statsd_exporter
+QUEUE_WAIT_METRIC = "superset.celery.queue_wait"
+
+
+def _format_queue_wait(task_name, seconds):
+    """Format a queue-wait timing as a DogStatsD datagram.
+
+    The task name is sent as a tag rather than in the metric name, as
+    Celery task names contain dots.
+
+    Args:
+        task_name: name of the Celery task.
+        seconds: time the task spent in the queue.
+
+    Returns:
+        The datagram.
+    """
+    return f"{QUEUE_WAIT_METRIC}:{seconds * 1000:.3f}|ms|#name:{task_name}".encode()
+
+
+def attach_queue_wait_metrics(host, port):
+    """Stamp published tasks and report their queue wait when they start.
+
+    Args:
+        host: statsd_exporter host.
+        port: statsd_exporter UDP port.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    address = (host, int(port))
+
+    @before_task_publish.connect(weak=False)
+    def _stamp_published_at(headers=None, **kwargs):
+        if headers is not None:
+            headers.setdefault(PUBLISHED_AT_HEADER, time.time())
+
+    @task_prerun.connect(weak=False)
+    def _report_queue_wait(task=None, **kwargs):
+        published_at = getattr(task.request, PUBLISHED_AT_HEADER, None)
+        if published_at is None:
+            return
+        wait = max(time.time() - float(published_at), 0.0)
+        try:
+            sock.sendto(_format_queue_wait(task.name, wait), address)
+        except OSError:
+            # Metrics must never fail a task
+            pass
@@ -0,0 +1,61 @@
+"""Gunicorn server hooks for the Superset web server."""
+
+import threading
+
+# Seconds between reports of the capacity. The statsd exporter only keeps
+# the gauges it received since it started, so they are sent again.
+CAPACITY_INTERVAL = 30
+
+
+def _report_capacity(server, workers):
+    """Report how many requests the server can serve concurrently.
+
+    Gunicorn's statsd instrumentation reports the number of workers but not
+    the requests each of them takes, so the capacity is published alongside
+    to compute worker saturation.
+
+    Args:
+        server: the Gunicorn arbiter.
+        workers: number of workers.
+    """
+    gauge = getattr(server.log, "gauge", None)
+    if gauge is None:
+        # statsd is not configured
+        return
+    gauge("gunicorn.capacity", workers * server.cfg.worker_connections)
+
+
+def _report_capacity_periodically(server, stopped):
+    """Report the capacity every CAPACITY_INTERVAL until stopped.
+
+    Args:
+        server: the Gunicorn arbiter.
+        stopped: event set to stop reporting.
+    """
+    while not stopped.wait(CAPACITY_INTERVAL):
+        _report_capacity(server, server.num_workers)
+
+
+def when_ready(server):
+    """Keep reporting the capacity from the master process.
+
+    Args:
+        server: the Gunicorn arbiter.
+    """
+    threading.Thread(
+        target=_report_capacity_periodically,
+        args=(server, threading.Event()),
+        name="gunicorn-capacity",
+        daemon=True,
+    ).start()
+
+
+def nworkers_changed(server, new_value, old_value):
+    """Report the capacity as soon as the number of workers changes.
+
+    Args:
+        server: the Gunicorn arbiter.
+        new_value: number of workers after the change.
+        old_value: number of workers before the change, or None at startup.
+    """
+    _report_capacity(server, new_value)
@@ -0,0 +1,213 @@
+"""Queue-backed logging for Superset processes.
+
+Log records are put on an in-memory queue and written by a listener
+thread, so logging calls on the request path never wait for stream or
+file I/O.
+
+Gunicorn's gevent workers monkey-patch threading, which turns threads into
+greenlets running on the loop that serves requests. There, the listener
+runs in an operating system thread of a gevent thread pool instead, and
+reads from a queue gevent has not patched.
+"""
+
+import atexit
+import datetime
+import json
+import logging
+import os
+import queue
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    TimedRotatingFileHandler,
+)
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line."""
+
+    def format(self, record):
+        """Format a record.
+
+        Args:
+            record: the log record.
+
+        Returns:
+            The record as a JSON object.
+        """
+        entry = {
+            "time": datetime.datetime.fromtimestamp(
+                record.created, tz=datetime.timezone.utc
+            ).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
+
+
+class LocalQueueHandler(QueueHandler):
+    """Queue handler for a listener in the same process.
+
+    The standard handler formats records before queuing them so they can
+    be pickled. Records stay in-process here, so only the message is
+    resolved, as its arguments may change once queued, and formatting is
+    left to the listener thread.
+    """
+
+    def prepare(self, record):
+        """Prepare a record for queuing.
+
+        Args:
+            record: the log record.
+
+        Returns:
+            The record, with its message resolved.
+        """
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _gevent_monkey():
+    """Import gevent's monkey-patching module, if gevent is installed.
+
+    Returns:
+        The module, or None.
+    """
+    try:
+        from gevent import monkey
+    except ImportError:
+        return None
+    return monkey
+
+
+def _simple_queue():
+    """Create a queue that operating system threads can share.
+
+    Returns:
+        The standard library SimpleQueue, even if gevent patched it.
+    """
+    monkey = _gevent_monkey()
+    if monkey is None:
+        return queue.SimpleQueue()
+    return monkey.get_original("queue", "SimpleQueue")()
+
+
+class ThreadPoolQueueListener(QueueListener):
+    """Queue listener running in a gevent thread pool.
+
+    Attributes:
+        pool: single-thread pool the listener runs in, once started.
+    """
+
+    pool = None
+
+    def start(self):
+        """Start writing queued records in an operating system thread."""
+        from gevent.threadpool import ThreadPool
+
+        self.pool = ThreadPool(1)
+        self._thread = self.pool.spawn(self._monitor)
+
+    def stop(self):
+        """Write the records still queued and stop the thread."""
+        self.enqueue_sentinel()
+        self._thread.get()
+        self._thread = None
+        self.pool.kill()
+        self.pool = None
+
+
+def _listener_class():
+    """Pick the listener class for the threading in use.
+
+    Returns:
+        ThreadPoolQueueListener if gevent patched threading, else
+        QueueListener.
+    """
+    monkey = _gevent_monkey()
+    if monkey is not None and monkey.is_module_patched("threading"):
+        return ThreadPoolQueueListener
+    return QueueListener
+
+
+class QueueLoggingConfigurator:
+    """Superset LOGGING_CONFIGURATOR writing logs from a listener thread.
+
+    Attributes:
+        log_format: "text" or "json".
+        listener: the running queue listener, once configured.
+    """
+
+    def __init__(self, log_format="text"):
+        """Initialise the configurator.
+
+        Args:
+            log_format: "text" for Superset's LOG_FORMAT, or "json".
+        """
+        self.log_format = log_format
+        self.listener = None
+        self._queue = _simple_queue()
+        self._handlers = []
+        # Listener threads do not survive a fork, as in prefork Celery
+        # workers, so children start their own
+        os.register_at_fork(after_in_child=self._start_listener)
+        atexit.register(self._stop_listener)
+
+    def _start_listener(self):
+        """Start writing queued records, if logging is configured."""
+        if not self._handlers:
+            return
+        self.listener = _listener_class()(
+            self._queue, *self._handlers, respect_handler_level=True
+        )
+        self.listener.start()
+
+    def _stop_listener(self):
+        """Write the records still queued and stop the listener."""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+            for handler in self._handlers:
+                handler.close()
+
+    def configure_logging(self, app_config, debug_mode):
+        """Configure logging for a Superset process.
+
+        Args:
+            app_config: the Superset configuration.
+            debug_mode: whether the Flask application runs in debug mode.
+        """
+        self._stop_listener()
+
+        if self.log_format == "json":
+            formatter = JsonFormatter()
+        else:
+            formatter = logging.Formatter(app_config["LOG_FORMAT"])
+
+        self._handlers = [logging.StreamHandler()]
+        if app_config["ENABLE_TIME_ROTATE"]:
+            self._handlers.append(
+                TimedRotatingFileHandler(
+                    app_config["FILENAME"],
+                    when=app_config["ROLLOVER"],
+                    interval=app_config["INTERVAL"],
+                    backupCount=app_config["BACKUP_COUNT"],
+                )
+            )
+        for handler in self._handlers:
+            handler.setFormatter(formatter)
+
+        if app_config["SILENCE_FAB"]:
+            logging.getLogger("flask_appbuilder").setLevel(logging.ERROR)
+
+        root = logging.getLogger()
+        root.handlers = [LocalQueueHandler(self._queue)]
+        root.setLevel(app_config["LOG_LEVEL"])
+        self._start_listener()
+        logging.getLogger(__name__).info("logging was configured successfully")
@@ -0,0 +1,83 @@
+"""Route read-heavy metadata queries to PostgreSQL standbys."""
+
+from flask import g, has_request_context, request
+from sqlalchemy.sql import Select
+
+# Flask-SQLAlchemy bind key of the read-only metadata engine
+READ_ONLY_BIND = "read_only"
+
+# Listing and detail views that only read metadata. Chart data endpoints are
+# excluded: they run analytics queries and record query and cache state.
+_READ_ONLY_PREFIXES = (
+    "/api/v1/dashboard/",
+    "/api/v1/chart/",
+    "/api/v1/dataset/",
+)
+_READ_ONLY_METHODS = ("GET", "HEAD")
+
+# Per-request flag set by the before_request hook
+_FLAG = "metadata_read_only"
+
+
+def _is_read_only_request(method, path):
+    """Decide whether a request may read metadata from a standby.
+
+    Args:
+        method: HTTP method of the request.
+        path: Path of the request.
+
+    Returns:
+        True if the request only reads dashboard, chart or dataset metadata.
+    """
+    if method not in _READ_ONLY_METHODS or not path:
+        return False
+    if not path.startswith(_READ_ONLY_PREFIXES):
+        return False
+    return "data" not in path.split("/")
+
+
+def _use_read_only(session, clause):
+    """Decide whether a statement can run on the read-only engine.
+
+    Only plain SELECTs of a flagged request whose session holds no pending
+    changes are routed, so a request never reads behind its own writes.
+
+    Args:
+        session: SQLAlchemy session executing the statement.
+        clause: Statement being executed, if known.
+
+    Returns:
+        True if the statement should use the read-only engine.
+    """
+    if not isinstance(clause, Select) or session._flushing:
+        return False
+    if not has_request_context() or not g.get(_FLAG, False):
+        return False
+    return not (session.new or session.dirty or session.deleted)
+
+
+def attach_read_only_routing(app, db):
+    """Send flagged requests' SELECTs to the read-only bind.
+
+    The read-only engine is the ``READ_ONLY_BIND`` entry of
+    SQLALCHEMY_BINDS, so it shares SQLALCHEMY_ENGINE_OPTIONS with the
+    primary engine.
+
+    Args:
+        app: the Flask application to attach the hook to.
+        db: the Flask-SQLAlchemy extension of the application.
+    """
+    session_cls = db.session.session_factory.class_
+    original_get_bind = session_cls.get_bind
+
+    @app.before_request
+    def _flag_read_only_request():
+        setattr(g, _FLAG, _is_read_only_request(request.method, request.path))
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if _use_read_only(self, clause):
+            return db.get_engine(bind=READ_ONLY_BIND)
+        return original_get_bind(self, mapper, clause, **kwargs)
+
+    session_cls.get_bind = get_bind
+    return app
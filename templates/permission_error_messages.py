@@ -23,12 +23,38 @@ _CATALOG_DENIED_PATTERN = re.compile(
     re.IGNORECASE,
 )
 
-_DENIED_PATTERNS = [
-    re.compile(r"\bPERMISSION_DENIED\b", re.IGNORECASE),
-    re.compile(r"name=PERMISSION_DENIED", re.IGNORECASE),
-    re.compile(r"\bAccess Denied\b", re.IGNORECASE),
-    re.compile(r"\bnot authorized\b", re.IGNORECASE),
-]
+# Generic denials; "name=PERMISSION_DENIED" is matched by the first branch
+_DENIED_PATTERN = re.compile(
+    r"\b(?:PERMISSION_DENIED|Access Denied|not authorized)\b",
+    re.IGNORECASE,
+)
+
+# Lowercase text every denial above contains. Response bodies are scanned
+# for it before being parsed, so the async-event polls of every open
+# dashboard and unrelated errors are never decoded, walked and re-encoded.
+# Substring checks on the lowercased text are much faster than a
+# case-insensitive regex.
+_DENIED_MARKERS = (
+    "denied",
+    "not authorized",
+    "cannot select from columns",
+    "cannot access catalog",
+)
+_DENIED_MARKERS_BYTES = tuple(marker.encode() for marker in _DENIED_MARKERS)
+
+
+def _has_denied_marker(text, markers=_DENIED_MARKERS):
+    """Check whether a text may hold a permission denial.
+
+    Args:
+        text: the str, or bytes with bytes markers, to check.
+        markers: the lowercase markers to look for.
+
+    Returns:
+        Whether any marker appears in the text, ignoring case.
+    """
+    lowered = text.lower()
+    return any(marker in lowered for marker in markers)
 
 
 def _build_request_message(request_url):
@@ -40,7 +66,7 @@ def _build_request_message(request_url):
 
 def _rewrite_permission_denied_string(msg, request_message):
     """Return a rewritten message for a permission-denied case, else the original."""
-    if not isinstance(msg, str) or not msg.strip():
+    if not isinstance(msg, str) or not _has_denied_marker(msg):
         return msg
 
     m = _COLUMN_DENIED_PATTERN.search(msg)
@@ -70,7 +96,7 @@ def _rewrite_permission_denied_string(msg, request_message):
         )
 
     # Generic permission denied
-    if any(p.search(msg) for p in _DENIED_PATTERNS):
+    if _DENIED_PATTERN.search(msg):
         return (
             "You don’t have access to this dataset.\n\n"
             f"{request_message}"
@@ -87,15 +113,35 @@ def _rewrite_any(obj, request_message):
     - /api/v1/sqllab/... endpoints
     - /api/v1/async_event/ payloads (GLOBAL_ASYNC_QUERIES charts)
     - legacy /superset/... JSON endpoints, if present
+
+    Rewriting is copy-on-write: containers are copied only when one of
+    their items changed, so an object with nothing to rewrite is returned
+    as is.
     """
     if isinstance(obj, str):
         return _rewrite_permission_denied_string(obj, request_message)
 
     if isinstance(obj, list):
-        return [_rewrite_any(x, request_message) for x in obj]
+        for i, item in enumerate(obj):
+            new_item = _rewrite_any(item, request_message)
+            if new_item is not item:
+                new_list = obj[:i]
+                new_list.append(new_item)
+                new_list.extend(
+                    _rewrite_any(x, request_message) for x in obj[i + 1 :]
+                )
+                return new_list
+        return obj
 
     if isinstance(obj, dict):
-        return {k: _rewrite_any(v, request_message) for k, v in obj.items()}
+        new_dict = None
+        for k, v in obj.items():
+            new_v = _rewrite_any(v, request_message)
+            if new_v is not v:
+                if new_dict is None:
+                    new_dict = dict(obj)
+                new_dict[k] = new_v
+        return obj if new_dict is None else new_dict
 
     return obj
 
@@ -145,11 +191,19 @@ def attach_error_rewriter(app, request_url=None):
             if getattr(response, "direct_passthrough", False):
                 return response
 
-            payload = response.get_json(silent=True)
-            if payload is None:
+            # Most bodies, notably async-event polls, carry no denial at all
+            body = response.get_data()
+            if not _has_denied_marker(body, _DENIED_MARKERS_BYTES):
+                return response
+
+            try:
+                payload = json.loads(body)
+            except ValueError:
                 return response
 
             new_payload = _rewrite_any(payload, request_message)
+            if new_payload is payload:
+                return response
 
             response.set_data(json.dumps(new_payload))
             response.headers["Content-Length"] = str(len(response.get_data()))
@@ -1,5 +1,11 @@
 "Helper function for Sentry interception."
 
+import random
+
+# Requests never worth a transaction
+UNTRACED_PATHS = ("/health", "/healthcheck", "/static/")
+
+
 def redact_params(event, hint):
     # Redact parameters from captured events
     if "exception" not in event:
@@ -13,6 +19,84 @@ def redact_params(event, hint):
         for frame in exc["stacktrace"]["frames"]:
             # Filter out specific parameter keys
             if "vars" in frame:
-                frame["vars"] = {key: "REDACTED" for key in frame["vars"]}
+                frame["vars"] = dict.fromkeys(frame["vars"], "REDACTED")
 
     return event
+
+
+def build_before_send(sample_rate, redact):
+    """Build a before_send hook sampling error events before redacting them.
+
+    The SDK runs before_send before applying its own error sample rate,
+    so events are sampled here instead, and only those actually sent are
+    redacted. The SDK sample_rate must then be left at 1.
+
+    Args:
+        sample_rate: fraction of error events sent.
+        redact: whether to redact frame variables of sent events.
+
+    Returns:
+        The before_send hook, or None when it would keep every event as is.
+    """
+    if sample_rate >= 1 and not redact:
+        return None
+
+    def before_send(event, hint):
+        if sample_rate < 1 and random.random() >= sample_rate:
+            return None
+        if redact:
+            return redact_params(event, hint)
+        return event
+
+    return before_send
+
+
+def _transaction_target(sampling_context):
+    """Find the request path or Celery task name of a transaction.
+
+    Args:
+        sampling_context: context passed to the traces sampler.
+
+    Returns:
+        The path or task name, or None.
+    """
+    environ = sampling_context.get("wsgi_environ")
+    if environ:
+        return environ.get("PATH_INFO")
+    celery_job = sampling_context.get("celery_job")
+    if celery_job:
+        return celery_job.get("task")
+    return None
+
+
+def build_traces_sampler(default_rate, rules):
+    """Build a traces sampler applying per-route sample rates.
+
+    Args:
+        default_rate: fraction of transactions sampled when no rule
+            matches.
+        rules: sample rates by request path or Celery task name prefix;
+            the longest matching prefix wins.
+
+    Returns:
+        The traces sampler.
+    """
+    prefixes = sorted(rules, key=len, reverse=True)
+
+    def traces_sampler(sampling_context):
+        # Keep the decision of the request that queued a task
+        parent_sampled = sampling_context.get("parent_sampled")
+        if parent_sampled is not None:
+            return float(parent_sampled)
+
+        target = _transaction_target(sampling_context)
+        if target is None:
+            return default_rate
+        if target.startswith(UNTRACED_PATHS):
+            return 0.0
+        for prefix in prefixes:
+            if target.startswith(prefix):
+                return rules[prefix]
+        return default_rate
+
+    return traces_sampler
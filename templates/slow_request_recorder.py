@@ -0,0 +1,235 @@
+"""Record slow requests with a breakdown of where their time went."""
+
+import functools
+import json
+import logging
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("superset.slow_request")
+
+# Statsd counter incremented for every slow request
+SLOW_REQUEST_METRIC = "slow_request"
+
+PHASES = ("metadata_db", "analytics_db", "cache")
+
+_STARTS_KEY = "slow_request_starts"
+
+# Engine spec methods running analytics queries. Specs may override any of
+# them, e.g. Trino runs execute in a thread from execute_with_cursor.
+ENGINE_SPEC_METHODS = ("execute", "execute_with_cursor", "fetch_data")
+
+
+def _add_phase_time(phase, seconds):
+    """Add time spent in a phase to the current request, if any.
+
+    Args:
+        phase: one of PHASES.
+        seconds: time spent.
+    """
+    if not has_request_context():
+        return
+    phases = g.get("slow_request_phases")
+    if phases is not None:
+        phases[phase] += seconds
+
+
+def _timed(phase, func):
+    """Wrap a function so its duration counts towards a phase.
+
+    Args:
+        phase: one of PHASES.
+        func: function to wrap.
+
+    Returns:
+        The wrapped function.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not has_request_context():
+            return func(*args, **kwargs)
+        # Overrides calling the wrapped method of a parent count once
+        timing = g.get("slow_request_timing")
+        if timing is None:
+            timing = g.slow_request_timing = set()
+        if phase in timing:
+            return func(*args, **kwargs)
+        timing.add(phase)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timing.discard(phase)
+            _add_phase_time(phase, time.perf_counter() - start)
+
+    return wrapper
+
+
+def _time_sqlalchemy(metadata_engines, target=Engine):
+    """Time SQL statements, split between metadata and analytics engines.
+
+    Args:
+        metadata_engines: callable returning the metadata engines.
+        target: engine, or Engine for all of them, to time statements of.
+    """
+
+    @event.listens_for(target, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault(_STARTS_KEY, []).append(time.perf_counter())
+
+    @event.listens_for(target, "handle_error")
+    def _error(exception_context):
+        # Failed statements never reach after_cursor_execute; drop their
+        # start so it does not skew the next statement on the connection
+        conn = exception_context.connection
+        if conn is None or exception_context.execution_context is None:
+            return
+        starts = conn.info.get(_STARTS_KEY)
+        if starts:
+            starts.pop()
+
+    @event.listens_for(target, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get(_STARTS_KEY)
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        if not has_request_context():
+            return
+        phase = (
+            "metadata_db"
+            if conn.engine in metadata_engines()
+            else "analytics_db"
+        )
+        _add_phase_time(phase, elapsed)
+
+
+def _time_analytics_execution():
+    """Time queries Superset runs on analytics databases' DBAPI cursors.
+
+    The methods are wrapped on every engine spec defining them, since
+    overrides do not go through the BaseEngineSpec ones.
+    """
+    from superset.db_engine_specs import load_engine_specs
+    from superset.db_engine_specs.base import BaseEngineSpec
+
+    for spec in {BaseEngineSpec, *load_engine_specs()}:
+        for name in ENGINE_SPEC_METHODS:
+            method = vars(spec).get(name)
+            if isinstance(method, classmethod):
+                func = _timed("analytics_db", method.__func__)
+                setattr(spec, name, classmethod(func))
+
+
+def _time_redis():
+    """Time Redis commands, which back Superset's caches."""
+    from redis.client import Pipeline, Redis
+
+    Redis.execute_command = _timed("cache", Redis.execute_command)
+    Pipeline.execute = _timed("cache", Pipeline.execute)
+
+
+def _object_ids():
+    """Find the chart and dashboard a request is about.
+
+    Returns:
+        Dict of chart_id and dashboard_id, when known.
+    """
+    ids = {}
+    view_args = request.view_args or {}
+    path = request.path or ""
+    if path.startswith("/api/v1/chart/"):
+        ids["chart_id"] = view_args.get("pk")
+        if ids["chart_id"] is None and request.is_json:
+            payload = request.get_json(silent=True) or {}
+            form_data = payload.get("form_data") or {}
+            ids["chart_id"] = form_data.get("slice_id")
+    elif path.startswith("/api/v1/dashboard/"):
+        ids["dashboard_id"] = view_args.get("id_or_slug", view_args.get("pk"))
+    if "dashboard_id" in view_args:
+        ids["dashboard_id"] = view_args["dashboard_id"]
+    return {key: value for key, value in ids.items() if value is not None}
+
+
+def _build_record(response, total):
+    """Build the structured record of a slow request.
+
+    Args:
+        response: the response being returned.
+        total: request duration in seconds.
+
+    Returns:
+        Dict describing the request and its phase breakdown.
+    """
+    phases = g.get("slow_request_phases") or dict.fromkeys(PHASES, 0.0)
+    user = g.get("user")
+    record = {
+        "event": "slow_request",
+        "method": request.method,
+        "route": request.url_rule.rule if request.url_rule else None,
+        "path": request.path,
+        "status": response.status_code,
+        "user": getattr(user, "username", None),
+        "duration_ms": round(total * 1000, 1),
+    }
+    record.update(_object_ids())
+    for phase in PHASES:
+        record[f"{phase}_ms"] = round(phases[phase] * 1000, 1)
+    record["other_ms"] = round(
+        max(total - sum(phases.values()), 0.0) * 1000, 1
+    )
+    return record
+
+
+def attach_slow_request_recorder(app, db, threshold_ms, stats_logger=None):
+    """Log and count requests slower than a threshold.
+
+    Args:
+        app: the Flask application to attach the hooks to.
+        db: the Flask-SQLAlchemy extension of the application.
+        threshold_ms: requests taking at least this many milliseconds are
+            recorded.
+        stats_logger: optional Superset stats logger counting slow requests.
+    """
+    threshold = threshold_ms / 1000
+    metadata_engines = set()
+
+    def get_metadata_engines():
+        if not metadata_engines:
+            metadata_engines.add(db.engine)
+            for bind in app.config.get("SQLALCHEMY_BINDS") or {}:
+                metadata_engines.add(db.get_engine(bind=bind))
+        return metadata_engines
+
+    _time_sqlalchemy(get_metadata_engines)
+    _time_analytics_execution()
+    _time_redis()
+
+    @app.before_request
+    def _start_slow_request_timer():
+        g.slow_request_start = time.perf_counter()
+        g.slow_request_phases = dict.fromkeys(PHASES, 0.0)
+
+    @app.after_request
+    def _record_slow_request(response):
+        try:
+            start = g.get("slow_request_start")
+            if start is None:
+                return response
+            total = time.perf_counter() - start
+            if total < threshold:
+                return response
+
+            logger.warning(json.dumps(_build_record(response, total)))
+            if stats_logger is not None:
+                stats_logger.incr(SLOW_REQUEST_METRIC)
+        except Exception:
+            # Never block responses if recording fails
+            logger.exception("Failed to record slow request")
+        return response
+
+    return app
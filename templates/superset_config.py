@@ -1,12 +1,22 @@
+import json
 import os
 from cachelib.redis import RedisCache
 from celery.schedules import crontab
 from flask_appbuilder.security.manager import AUTH_OAUTH
+from celery_metrics import attach_queue_wait_metrics
 from custom_sso_security_manager import CustomSsoSecurityManager
+from logging_configurator import QueueLoggingConfigurator
+from metadata_read_routing import READ_ONLY_BIND, attach_read_only_routing
 from permission_error_messages import attach_error_rewriter
-from sentry_interceptor import redact_params
+from sentry_interceptor import build_before_send, build_traces_sampler
+from slow_request_recorder import attach_slow_request_recorder
+from tracing import configure_tracing, instrument_app
 from superset.stats_logger import StatsdStatsLogger
 import sentry_sdk
+from sentry_sdk.integrations.celery import CeleryIntegration
+from sentry_sdk.integrations.flask import FlaskIntegration
+from sentry_sdk.integrations.redis import RedisIntegration
+from sentry_sdk.integrations.sqlalchemy import SqlalchemyIntegration
 import yaml
 
 
@@ -19,19 +29,51 @@ SENTRY_ENVIRONMENT = os.getenv("SENTRY_ENVIRONMENT")
 SENTRY_RELEASE = os.getenv("SENTRY_RELEASE")
 SENTRY_SAMPLE_RATE = os.getenv("SENTRY_SAMPLE_RATE")
 SENTRY_REDACT_PARAMS = os.getenv("SENTRY_REDACT_PARAMS").lower() != "false"
-
-sentry_before_send = None
-if SENTRY_REDACT_PARAMS:
-    sentry_before_send = redact_params
+SENTRY_TRACES_SAMPLE_RATE = float(os.getenv("SENTRY_TRACES_SAMPLE_RATE", "0"))
+SENTRY_PROFILES_SAMPLE_RATE = float(os.getenv("SENTRY_PROFILES_SAMPLE_RATE", "0"))
+SENTRY_TRACES_SAMPLE_RULES = json.loads(os.getenv("SENTRY_TRACES_SAMPLE_RULES") or "{}")
+
+# Errors are sampled in before_send, so only events actually sent are
+# redacted
+sentry_before_send = build_before_send(float(SENTRY_SAMPLE_RATE), SENTRY_REDACT_PARAMS)
+
+# Performance monitoring stays off unless some transactions are sampled
+sentry_traces_sampler = None
+if SENTRY_TRACES_SAMPLE_RATE or SENTRY_TRACES_SAMPLE_RULES:
+    sentry_traces_sampler = build_traces_sampler(
+        SENTRY_TRACES_SAMPLE_RATE, SENTRY_TRACES_SAMPLE_RULES
+    )
 
 if all([SENTRY_DSN, SENTRY_ENVIRONMENT, SENTRY_RELEASE]):
     sentry_sdk.init(
         dsn=SENTRY_DSN,
         environment=SENTRY_ENVIRONMENT,
         release=SENTRY_RELEASE,
-        sample_rate=float(SENTRY_SAMPLE_RATE),
+        sample_rate=1.0 if sentry_before_send else float(SENTRY_SAMPLE_RATE),
         before_send=sentry_before_send,
-        )
+        traces_sampler=sentry_traces_sampler,
+        # Fraction of sampled transactions that are profiled
+        profiles_sample_rate=SENTRY_PROFILES_SAMPLE_RATE,
+        integrations=[
+            # Name transactions after routes, which sample rules match
+            FlaskIntegration(transaction_style="url"),
+            CeleryIntegration(propagate_traces=True),
+            SqlalchemyIntegration(),
+            RedisIntegration(),
+        ],
+    )
+
+# Tracing with OpenTelemetry
+TRACING_OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT")
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "0.1"))
+
+if TRACING_OTLP_ENDPOINT:
+    configure_tracing(
+        TRACING_OTLP_ENDPOINT,
+        TRACING_SAMPLE_RATE,
+        service_name=os.getenv("TRACING_SERVICE_NAME", "superset"),
+        service_instance=os.getenv("TRACING_SERVICE_INSTANCE", "superset"),
+    )
 
 # StatsD logging
 STATS_LOGGER = StatsdStatsLogger(host="localhost", port=os.getenv("STATSD_PORT"))
@@ -101,9 +143,38 @@ TALISMAN_CONFIG = {
      "session_cookie_secure": False,
 }
 
-SQLALCHEMY_POOL_SIZE = int(os.getenv("SQLALCHEMY_POOL_SIZE"))
-SQLALCHEMY_POOL_TIMEOUT = int(os.getenv("SQLALCHEMY_POOL_TIMEOUT"))
-SQLALCHEMY_MAX_OVERFLOW = int(os.getenv("SQLALCHEMY_MAX_OVERFLOW"))
+# Metadata database engine, shared by the read-only bind if any
+SQLALCHEMY_POOL_RECYCLE = int(os.getenv("SQLALCHEMY_POOL_RECYCLE", "1800"))
+SQLALCHEMY_STATEMENT_TIMEOUT = int(os.getenv("SQLALCHEMY_STATEMENT_TIMEOUT", "0"))
+SQLALCHEMY_KEEPALIVES_IDLE = int(os.getenv("SQLALCHEMY_KEEPALIVES_IDLE", "60"))
+
+metadata_db_connect_args = {
+    # Shown in pg_stat_activity, e.g. "superset-k8s/0:app-gunicorn"
+    "application_name": os.getenv("SQLALCHEMY_APPLICATION_NAME", "superset"),
+}
+if SQLALCHEMY_KEEPALIVES_IDLE:
+    metadata_db_connect_args.update(
+        {
+            "keepalives": 1,
+            "keepalives_idle": SQLALCHEMY_KEEPALIVES_IDLE,
+            "keepalives_interval": 10,
+            "keepalives_count": 5,
+        }
+    )
+if SQLALCHEMY_STATEMENT_TIMEOUT:
+    metadata_db_connect_args["options"] = (
+        f"-c statement_timeout={SQLALCHEMY_STATEMENT_TIMEOUT * 1000}"
+    )
+
+SQLALCHEMY_ENGINE_OPTIONS = {
+    "pool_size": int(os.getenv("SQLALCHEMY_POOL_SIZE")),
+    "pool_timeout": int(os.getenv("SQLALCHEMY_POOL_TIMEOUT")),
+    "max_overflow": int(os.getenv("SQLALCHEMY_MAX_OVERFLOW")),
+    "pool_pre_ping": os.getenv("SQLALCHEMY_POOL_PRE_PING", "").lower() != "false",
+    # SQLAlchemy disables recycling with -1
+    "pool_recycle": SQLALCHEMY_POOL_RECYCLE or -1,
+    "connect_args": metadata_db_connect_args,
+}
 
 beat_schedule_config = {
         "reports.prune_log": {
@@ -180,9 +251,14 @@ class CeleryConfig(object):
     result_backend = (
         f"redis://{os.getenv('REDIS_HOST')}:{os.getenv('REDIS_PORT')}/5"
     )
-    worker_log_level = "DEBUG"
+    # Keep the queue-backed handlers of LOGGING_CONFIGURATOR; the level is
+    # set by the worker's --loglevel
+    worker_hijack_root_logger = False
     worker_prefetch_multiplier = 1
     task_acks_late = True
+    # Task events feed the per-task metrics of celery-exporter
+    worker_send_task_events = True
+    task_send_sent_event = True
     task_annotations = {
         "sql_lab.get_sql_results": {
             "rate_limit": "100/s",
@@ -192,6 +268,9 @@ class CeleryConfig(object):
 
 
 CELERY_CONFIG = CeleryConfig
+
+# Time tasks spend queued, reported by workers to their statsd_exporter
+attach_queue_wait_metrics("localhost", os.getenv("STATSD_PORT"))
 WEBDRIVER_BASEURL = f"http://{SERVER_ALIAS}:{APPLICATION_PORT}/"
 
 SUPERSET_WEBSERVER_TIMEOUT = int(os.getenv("WEBSERVER_TIMEOUT"))
@@ -277,11 +356,12 @@ GLOBAL_ASYNC_QUERIES_CACHE_BACKEND = {
 GLOBAL_ASYNC_QUERIES_POLLING_DELAY = int(os.getenv("GLOBAL_ASYNC_QUERIES_POLLING_DELAY", "500"))
 SECRET_KEY = os.getenv("SUPERSET_SECRET_KEY")
 
-# Log rotation
-LOG_LEVEL = "DEBUG"
-TIME_ROTATE_LOG_LEVEL = "DEBUG"
+# Logging, written from a queue so requests do not wait for log I/O
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+TIME_ROTATE_LOG_LEVEL = LOG_LEVEL
 ENABLE_TIME_ROTATE = True
 FILENAME = os.getenv("LOG_FILE")
+LOGGING_CONFIGURATOR = QueueLoggingConfigurator(log_format=os.getenv("LOG_FORMAT", "text"))
 
 # html sanitization
 HTML_SANITIZATION = os.getenv("HTML_SANITIZATION").lower() != "false"
@@ -290,6 +370,11 @@ HTML_SANITIZATION_SCHEMA_EXTENSIONS = yaml.safe_load(os.getenv("HTML_SANITIZATIO
 # postgresql metadata db
 SQLALCHEMY_DATABASE_URI = os.getenv("SQL_ALCHEMY_URI")
 
+# Standby endpoints for read-heavy metadata views, when the relation has any
+SQLALCHEMY_READ_ONLY_URI = os.getenv("SQL_ALCHEMY_READ_ONLY_URI")
+if SQLALCHEMY_READ_ONLY_URI:
+    SQLALCHEMY_BINDS = {READ_ONLY_BIND: SQLALCHEMY_READ_ONLY_URI}
+
 # OAUTH configuration
 required_auth_vars = ["GOOGLE_KEY", "GOOGLE_SECRET", "OAUTH_DOMAIN"]
 
@@ -346,6 +431,10 @@ MAX_FORM_PARTS = int(v) if (v := os.getenv("MAX_FORM_PARTS")) else 1000
 # URL users are directed to when they hit a Trino/Ranger permission-denied error.
 DATA_ACCESS_REQUEST_URL = os.getenv("DATA_ACCESS_REQUEST_URL")
 
+# Requests slower than this many milliseconds are logged with their phase
+# breakdown; 0 disables the recorder
+SLOW_REQUEST_THRESHOLD = int(os.getenv("SLOW_REQUEST_THRESHOLD", "0"))
+
 def FLASK_APP_MUTATOR(app):
     """Override the Flask app dynamically."""
 
@@ -361,6 +450,24 @@ def FLASK_APP_MUTATOR(app):
     # Rewrite Trino/Ranger permission-denied errors into user-friendly messages
     attach_error_rewriter(app, request_url=DATA_ACCESS_REQUEST_URL)
 
+    # Serve dashboard, chart and dataset metadata reads from standbys
+    if SQLALCHEMY_READ_ONLY_URI:
+        from superset.extensions import db
+
+        attach_read_only_routing(app, db)
+
+    # Trace requests and the analytics queries they run
+    if TRACING_OTLP_ENDPOINT:
+        instrument_app(app)
+
+    # Log where the time of slow requests went
+    if SLOW_REQUEST_THRESHOLD:
+        from superset.extensions import db
+
+        attach_slow_request_recorder(
+            app, db, SLOW_REQUEST_THRESHOLD, stats_logger=STATS_LOGGER
+        )
+
 
 # =============================================================================
 # Fix: QueryObject cache-key SQL normalisation (Apache Superset issue #37114)
@@ -390,7 +497,7 @@ def FLASK_APP_MUTATOR(app):
 #     saved and restored around the call, so the SQL actually sent to the
 #     database is NEVER modified. The worst a bug here can cause is a cache
 #     miss, never altered query results.
-#   * LITERAL/COMMENT SAFE. The normaliser is a small scanner that copies
+#   * LITERAL/COMMENT SAFE. The normaliser is a small regex tokenizer that copies
 #     string literals ('...'), quoted identifiers ("...", `...`) and comments
 #     (-- ..., /* ... */) through verbatim, and only collapses whitespace and
 #     strips spacing around operators/punctuation in actual SQL code. So a
@@ -407,13 +514,39 @@ def FLASK_APP_MUTATOR(app):
 # Remove this block once a Superset release with full normalisation is deployed.
 # =============================================================================
 from superset.common.query_object import QueryObject as _QO
+from superset.extensions import feature_flag_manager as _qo_feature_flags
+from flask import g as _qo_g
+
+import functools
+import pickle  # nosec B403 - only dumps, never loads
+import re
 
 # Characters around which whitespace is insignificant in SQL code (outside of
 # string literals / quoted identifiers / comments, which are copied verbatim).
 _QO_TIGHT = set("+-*/%(),.=<>!|&~^:[]")
 _QO_COMMENT_MARKERS = ("--", "/*", "*/")
 
+# One alternation per token kind, tried in this order at every position, so a
+# comment marker wins over the operator characters that open it. Unclosed
+# quotes and block comments run to the end of the string, like the scanner
+# they replace.
+_QO_TOKEN_RE = re.compile(
+    r"""
+    (?P<comment>--[^\n]*|/\*(?:.*?\*/|.*))
+    |(?P<quoted>'(?:[^']|'')*'?|"(?:[^"]|"")*"?|`(?:[^`]|``)*`?)
+    |(?P<ws>\s+)
+    |(?P<tight>[+\-*/%(),.=<>!|&~^:\[\]])
+    |(?P<word>[^\s+\-*/%(),.=<>!|&~^:\[\]'"`]+)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
 
+# Dashboards re-hash the same handful of chart expressions on every load, so a
+# bounded memo keyed on the raw SQL string turns most calls into a lookup.
+_QO_NORM_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=_QO_NORM_CACHE_SIZE)
 def _qo_norm_sql_str(sql):
     """Normalise whitespace in a SQL expression, for cache-key hashing only.
 
@@ -425,83 +558,28 @@ def _qo_norm_sql_str(sql):
     """
     try:
         s = sql.replace("\r\n", "\n").replace("\r", "\n")
-        n = len(s)
         out = []
-        pending_ws = False  # whitespace seen since the last emitted character
-
-        def last():
-            return out[-1] if out else ""
-
-        def emit_value(text):
-            # identifier / literal / comment / word run: keep a single
-            # separating space if whitespace preceded it and the previous
-            # emitted char is not a tight operator/punctuation.
-            nonlocal pending_ws
-            if out and pending_ws and last() not in _QO_TIGHT:
+        last = ""  # last emitted token
+        pending_ws = False  # whitespace seen since the last emitted token
+        for m in _QO_TOKEN_RE.finditer(s):
+            kind = m.lastgroup
+            if kind == "ws":
+                pending_ws = True
+                continue
+            text = m.group()
+            if kind == "tight":
+                # operator / punctuation: no surrounding space, but never fuse
+                # two chars into a comment marker (e.g. `-` `-` -> `--`).
+                if out and (last + text) in _QO_COMMENT_MARKERS:
+                    out.append(" ")
+            elif out and pending_ws and last not in _QO_TIGHT:
+                # identifier / literal / comment / word run: keep a single
+                # separating space if whitespace preceded it and the previous
+                # token is not a tight operator/punctuation.
                 out.append(" ")
             out.append(text)
+            last = text
             pending_ws = False
-
-        def emit_tight(ch):
-            # operator / punctuation: no surrounding space, but never fuse two
-            # chars into a comment marker (e.g. `-` `-` -> `--`).
-            nonlocal pending_ws
-            if out and (last() + ch) in _QO_COMMENT_MARKERS:
-                out.append(" ")
-            out.append(ch)
-            pending_ws = False
-
-        i = 0
-        while i < n:
-            c = s[i]
-            # comments take priority over the operator chars that open them
-            if c == "-" and i + 1 < n and s[i + 1] == "-":
-                j = s.find("\n", i)
-                j = n if j == -1 else j
-                emit_value(s[i:j])
-                i = j
-                continue
-            if c == "/" and i + 1 < n and s[i + 1] == "*":
-                j = s.find("*/", i + 2)
-                j = n if j == -1 else j + 2
-                emit_value(s[i:j])
-                i = j
-                continue
-            # quoted regions copied verbatim (handle doubled-quote escapes)
-            if c in ("'", '"', "`"):
-                j = i + 1
-                while j < n:
-                    if s[j] == c:
-                        if j + 1 < n and s[j + 1] == c:
-                            j += 2
-                            continue
-                        j += 1
-                        break
-                    j += 1
-                else:
-                    j = n
-                emit_value(s[i:j])
-                i = j
-                continue
-            if c.isspace():
-                pending_ws = True
-                i += 1
-                continue
-            if c in _QO_TIGHT:
-                emit_tight(c)
-                i += 1
-                continue
-            # ordinary code: consume a maximal run of word characters
-            j = i
-            while (
-                j < n
-                and not s[j].isspace()
-                and s[j] not in _QO_TIGHT
-                and s[j] not in ("'", '"', "`")
-            ):
-                j += 1
-            emit_value(s[i:j])
-            i = j
         return "".join(out)
     except Exception:  # pragma: no cover
         return sql
@@ -526,8 +604,67 @@ def _qo_norm_orderby(item):
 
 _qo_orig_cache_key = _QO.cache_key
 
+# Superset calls cache_key() several times for the same QueryObject within one
+# chart-data request (cache lookup, cache set, annotation layers). The digest
+# is memoized on the instance together with a pickled fingerprint of every
+# input of the hash; any change to them misses the memo and recomputes. Those
+# inputs are the attributes and keyword arguments, plus what cache_key() reads
+# outside the QueryObject: it adds an impersonation key for the current user
+# when CACHE_IMPERSONATION is on and the database impersonates users, when
+# CACHE_QUERY_BY_USER is on, or when the database's extra enables
+# per_user_caching. The user, the database's impersonate_user and extra and
+# both flags are therefore part of the fingerprint. `datasource` is an ORM
+# object, so it is compared by identity instead of being pickled. Pickling
+# the state costs about a third of normalising and hashing it, so the memo
+# pays for itself from the second call on (see
+# tests/unit/test_cache_key_memo.py).
+_QO_MEMO_ATTR = "_qo_cache_key_memo"
+_QO_MEMO_SKIP = frozenset({_QO_MEMO_ATTR, "datasource"})
+_QO_CACHE_KEY_FLAGS = ("CACHE_IMPERSONATION", "CACHE_QUERY_BY_USER")
+_QO_CACHE_KEY_STATS = {"hits": 0, "misses": 0}
+
+
+def _qo_context_state(self):
+    """Return the user, database and feature flag state cache_key() reads."""
+    database = getattr(getattr(self, "datasource", None), "database", None)
+    user = getattr(_qo_g, "user", None)
+    return (
+        getattr(user, "id", None),
+        getattr(user, "username", None),
+        getattr(database, "impersonate_user", None),
+        getattr(database, "extra", None),
+        tuple(
+            _qo_feature_flags.is_feature_enabled(flag)
+            for flag in _QO_CACHE_KEY_FLAGS
+        ),
+    )
+
+
+def _qo_fingerprint(self, extra):
+    """Return a bytes snapshot of the hashed state, or None if unavailable."""
+    state = {k: v for k, v in vars(self).items() if k not in _QO_MEMO_SKIP}
+    try:
+        return pickle.dumps(
+            (state, extra, _qo_context_state(self)), pickle.HIGHEST_PROTOCOL
+        )
+    except Exception:
+        return None
+
 
 def _qo_patched_cache_key(self, **extra):
+    datasource = getattr(self, "datasource", None)
+    fingerprint = _qo_fingerprint(self, extra)
+    memo = vars(self).get(_QO_MEMO_ATTR)
+    if (
+        fingerprint is not None
+        and memo is not None
+        and memo[0] is datasource
+        and memo[1] == fingerprint
+    ):
+        _QO_CACHE_KEY_STATS["hits"] += 1
+        return memo[2]
+    _QO_CACHE_KEY_STATS["misses"] += 1
+
     # Swap in normalised SQL only for the duration of the hash computation,
     # then restore the originals so the executed query is left untouched.
     saved = (self.metrics, self.columns, self.orderby, self.series_limit_metric)
@@ -537,7 +674,7 @@ def _qo_patched_cache_key(self, **extra):
         self.orderby = [_qo_norm_orderby(ob) for ob in (self.orderby or [])]
         if self.series_limit_metric is not None:
             self.series_limit_metric = _qo_norm(self.series_limit_metric)
-        return _qo_orig_cache_key(self, **extra)
+        digest = _qo_orig_cache_key(self, **extra)
     finally:
         (
             self.metrics,
@@ -546,6 +683,10 @@ def _qo_patched_cache_key(self, **extra):
             self.series_limit_metric,
         ) = saved
 
+    if fingerprint is not None:
+        vars(self)[_QO_MEMO_ATTR] = (datasource, fingerprint, digest)
+    return digest
+
 
 _QO.cache_key = _qo_patched_cache_key
 # =============================================================================
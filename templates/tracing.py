@@ -0,0 +1,126 @@
+"""Trace requests across Superset processes with OpenTelemetry.
+
+Spans are exported over OTLP/HTTP. Flask requests, metadata and analytics
+database queries, Redis commands and Celery tasks are instrumented, and
+the trace context travels on Celery task headers, so an asynchronous chart
+load can be followed from the web server to the worker and back.
+"""
+
+import functools
+
+# Path of the collector's OTLP/HTTP trace receiver
+TRACES_PATH = "/v1/traces"
+
+# Requests not worth tracing, as regular expressions
+EXCLUDED_URLS = "/health,/healthcheck,/static/"
+
+
+def traces_url(endpoint):
+    """Build the URL spans are exported to.
+
+    The exporter posts to the URL it is given, unlike the
+    OTEL_EXPORTER_OTLP_ENDPOINT variable it appends the signal path to.
+
+    Args:
+        endpoint: collector endpoint, e.g. http://otel-collector:4318.
+
+    Returns:
+        The URL of the trace receiver.
+    """
+    endpoint = endpoint.rstrip("/")
+    if endpoint.endswith(TRACES_PATH):
+        return endpoint
+    return f"{endpoint}{TRACES_PATH}"
+
+
+def _trace_analytics_execution(tracer):
+    """Trace queries Superset runs on analytics databases' DBAPI cursors.
+
+    These bypass SQLAlchemy engine events, so the SQLAlchemy
+    instrumentation does not see them.
+
+    Args:
+        tracer: tracer creating the spans.
+    """
+    from opentelemetry.trace import SpanKind
+    from superset.db_engine_specs.base import BaseEngineSpec
+
+    execute = BaseEngineSpec.execute.__func__
+
+    @functools.wraps(execute)
+    def traced_execute(cls, cursor, query, *args, **kwargs):
+        with tracer.start_as_current_span(
+            f"{cls.engine} execute",
+            kind=SpanKind.CLIENT,
+            attributes={"db.system": cls.engine, "db.statement": query},
+        ):
+            return execute(cls, cursor, query, *args, **kwargs)
+
+    BaseEngineSpec.execute = classmethod(traced_execute)
+
+
+def configure_tracing(endpoint, sample_rate, service_name, service_instance):
+    """Export spans to a collector and instrument Superset's clients.
+
+    This runs when the configuration is loaded, before the metadata
+    database engine and Celery tasks are created.
+
+    Sampling follows the parent span when there is one, so Celery tasks
+    and queries are kept or dropped along with the request that started
+    them.
+
+    Args:
+        endpoint: collector OTLP/HTTP endpoint.
+        sample_rate: fraction of traces started here that are sampled.
+        service_name: name of the service spans are reported for.
+        service_instance: name of the unit spans are reported from.
+    """
+    from opentelemetry import trace
+    from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+        OTLPSpanExporter,
+    )
+    from opentelemetry.instrumentation.celery import CeleryInstrumentor
+    from opentelemetry.instrumentation.redis import RedisInstrumentor
+    from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    provider = TracerProvider(
+        resource=Resource.create(
+            {
+                "service.name": service_name,
+                "service.instance.id": service_instance,
+            }
+        ),
+        sampler=ParentBased(TraceIdRatioBased(sample_rate)),
+    )
+    # Spans are sent from a background thread, which BatchSpanProcessor
+    # restarts in forked Gunicorn and Celery worker processes
+    provider.add_span_processor(
+        BatchSpanProcessor(OTLPSpanExporter(endpoint=traces_url(endpoint)))
+    )
+    trace.set_tracer_provider(provider)
+
+    SQLAlchemyInstrumentor().instrument()
+    RedisInstrumentor().instrument()
+    # Injects the trace context into task headers when publishing and
+    # extracts it when running tasks
+    CeleryInstrumentor().instrument()
+
+
+def instrument_app(app):
+    """Trace the requests served by the Flask application.
+
+    Superset's Celery workers create the application too, so their
+    analytics queries are traced as well.
+
+    Args:
+        app: the Flask application.
+    """
+    from opentelemetry import trace
+    from opentelemetry.instrumentation.flask import FlaskInstrumentor
+
+    FlaskInstrumentor().instrument_app(app, excluded_urls=EXCLUDED_URLS)
+    _trace_analytics_execution(trace.get_tracer(__name__))
@@ -0,0 +1,105 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""QueryObject cache-key patch, loaded without Superset for the unit tests.
+
+The patch lives in templates/superset_config.py and is loaded by every
+Superset process at startup via PYTHONPATH. Only its fix block is executed
+here, against a stubbed QueryObject, so the patch functions can be tested
+with no installed Superset package or running Juju model required.
+"""
+
+import pathlib
+import sys
+import types
+from unittest import mock
+
+# flask.g and the enabled feature flags seen by the patch; tests set g.user
+# and add flags to the set
+FLASK_G = types.SimpleNamespace()
+ENABLED_FEATURE_FLAGS: set = set()
+
+
+def _load_patch_ns():
+    """Exec only the fix block from superset_config.py with a stubbed QO.
+
+    Returns:
+        Dict of the names defined by the fix block.
+    """
+    config_path = (
+        pathlib.Path(__file__).parent.parent.parent
+        / "templates"
+        / "superset_config.py"
+    )
+    src = config_path.read_text()
+
+    start_marker = (
+        "from superset.common.query_object import QueryObject as _QO"
+    )
+    end_marker = "# End fix: QueryObject cache-key SQL normalisation"
+    start = src.index(start_marker)
+    end = src.index(end_marker)
+    block = src[start:end]
+
+    class _StubQO:
+        """Stand-in QueryObject used to load the patch without Superset."""
+
+        def cache_key(self, **extra):
+            """Return a fixed stub hash.
+
+            Args:
+                extra: Ignored extra keyword arguments.
+
+            Returns:
+                Fixed stub hash string.
+            """
+            del extra
+            return "stub_hash"
+
+    stub_module = types.ModuleType("superset.common.query_object")
+    stub_module.QueryObject = _StubQO  # type: ignore[attr-defined]
+
+    sys.modules.setdefault("superset", types.ModuleType("superset"))
+    sys.modules.setdefault(
+        "superset.common", types.ModuleType("superset.common")
+    )
+    sys.modules["superset.common.query_object"] = stub_module
+
+    flask = types.ModuleType("flask")
+    setattr(flask, "g", FLASK_G)
+    extensions = types.ModuleType("superset.extensions")
+    setattr(
+        extensions,
+        "feature_flag_manager",
+        types.SimpleNamespace(
+            is_feature_enabled=ENABLED_FEATURE_FLAGS.__contains__
+        ),
+    )
+
+    ns: dict = {}
+    with mock.patch.dict(
+        sys.modules, {"flask": flask, "superset.extensions": extensions}
+    ):
+        exec(block, ns)  # nosec B102  # pylint: disable=exec-used
+    return ns
+
+
+PATCH = _load_patch_ns()
+
+norm = PATCH["_qo_norm_sql_str"]
+norm_expr = PATCH["_qo_norm"]
+norm_orderby = PATCH["_qo_norm_orderby"]
+patched_cache_key = PATCH["_qo_patched_cache_key"]
+
+
+def mk_metric(sql, label="m"):
+    """Return a minimal adhoc-SQL metric dict.
+
+    Args:
+        sql: SQL expression of the metric.
+        label: Metric label.
+
+    Returns:
+        The metric dict.
+    """
+    return {"expressionType": "SQL", "sqlExpression": sql, "label": label}
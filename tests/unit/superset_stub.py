@@ -0,0 +1,545 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Local stand-in for the Superset REST API used by the charm.
+
+Serves the endpoints called by ``SupersetApiClient`` over HTTP on a
+loopback port. Databases are stored in a temporary SQLite ``dbs`` table
+with the columns read by ``get_trino_databases``, so the metadata-DB
+query and the REST calls see the same state. Every request is counted,
+along with request and response body bytes.
+"""
+
+import contextlib
+import json
+import re
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable
+from urllib.parse import parse_qs, urlsplit
+
+import jwt
+from sqlalchemy.engine import make_url
+
+PASSWORD_MASK = "XXXXXXXXXX"
+CSRF_TOKEN = "stub-csrf-token"  # nosec B105
+
+ROLES = re.compile(r"^/api/v1/security/roles/$")
+ROLE_PERMISSIONS = re.compile(r"^/api/v1/security/roles/(\d+)/permissions/?$")
+PERMISSIONS_RESOURCES = re.compile(
+    r"^/api/v1/security/permissions-resources/$"
+)
+DATABASES = re.compile(r"^/api/v1/database/$")
+DATABASE_ITEM = re.compile(r"^/api/v1/database/(\d+)$")
+ITEM_ID = re.compile(r"/\d+")
+
+# Handler of an authenticated endpoint: (path match, parsed ``q``, payload)
+# to (HTTP status, JSON response)
+RouteHandler = Callable[[re.Match, dict[str, Any], Any], tuple[int, Any]]
+
+
+def _token(lifetime: timedelta) -> str:
+    """Issue an unsigned-secret JWT the client can decode.
+
+    Args:
+        lifetime: Time until the token expires.
+
+    Returns:
+        Encoded JWT.
+    """
+    exp = datetime.now(timezone.utc) + lifetime
+    return jwt.encode({"exp": int(exp.timestamp())}, "stub", "HS256")
+
+
+def _login() -> tuple[int, Any]:
+    """Issue access and refresh tokens.
+
+    Returns:
+        Tuple of (HTTP status, JSON response).
+    """
+    return 200, {
+        "access_token": _token(timedelta(minutes=15)),
+        "refresh_token": _token(timedelta(days=30)),
+    }
+
+
+def _refresh() -> tuple[int, Any]:
+    """Issue a new access token.
+
+    Returns:
+        Tuple of (HTTP status, JSON response).
+    """
+    return 200, {"access_token": _token(timedelta(minutes=15))}
+
+
+# Endpoints answered without an access token
+PUBLIC_ROUTES: dict[tuple[str, str], Callable[[], tuple[int, Any]]] = {
+    ("POST", "/api/v1/security/login"): _login,
+    ("POST", "/api/v1/security/refresh"): _refresh,
+}
+
+
+def _lookup(row: dict[str, Any], col: str) -> Any:
+    """Resolve a dotted filter column against a result row.
+
+    Args:
+        row: Result row.
+        col: Column, e.g. ``view_menu.name``.
+
+    Returns:
+        The value, or None if missing.
+    """
+    value: Any = row
+    for part in col.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def _matches(row: dict[str, Any], filters: list[dict[str, Any]]) -> bool:
+    """Apply Superset ``eq`` and ``ct`` filters to a row.
+
+    Args:
+        row: Result row.
+        filters: Filters from the ``q`` parameter.
+
+    Returns:
+        True if the row matches every filter.
+    """
+    for flt in filters:
+        value = _lookup(row, flt["col"])
+        if flt["opr"] == "eq" and value != flt["value"]:
+            return False
+        if flt["opr"] == "ct" and str(flt["value"]) not in str(value):
+            return False
+    return True
+
+
+class SupersetStub:
+    """In-process Superset API stand-in.
+
+    Attrs:
+        url: Base URL to pass to ``SupersetApiClient``.
+        metadata_db_uri: SQLAlchemy URI of the backing ``dbs`` table.
+        requests: Number of HTTP requests served.
+        bytes_in: Request body bytes received.
+        bytes_out: Response body bytes sent.
+        endpoints: Request count per "METHOD path" with IDs collapsed.
+    """
+
+    def __init__(self, roles: tuple[str, ...] = ("Admin", "Public")):
+        """Construct.
+
+        Args:
+            roles: Names of the roles that exist, given IDs from 1.
+        """
+        # Resources are released by __exit__, or here if setup fails
+        with contextlib.ExitStack() as stack:
+            tmp = stack.enter_context(tempfile.TemporaryDirectory())
+            db_path = Path(tmp) / "superset.db"
+            self.metadata_db_uri = f"sqlite:///{db_path}"
+            self._db = stack.enter_context(
+                contextlib.closing(
+                    sqlite3.connect(db_path, check_same_thread=False)
+                )
+            )
+            self._create_tables()
+            self._server = stack.enter_context(
+                ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+            )
+            self._resources = stack.pop_all()
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True
+        )
+
+        self._lock = threading.Lock()
+        self.roles: list[dict[str, Any]] = [
+            {"id": i, "name": name} for i, name in enumerate(roles, 1)
+        ]
+        self.role_permissions: dict[int, set[int]] = {
+            role["id"]: set() for role in self.roles
+        }
+        # Unrelated permissions, so server-side filters have work to do
+        self.permissions: list[dict[str, Any]] = [
+            {
+                "id": i,
+                "permission": {"name": perm},
+                "view_menu": {"name": view},
+            }
+            for i, (perm, view) in enumerate(
+                [
+                    ("can_read", "Dashboard"),
+                    ("can_write", "Dashboard"),
+                    ("can_read", "Chart"),
+                    ("all_database_access", "all_database_access"),
+                ],
+                1,
+            )
+        ]
+
+        self.requests = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.endpoints: dict[str, int] = {}
+
+        self._routes: list[tuple[str, re.Pattern, RouteHandler]] = [
+            ("GET", ROLES, self._list_roles),
+            ("GET", ROLE_PERMISSIONS, self._get_role_permissions),
+            ("POST", ROLE_PERMISSIONS, self._set_role_permissions),
+            ("GET", PERMISSIONS_RESOURCES, self._list_permissions),
+            ("GET", DATABASES, self._list_databases),
+            ("POST", DATABASES, self._create_database),
+            ("PUT", DATABASE_ITEM, self._update_database),
+        ]
+
+    def _create_tables(self) -> None:
+        """Create the ``dbs`` table read by the metadata-DB query."""
+        # Durability is irrelevant here and fsyncs would dominate timings
+        self._db.execute("PRAGMA synchronous = OFF")
+        self._db.execute(
+            "CREATE TABLE dbs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "database_name TEXT UNIQUE NOT NULL, "
+            "sqlalchemy_uri TEXT NOT NULL, "
+            "extra TEXT, "
+            "cache_timeout INTEGER)"
+        )
+        self._db.commit()
+
+    def __enter__(self) -> "SupersetStub":
+        """Start serving.
+
+        Returns:
+            The running stub.
+        """
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        """Stop serving and remove the database.
+
+        Args:
+            exc_info: Exception details, if any.
+        """
+        self._server.shutdown()
+        self._resources.close()
+
+    def reset_counters(self) -> None:
+        """Zero the request and byte counters."""
+        with self._lock:
+            self.requests = self.bytes_in = self.bytes_out = 0
+            self.endpoints = {}
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        """Build the request handler class bound to this stub.
+
+        Returns:
+            Request handler class.
+        """
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """Dispatch requests to the stub."""
+
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately; avoid delayed ACKs
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                """Silence per-request logging.
+
+                Args:
+                    args: Ignored log arguments.
+                """
+
+            def _serve(self, method: str) -> None:
+                """Read, dispatch and answer one request.
+
+                Args:
+                    method: HTTP method.
+                """
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                parts = urlsplit(self.path)
+                status, result = stub.dispatch(
+                    method,
+                    parts.path,
+                    parse_qs(parts.query),
+                    json.loads(body) if body else None,
+                    self.headers,
+                )
+                data = json.dumps(result).encode()
+                stub.record(method, parts.path, len(body), len(data))
+
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):  # noqa: N802
+                """Serve GET."""
+                self._serve("GET")
+
+            def do_POST(self):  # noqa: N802
+                """Serve POST."""
+                self._serve("POST")
+
+            def do_PUT(self):  # noqa: N802
+                """Serve PUT."""
+                self._serve("PUT")
+
+        return Handler
+
+    def record(
+        self, method: str, path: str, bytes_in: int, bytes_out: int
+    ) -> None:
+        """Count a served request.
+
+        Args:
+            method: HTTP method.
+            path: Request path.
+            bytes_in: Request body size.
+            bytes_out: Response body size.
+        """
+        key = f"{method} {ITEM_ID.sub('/<id>', path)}"
+        with self._lock:
+            self.requests += 1
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self.endpoints[key] = self.endpoints.get(key, 0) + 1
+
+    def dispatch(
+        self,
+        method: str,
+        path: str,
+        query: dict[str, list[str]],
+        payload: Any,
+        headers: Any,
+    ) -> tuple[int, Any]:
+        """Route a request to its endpoint.
+
+        Args:
+            method: HTTP method.
+            path: Request path.
+            query: Parsed query string.
+            payload: Parsed JSON body, if any.
+            headers: Request headers.
+
+        Returns:
+            Tuple of (HTTP status, JSON response).
+        """
+        public = PUBLIC_ROUTES.get((method, path))
+        if public:
+            return public()
+
+        if not headers.get("Authorization", "").startswith("Bearer "):
+            return 401, {"msg": "Missing Authorization Header"}
+        if path == "/api/v1/security/csrf_token/":
+            return 200, {"result": CSRF_TOKEN}
+        if method != "GET" and headers.get("X-CSRF-Token") != CSRF_TOKEN:
+            return 400, {"errors": ["The CSRF token is missing."]}
+
+        q = json.loads(query["q"][0]) if "q" in query else {}
+        for route_method, pattern, handler in self._routes:
+            match = pattern.match(path)
+            if match and route_method == method:
+                with self._lock:
+                    return handler(match, q, payload)
+
+        return 404, {"message": f"No stub for {method} {path}"}
+
+    def _list_roles(self, match, q, payload) -> tuple[int, Any]:
+        """List roles.
+
+        Args:
+            match: Path match.
+            q: Parsed ``q`` parameter.
+            payload: Ignored request body.
+
+        Returns:
+            Tuple of (HTTP status, JSON response).
+        """
+        return 200, self._page(self.roles, q)
+
+    def _list_permissions(self, match, q, payload) -> tuple[int, Any]:
+        """List permission/view-menu pairs.
+
+        Args:
+            match: Path match.
+            q: Parsed ``q`` parameter.
+            payload: Ignored request body.
+
+        Returns:
+            Tuple of (HTTP status, JSON response).
+        """
+        return 200, self._page(self.permissions, q)
+
+    def _list_databases(self, match, q, payload) -> tuple[int, Any]:
+        """List databases.
+
+        Args:
+            match: Path match.
+            q: Parsed ``q`` parameter.
+            payload: Ignored request body.
+
+        Returns:
+            Tuple of (HTTP status, JSON response).
+        """
+        return 200, self._page(self._databases(), q)
+
+    def _get_role_permissions(self, match, q, payload) -> tuple[int, Any]:
+        """List the permission IDs of a role.
+
+        Args:
+            match: Path match holding the role ID.
+            q: Ignored ``q`` parameter.
+            payload: Ignored request body.
+
+        Returns:
+            Tuple of (HTTP status, JSON response).
+        """
+        role_id = int(match.group(1))
+        if role_id not in self.role_permissions:
+            return 404, {"message": "Not found"}
+        permission_ids = sorted(self.role_permissions[role_id])
+        return 200, {"result": [{"id": pid} for pid in permission_ids]}
+
+    def _set_role_permissions(self, match, q, payload) -> tuple[int, Any]:
+        """Replace the permissions of a role.
+
+        Args:
+            match: Path match holding the role ID.
+            q: Ignored ``q`` parameter.
+            payload: Body with ``permission_view_menu_ids``.
+
+        Returns:
+            Tuple of (HTTP status, JSON response).
+        """
+        role_id = int(match.group(1))
+        if role_id not in self.role_permissions:
+            return 404, {"message": "Not found"}
+        self.role_permissions[role_id] = set(
+            payload["permission_view_menu_ids"]
+        )
+        return 200, {"result": payload}
+
+    @staticmethod
+    def _page(rows: list[dict[str, Any]], q: dict[str, Any]) -> dict:
+        """Filter and paginate a listing like Superset's FAB APIs.
+
+        Args:
+            rows: All rows of the listing.
+            q: Parsed ``q`` parameter.
+
+        Returns:
+            Response with ``count`` and the requested page of ``result``.
+        """
+        matched = [r for r in rows if _matches(r, q.get("filters", []))]
+        page, page_size = q.get("page", 0), q.get("page_size", 20)
+        start = page * page_size
+        end = start + page_size
+        return {"count": len(matched), "result": matched[start:end]}
+
+    def _databases(self) -> list[dict[str, Any]]:
+        """List the stored databases.
+
+        Returns:
+            Database rows.
+        """
+        rows = self._db.execute(
+            "SELECT id, database_name, sqlalchemy_uri FROM dbs ORDER BY id"
+        ).fetchall()
+        return [
+            {"id": r[0], "database_name": r[1], "sqlalchemy_uri": r[2]}
+            for r in rows
+        ]
+
+    @staticmethod
+    def _mask(uri: str) -> str:
+        """Mask the password of a URI the way Superset stores it.
+
+        Args:
+            uri: SQLAlchemy URI.
+
+        Returns:
+            URI with the password masked.
+        """
+        url = make_url(uri)
+        if url.password:
+            url = url.set(password=PASSWORD_MASK)
+        return url.render_as_string(hide_password=False)
+
+    def _create_database(self, match, q, payload) -> tuple[int, Any]:
+        """Insert a database and its database_access permission.
+
+        Args:
+            match: Path match.
+            q: Ignored ``q`` parameter.
+            payload: Create payload.
+
+        Returns:
+            Tuple of (HTTP status, JSON response).
+        """
+        try:
+            cursor = self._db.execute(
+                "INSERT INTO dbs "
+                "(database_name, sqlalchemy_uri, extra, cache_timeout) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    payload["database_name"],
+                    self._mask(payload["sqlalchemy_uri"]),
+                    payload.get("extra"),
+                    payload.get("cache_timeout"),
+                ),
+            )
+        except sqlite3.IntegrityError:
+            return 422, {"message": {"database_name": ["already exists"]}}
+        self._db.commit()
+
+        db_id = cursor.lastrowid
+        self.permissions.append(
+            {
+                "id": len(self.permissions) + 1,
+                "permission": {"name": "database_access"},
+                "view_menu": {
+                    "name": f"[{payload['database_name']}].(id:{db_id})"
+                },
+            }
+        )
+        return 201, {"id": db_id, "result": payload}
+
+    def _update_database(self, match, q, payload) -> tuple[int, Any]:
+        """Update the given columns of a database.
+
+        Args:
+            match: Path match holding the database ID.
+            q: Ignored ``q`` parameter.
+            payload: Update payload.
+
+        Returns:
+            Tuple of (HTTP status, JSON response).
+        """
+        db_id = int(match.group(1))
+        columns = {
+            key: payload[key]
+            for key in ("sqlalchemy_uri", "extra", "cache_timeout")
+            if key in payload
+        }
+        if "sqlalchemy_uri" in columns:
+            columns["sqlalchemy_uri"] = self._mask(columns["sqlalchemy_uri"])
+        if columns:
+            assignments = ", ".join(f"{key} = ?" for key in columns)
+            cursor = self._db.execute(
+                f"UPDATE dbs SET {assignments} WHERE id = ?",  # nosec B608
+                (*columns.values(), db_id),
+            )
+            self._db.commit()
+            if not cursor.rowcount:
+                return 404, {"message": "Not found"}
+        return 200, {"id": db_id, "result": payload}
@@ -0,0 +1,345 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Per-instance memoization of patched QueryObject cache keys.
+
+Superset calls cache_key() several times for the same QueryObject within
+one chart-data request. The patch memoizes the digest on the instance with
+a pickled fingerprint of its state and of the user, database and feature
+flag state cache_key() reads; these tests check that any change to that
+state recomputes, and that a memo hit is cheaper than recomputing.
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+import time
+import types
+import unittest
+
+from tests.unit.cache_key_patch import (
+    ENABLED_FEATURE_FLAGS,
+    FLASK_G,
+    PATCH,
+    mk_metric,
+    patched_cache_key,
+)
+
+logger = logging.getLogger(__name__)
+
+# cache_key() calls per chart-data request, calls per round, and rounds
+# whose best time is kept so that noise on shared runners does not count
+CALLS_PER_REQUEST = 3
+BENCHMARK_CALLS = 500
+BENCHMARK_ROUNDS = 5
+
+
+class _FakeQueryObject:  # pylint: disable=too-many-instance-attributes
+    """QueryObject stand-in with the attributes chart-data requests set.
+
+    Attrs:
+        datasource: ORM datasource, compared by identity.
+        metrics: Metrics, some of them adhoc SQL.
+        columns: Group-by columns.
+        orderby: Order-by pairs.
+        series_limit_metric: Series limit metric, if any.
+        row_limit: Row limit.
+        filter: Filters.
+        extras: Extra query settings.
+        from_dttm: Start of the time range.
+        to_dttm: End of the time range.
+        post_processing: Post-processing operations.
+        callback: Arbitrary attribute, possibly unpicklable.
+    """
+
+    def __init__(self, metrics=None, columns=None, orderby=None, slm=None):
+        """Initialise with realistic defaults.
+
+        Args:
+            metrics: Metrics, empty by default.
+            columns: Group-by columns, empty by default.
+            orderby: Order-by pairs, empty by default.
+            slm: Series limit metric.
+        """
+        self.datasource = None
+        self.metrics = metrics if metrics is not None else []
+        self.columns = columns if columns is not None else []
+        self.orderby = orderby if orderby is not None else []
+        self.series_limit_metric = slm
+        self.row_limit = 10000
+        self.filter = [
+            {"col": "country", "op": "IN", "val": ["FR", "DE", "US"]},
+            {"col": "ds", "op": "TEMPORAL_RANGE", "val": "Last week"},
+        ]
+        self.extras = {"having": "", "where": "", "time_grain_sqla": "P1D"}
+        self.from_dttm = datetime.datetime(2026, 1, 1)
+        self.to_dttm = datetime.datetime(2026, 1, 8)
+        self.post_processing = [
+            {
+                "operation": "pivot",
+                "options": {
+                    "index": ["__timestamp"],
+                    "columns": ["country"],
+                    "aggregates": {"m0": {"operator": "mean"}},
+                },
+            }
+        ]
+        self.callback = None
+
+
+def _superset_like_cache_key(query_obj, **extra):
+    """Hash a QueryObject like Superset, as a sorted JSON dump.
+
+    Args:
+        query_obj: QueryObject to hash.
+        extra: Extra keyword arguments folded into the hash.
+
+    Returns:
+        MD5 hex digest.
+    """
+    cache_dict = {
+        key: value
+        for key, value in vars(query_obj).items()
+        if key not in ("datasource", "callback", PATCH["_QO_MEMO_ATTR"])
+    }
+    cache_dict.update(extra)
+    return hashlib.md5(  # nosec B324
+        json.dumps(cache_dict, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def _realistic_query_object():
+    """Build a QueryObject with custom-SQL metrics like dashboards use.
+
+    Returns:
+        The QueryObject.
+    """
+    metrics = [
+        mk_metric(
+            f"SUM(CASE \n  WHEN \"Stage {i}\" = 'Closed - Won'\n"
+            f"  THEN amount_{i} ELSE 0 END)\n",
+            f"m{i}",
+        )
+        for i in range(4)
+    ] + ["count"]
+    return _FakeQueryObject(
+        metrics=metrics,
+        columns=["country", "state"],
+        orderby=[[metrics[0], False]],
+    )
+
+
+class _CacheKeyTestCase(unittest.TestCase):
+    """Swaps the original cache_key seen by the patched closure."""
+
+    def setUp(self):
+        """Start without a user or flags, restore the patch after each test."""
+        for name in ("_qo_orig_cache_key", "_qo_fingerprint", "_qo_g"):
+            self.addCleanup(PATCH.__setitem__, name, PATCH[name])
+        FLASK_G.__dict__.clear()
+        ENABLED_FEATURE_FLAGS.clear()
+
+
+class TestCacheKeyMemo(_CacheKeyTestCase):
+    """The memo is reused only while the hashed state is unchanged."""
+
+    def _counting_orig(self):
+        """Install an orig that counts calls and hashes the metric SQL.
+
+        Returns:
+            List whose length is the number of orig calls.
+        """
+        calls: list = []
+
+        def counting_orig(s, **e):
+            """Record the call and return a state-dependent hash.
+
+            Args:
+                s: QueryObject stub to inspect.
+                e: Extra keyword arguments folded into the hash.
+
+            Returns:
+                Hash string derived from metrics and extras.
+            """
+            calls.append(1)
+            return repr((s.metrics, s.row_limit, sorted(e.items())))
+
+        PATCH["_qo_orig_cache_key"] = counting_orig
+        return calls
+
+    def test_repeated_calls_reuse_memo(self):
+        """Unchanged state hashes once and reuses the digest afterwards."""
+        calls = self._counting_orig()
+        obj = _FakeQueryObject(metrics=[mk_metric("SUM( x )")])
+        hits = PATCH["_QO_CACHE_KEY_STATS"]["hits"]
+
+        first = patched_cache_key(obj, rls="[]")
+        self.assertEqual(patched_cache_key(obj, rls="[]"), first)
+        self.assertEqual(patched_cache_key(obj, rls="[]"), first)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(PATCH["_QO_CACHE_KEY_STATS"]["hits"], hits + 2)
+
+    def test_in_place_mutation_invalidates_memo(self):
+        """Mutating a hashed attribute in place forces a recomputation."""
+        calls = self._counting_orig()
+        metric = mk_metric("SUM( x )")
+        obj = _FakeQueryObject(metrics=[metric])
+
+        first = patched_cache_key(obj)
+        metric["sqlExpression"] = "SUM( y )"
+        second = patched_cache_key(obj)
+
+        self.assertEqual(len(calls), 2)
+        self.assertNotEqual(first, second)
+
+    def test_new_attribute_value_invalidates_memo(self):
+        """Reassigning any hashed attribute forces a recomputation."""
+        calls = self._counting_orig()
+        obj = _FakeQueryObject()
+        patched_cache_key(obj)
+        obj.row_limit = 10
+        patched_cache_key(obj)
+        self.assertEqual(len(calls), 2)
+
+    def test_extra_kwargs_invalidate_memo(self):
+        """Different keyword arguments are hashed separately."""
+        calls = self._counting_orig()
+        obj = _FakeQueryObject()
+        first = patched_cache_key(obj, changed_on="2026-01-01")
+        second = patched_cache_key(obj, changed_on="2026-01-02")
+        self.assertEqual(len(calls), 2)
+        self.assertNotEqual(first, second)
+
+    def test_datasource_compared_by_identity(self):
+        """Swapping the datasource object forces a recomputation."""
+        calls = self._counting_orig()
+        obj = _FakeQueryObject()
+        obj.datasource = object()
+        patched_cache_key(obj)
+        patched_cache_key(obj)
+        obj.datasource = object()
+        patched_cache_key(obj)
+        self.assertEqual(len(calls), 2)
+
+    def test_user_change_invalidates_memo(self):
+        """Another user recomputes, as the key may include impersonation."""
+        calls = self._counting_orig()
+        obj = _FakeQueryObject()
+        FLASK_G.user = types.SimpleNamespace(id=1, username="alice")
+        patched_cache_key(obj)
+        patched_cache_key(obj)
+        FLASK_G.user = types.SimpleNamespace(id=2, username="bob")
+        patched_cache_key(obj)
+        self.assertEqual(len(calls), 2)
+
+    def test_database_change_invalidates_memo(self):
+        """Changing impersonation or extra on the same database recomputes."""
+        calls = self._counting_orig()
+        database = types.SimpleNamespace(impersonate_user=False, extra="{}")
+        obj = _FakeQueryObject()
+        obj.datasource = types.SimpleNamespace(database=database)
+        patched_cache_key(obj)
+        database.impersonate_user = True
+        patched_cache_key(obj)
+        database.extra = '{"per_user_caching": true}'
+        patched_cache_key(obj)
+        patched_cache_key(obj)
+        self.assertEqual(len(calls), 3)
+
+    def test_feature_flag_change_invalidates_memo(self):
+        """Turning on per-user caching flags recomputes."""
+        calls = self._counting_orig()
+        obj = _FakeQueryObject()
+        patched_cache_key(obj)
+        ENABLED_FEATURE_FLAGS.add("CACHE_QUERY_BY_USER")
+        patched_cache_key(obj)
+        ENABLED_FEATURE_FLAGS.add("CACHE_IMPERSONATION")
+        patched_cache_key(obj)
+        self.assertEqual(len(calls), 3)
+
+    def test_unreadable_context_not_memoized(self):
+        """Without an app context to read the user from, nothing is memoized."""
+
+        class _NoAppContext:
+            """flask.g outside of an application context."""
+
+            def __getattr__(self, name):
+                """Fail like flask.g does.
+
+                Args:
+                    name: Attribute name.
+
+                Raises:
+                    RuntimeError: always.
+                """
+                raise RuntimeError("Working outside of application context.")
+
+        calls = self._counting_orig()
+        PATCH["_qo_g"] = _NoAppContext()
+        obj = _FakeQueryObject()
+        patched_cache_key(obj)
+        patched_cache_key(obj)
+        self.assertEqual(len(calls), 2)
+
+    def test_unpicklable_state_not_memoized(self):
+        """State that cannot be fingerprinted is always recomputed."""
+        calls = self._counting_orig()
+        obj = _FakeQueryObject()
+        obj.callback = lambda: None
+        patched_cache_key(obj)
+        patched_cache_key(obj)
+        self.assertEqual(len(calls), 2)
+
+
+class TestCacheKeyMemoBenchmark(_CacheKeyTestCase):
+    """The fingerprint costs less than the normalise and hash it skips."""
+
+    @staticmethod
+    def _call_seconds(warm):
+        """Measure cache_key() calls on realistic QueryObjects.
+
+        Args:
+            warm: whether every QueryObject was hashed before, so calls hit
+                the memo when it is enabled.
+
+        Returns:
+            Best average time per call over the rounds, in seconds.
+        """
+        best = float("inf")
+        for _ in range(BENCHMARK_ROUNDS):
+            objs = [_realistic_query_object() for _ in range(BENCHMARK_CALLS)]
+            if warm:
+                for obj in objs:
+                    patched_cache_key(obj, rls="[]")
+            start = time.perf_counter()
+            for obj in objs:
+                patched_cache_key(obj, rls="[]")
+            best = min(best, time.perf_counter() - start)
+        return best / BENCHMARK_CALLS
+
+    def test_call_latency(self):
+        """A memo hit costs a fraction of recomputing the key."""
+        PATCH["_qo_orig_cache_key"] = _superset_like_cache_key
+        miss = self._call_seconds(warm=False)
+        hit = self._call_seconds(warm=True)
+        # Without a fingerprint nothing is memoized, as before the memo
+        PATCH["_qo_fingerprint"] = lambda self, extra: None
+        recomputed = self._call_seconds(warm=True)
+        logger.info(
+            "cache_key per call: recomputed %.1f us, memo miss %.1f us, "
+            "memo hit %.1f us; %d calls per request: %.1f us -> %.1f us",
+            recomputed * 1e6,
+            miss * 1e6,
+            hit * 1e6,
+            CALLS_PER_REQUEST,
+            CALLS_PER_REQUEST * recomputed * 1e6,
+            (miss + (CALLS_PER_REQUEST - 1) * hit) * 1e6,
+        )
+
+        self.assertLess(hit, recomputed * 0.75)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,90 +1,18 @@
 # Copyright 2023 Canonical Ltd.
 # See LICENSE file for licensing details.
 
-"""Unit tests for the QueryObject cache-key SQL normaliser patch.
+"""Unit tests for the QueryObject cache-key SQL normaliser patch."""
 
-The patch lives in templates/superset_config.py and is loaded by every
-Superset process at startup via PYTHONPATH. These tests extract the patch
-functions and exercise them in isolation with no installed Superset package
-or running Juju model required.
-"""
-
-import pathlib
-import sys
-import types
 import unittest
 
-# ---------------------------------------------------------------------------
-# Bootstrap: extract patch functions without importing Superset
-# ---------------------------------------------------------------------------
-
-
-def _load_patch_ns():
-    """Exec only the fix block from superset_config.py with a stubbed QO.
-
-    Returns a dict of names defined by the fix block:
-    _qo_norm_sql_str, _qo_norm, _qo_norm_orderby, _qo_patched_cache_key.
-    """
-    config_path = (
-        pathlib.Path(__file__).parent.parent.parent
-        / "templates"
-        / "superset_config.py"
-    )
-    if not config_path.exists():
-        raise FileNotFoundError(
-            f"superset_config.py not found at {config_path}"
-        )
-
-    src = config_path.read_text()
-
-    start_marker = (
-        "from superset.common.query_object import QueryObject as _QO"
-    )
-    end_marker = "# End fix: QueryObject cache-key SQL normalisation"
-    start = src.index(start_marker)
-    end = src.index(end_marker)
-    block = src[start:end]
-
-    class _StubQO:
-        """Stand-in QueryObject used to load the patch without Superset."""
-
-        def cache_key(self, **extra):
-            """Return a fixed stub hash.
-
-            Args:
-                extra: Ignored extra keyword arguments.
-
-            Returns:
-                Fixed stub hash string.
-            """
-            del extra
-            return "stub_hash"
-
-    stub_module = types.ModuleType("superset.common.query_object")
-    stub_module.QueryObject = _StubQO  # type: ignore[attr-defined]
-
-    sys.modules.setdefault("superset", types.ModuleType("superset"))
-    sys.modules.setdefault(
-        "superset.common", types.ModuleType("superset.common")
-    )
-    sys.modules["superset.common.query_object"] = stub_module
-
-    ns: dict = {}
-    exec(block, ns)  # nosec B102  # pylint: disable=exec-used
-    return ns
-
-
-_P = _load_patch_ns()
-
-_norm = _P["_qo_norm_sql_str"]
-_norm_expr = _P["_qo_norm"]
-_norm_ob = _P["_qo_norm_orderby"]
-_patched_ck = _P["_qo_patched_cache_key"]
-
-
-def _mk_metric(sql, label="m"):
-    """Return a minimal adhoc-SQL metric dict."""
-    return {"expressionType": "SQL", "sqlExpression": sql, "label": label}
+from tests.unit.cache_key_patch import (
+    PATCH,
+    mk_metric,
+    norm,
+    norm_expr,
+    norm_orderby,
+    patched_cache_key,
+)
 
 
 def _orig_returning_h(*args, **kwargs):
@@ -112,28 +40,28 @@ class TestNormSqlStr(  # pylint: disable=too-many-public-methods
             "        AND amount > 0\n    END)\n\n    "
         )
         ui = "SUM(CASE WHEN \"Stage\" = 'Closed Won' AND amount>0 END)"
-        self.assertEqual(_norm(worker), _norm(ui))
+        self.assertEqual(norm(worker), norm(ui))
 
     def test_p1_trailing_whitespace_stripped(self):
         """Trailing newlines and spaces are removed."""
-        self.assertEqual(_norm("SUM(x)\n\n    "), "SUM(x)")
+        self.assertEqual(norm("SUM(x)\n\n    "), "SUM(x)")
 
     def test_p1_internal_newlines_collapsed(self):
         """Internal newlines and indentation are collapsed to a single space."""
         worker = "SUM(CASE\n        WHEN x>0\n        THEN 1\n    END)"
         ui = "SUM(CASE WHEN x>0 THEN 1 END)"
-        self.assertEqual(_norm(worker), _norm(ui))
+        self.assertEqual(norm(worker), norm(ui))
 
     def test_p2_operator_spacing_converge(self):
         """Worker (no spaces) and UI (with spaces) around + produce same output."""
         no_spaces = 'SUM("Y1 Renewal"+"Y1 Not Renewal")'
         with_spaces = 'SUM("Y1 Renewal" + "Y1 Not Renewal")'
-        self.assertEqual(_norm(no_spaces), _norm(with_spaces))
+        self.assertEqual(norm(no_spaces), norm(with_spaces))
 
     def test_p2_operator_spacing_all_variants(self):
         """All whitespace variants around an operator produce the same form."""
         forms = ["a+b", "a +b", "a+ b", "a + b", "a   +   b"]
-        results = {_norm(f) for f in forms}
+        results = {norm(f) for f in forms}
         self.assertEqual(
             len(results),
             1,
@@ -145,65 +73,65 @@ class TestNormSqlStr(  # pylint: disable=too-many-public-methods
     def test_literal_operator_chars_preserved(self):
         """Operator-like chars inside single-quoted literals are untouched."""
         sql = "CASE WHEN stage = 'Closed - Won' THEN 1 END"
-        self.assertIn("'Closed - Won'", _norm(sql))
+        self.assertIn("'Closed - Won'", norm(sql))
 
     def test_literal_multiple_spaces_preserved(self):
         """Multiple consecutive spaces inside a literal are left as-is."""
         sql = "MAX('A   B   C')"
-        self.assertIn("'A   B   C'", _norm(sql))
+        self.assertIn("'A   B   C'", norm(sql))
 
     def test_literal_arithmetic_plus_preserved(self):
         """Plus sign inside a string literal is not treated as an operator."""
         sql = "CASE WHEN label = 'revenue + discount' THEN 1 END"
-        self.assertIn("'revenue + discount'", _norm(sql))
+        self.assertIn("'revenue + discount'", norm(sql))
 
     def test_literal_slash_preserved(self):
         """Forward slash inside a literal is not treated as division."""
         sql = "CASE WHEN type = 'A/B test' THEN 1 END"
-        self.assertIn("'A/B test'", _norm(sql))
+        self.assertIn("'A/B test'", norm(sql))
 
     def test_literal_star_preserved(self):
         """Asterisk inside a literal is not treated as multiplication."""
         sql = "CASE WHEN name = '5 * 5 = 25' THEN 1 END"
-        self.assertIn("'5 * 5 = 25'", _norm(sql))
+        self.assertIn("'5 * 5 = 25'", norm(sql))
 
     def test_literal_doubled_quote_escape_preserved(self):
         """SQL escaped single quote (doubled) is copied verbatim."""
         sql = "MAX('it''s a - test')"
-        self.assertIn("'it''s a - test'", _norm(sql))
+        self.assertIn("'it''s a - test'", norm(sql))
 
     def test_literal_comment_markers_not_treated_as_comments(self):
         """Comment markers inside a literal are not parsed as comments."""
         sql1 = "CASE WHEN note = '-- not a comment' THEN 1 END"
-        self.assertIn("'-- not a comment'", _norm(sql1))
+        self.assertIn("'-- not a comment'", norm(sql1))
 
         sql2 = "CASE WHEN note = '/* also not */' THEN 1 END"
-        self.assertIn("'/* also not */'", _norm(sql2))
+        self.assertIn("'/* also not */'", norm(sql2))
 
     def test_literal_empty_string_preserved(self):
         """Empty string literal is preserved."""
-        self.assertIn("''", _norm("COALESCE(x, '')"))
+        self.assertIn("''", norm("COALESCE(x, '')"))
 
     def test_double_quoted_identifier_content_preserved(self):
         """Operator-like chars inside double-quoted identifiers are untouched."""
-        self.assertIn('"Gross - Net"', _norm('SUM("Gross - Net")'))
+        self.assertIn('"Gross - Net"', norm('SUM("Gross - Net")'))
 
     def test_double_quoted_identifier_spaces_preserved(self):
         """Multiple spaces inside a double-quoted identifier are preserved."""
-        self.assertIn('"Head  Count"', _norm('SUM("Head  Count")'))
+        self.assertIn('"Head  Count"', norm('SUM("Head  Count")'))
 
     def test_double_quoted_identifier_doubled_escape_preserved(self):
         """Doubled double-quote escape inside identifier is copied verbatim."""
-        self.assertIn('"col""name"', _norm('SELECT "col""name"'))
+        self.assertIn('"col""name"', norm('SELECT "col""name"'))
 
     def test_backtick_identifier_preserved(self):
         """Content inside backtick identifiers is copied verbatim."""
-        self.assertIn("`col - name`", _norm("SUM(`col - name`)"))
+        self.assertIn("`col - name`", norm("SUM(`col - name`)"))
 
     def test_mixed_literals_and_code(self):
         """Code operators are collapsed while literal content is preserved."""
         sql = "CASE WHEN s = 'Closed - Won' THEN revenue + discount ELSE 0 END"
-        out = _norm(sql)
+        out = norm(sql)
         self.assertIn("'Closed - Won'", out)
         self.assertIn("revenue+discount", out)
         self.assertNotIn("revenue + discount", out)
@@ -213,31 +141,31 @@ class TestNormSqlStr(  # pylint: disable=too-many-public-methods
     def test_line_comment_content_preserved(self):
         """Operators inside a line comment are not modified."""
         sql = "a -- minus b\n + c"
-        self.assertIn("-- minus b", _norm(sql))
+        self.assertIn("-- minus b", norm(sql))
 
     def test_block_comment_content_preserved(self):
         """Operators inside a block comment are not modified."""
         sql = "a /* x - y */ + b"
-        self.assertIn("/* x - y */", _norm(sql))
+        self.assertIn("/* x - y */", norm(sql))
 
     def test_block_comment_multiline_preserved(self):
         """Multi-line block comment content is copied verbatim."""
         sql = "x /* line1\nline2\nline3 */ + y"
-        self.assertIn("/* line1\nline2\nline3 */", _norm(sql))
+        self.assertIn("/* line1\nline2\nline3 */", norm(sql))
 
     def test_comment_at_end_preserved(self):
         """A trailing line comment is copied verbatim."""
-        self.assertIn("-- total revenue", _norm("SUM(x) -- total revenue"))
+        self.assertIn("-- total revenue", norm("SUM(x) -- total revenue"))
 
     # ---- Operator / whitespace normalisation ---------------------------- #
 
     def test_all_arithmetic_operators_tightened(self):
         """Spaces around all arithmetic operators are removed."""
-        self.assertEqual(_norm("a + b"), "a+b")
-        self.assertEqual(_norm("a - b"), "a-b")
-        self.assertEqual(_norm("a * b"), "a*b")
-        self.assertEqual(_norm("a / b"), "a/b")
-        self.assertEqual(_norm("a % b"), "a%b")
+        self.assertEqual(norm("a + b"), "a+b")
+        self.assertEqual(norm("a - b"), "a-b")
+        self.assertEqual(norm("a * b"), "a*b")
+        self.assertEqual(norm("a / b"), "a/b")
+        self.assertEqual(norm("a % b"), "a%b")
 
     def test_comparison_operators_tightened(self):
         """Spaces around comparison operators are removed."""
@@ -251,47 +179,47 @@ class TestNormSqlStr(  # pylint: disable=too-many-public-methods
             ("a <> b", "a<>b"),
         ]:
             with self.subTest(sql=sql):
-                self.assertEqual(_norm(sql), want)
+                self.assertEqual(norm(sql), want)
 
     def test_pipe_operator_tightened(self):
         """Spaces around || string concat operator are removed."""
-        self.assertEqual(_norm("a || b"), "a||b")
+        self.assertEqual(norm("a || b"), "a||b")
 
     def test_mixed_operator_chain(self):
         """Spaces around all operators in a chain are removed."""
-        self.assertEqual(_norm("a + b * c - d / e"), "a+b*c-d/e")
+        self.assertEqual(norm("a + b * c - d / e"), "a+b*c-d/e")
 
     def test_paren_spaces_tightened(self):
         """Spaces inside function-call parentheses are removed."""
-        self.assertEqual(_norm("SUM( x )"), "SUM(x)")
-        self.assertEqual(_norm("COALESCE( a , b )"), "COALESCE(a,b)")
+        self.assertEqual(norm("SUM( x )"), "SUM(x)")
+        self.assertEqual(norm("COALESCE( a , b )"), "COALESCE(a,b)")
 
     def test_tab_whitespace_collapsed(self):
         """Tabs around operators and between keywords are handled."""
-        self.assertEqual(_norm("a\t+\tb"), "a+b")
-        self.assertEqual(_norm("CASE\tWHEN\tx"), "CASE WHEN x")
+        self.assertEqual(norm("a\t+\tb"), "a+b")
+        self.assertEqual(norm("CASE\tWHEN\tx"), "CASE WHEN x")
 
     def test_mixed_newline_formats(self):
         """CRLF and bare CR in SQL code are treated as whitespace."""
         crlf = "CASE\r\nWHEN x > 0\r\nTHEN 1 END"
         lf = "CASE\nWHEN x > 0\nTHEN 1 END"
         cr = "CASE\rWHEN x > 0\rTHEN 1 END"
-        self.assertEqual(_norm(crlf), _norm(lf))
-        self.assertEqual(_norm(cr), _norm(lf))
+        self.assertEqual(norm(crlf), norm(lf))
+        self.assertEqual(norm(cr), norm(lf))
 
     def test_leading_whitespace_stripped(self):
         """Leading whitespace is removed."""
-        self.assertEqual(_norm("   SUM(x)"), "SUM(x)")
+        self.assertEqual(norm("   SUM(x)"), "SUM(x)")
 
     def test_trailing_whitespace_stripped(self):
         """Trailing whitespace and newlines are removed."""
-        self.assertEqual(_norm("SUM(x)   "), "SUM(x)")
-        self.assertEqual(_norm("SUM(x)\n\n    "), "SUM(x)")
+        self.assertEqual(norm("SUM(x)   "), "SUM(x)")
+        self.assertEqual(norm("SUM(x)\n\n    "), "SUM(x)")
 
     def test_keywords_separated_by_single_space(self):
         """Multiple spaces between keyword tokens collapse to one."""
         self.assertEqual(
-            _norm("CASE   WHEN   x   THEN   y   END"),
+            norm("CASE   WHEN   x   THEN   y   END"),
             "CASE WHEN x THEN y END",
         )
 
@@ -299,65 +227,65 @@ class TestNormSqlStr(  # pylint: disable=too-many-public-methods
 
     def test_count_star_safe(self):
         """COUNT(*) is preserved."""
-        self.assertEqual(_norm("COUNT(*)"), "COUNT(*)")
+        self.assertEqual(norm("COUNT(*)"), "COUNT(*)")
 
     def test_count_star_with_spaces(self):
         """COUNT( * ) normalises to COUNT(*)."""
-        self.assertEqual(_norm("COUNT( * )"), "COUNT(*)")
+        self.assertEqual(norm("COUNT( * )"), "COUNT(*)")
 
     def test_cast_expression(self):
         """CAST with spaces normalises correctly."""
         self.assertEqual(
-            _norm("CAST( amount AS FLOAT )"), "CAST(amount AS FLOAT)"
+            norm("CAST( amount AS FLOAT )"), "CAST(amount AS FLOAT)"
         )
 
     def test_between_expression(self):
         """BETWEEN expression is handled correctly."""
         self.assertEqual(
-            _norm("amount BETWEEN 0 AND 100"),
+            norm("amount BETWEEN 0 AND 100"),
             "amount BETWEEN 0 AND 100",
         )
 
     def test_is_null(self):
         """IS NULL and IS NOT NULL are handled correctly."""
-        self.assertEqual(_norm("x IS NULL"), "x IS NULL")
-        self.assertEqual(_norm("x IS NOT NULL"), "x IS NOT NULL")
+        self.assertEqual(norm("x IS NULL"), "x IS NULL")
+        self.assertEqual(norm("x IS NOT NULL"), "x IS NOT NULL")
 
     def test_unary_minus_not_fused_into_comment(self):
         """'a - -b' must not become 'a--b' (a SQL comment start)."""
-        out = _norm("a - -b")
+        out = norm("a - -b")
         self.assertNotIn("--", out)
 
     def test_unary_plus_not_fused_into_block_comment(self):
         """'a / *b' must not become 'a/*b' (a SQL block-comment start)."""
-        self.assertNotIn("/*", _norm("a / *b"))
+        self.assertNotIn("/*", norm("a / *b"))
 
     def test_schema_qualified_table(self):
         """schema.table dot notation is preserved."""
-        self.assertEqual(_norm("schema.table"), "schema.table")
+        self.assertEqual(norm("schema.table"), "schema.table")
 
     def test_colon_cast_postgres(self):
         """Colon cast (::) for PostgreSQL is tightened."""
-        self.assertEqual(_norm("value :: INT"), "value::INT")
+        self.assertEqual(norm("value :: INT"), "value::INT")
 
     # ---- Edge cases ----------------------------------------------------- #
 
     def test_empty_string(self):
         """Empty string returns empty string."""
-        self.assertEqual(_norm(""), "")
+        self.assertEqual(norm(""), "")
 
     def test_whitespace_only(self):
         """Whitespace-only input returns empty string."""
-        self.assertEqual(_norm("   "), "")
-        self.assertEqual(_norm("\n\n  \t"), "")
+        self.assertEqual(norm("   "), "")
+        self.assertEqual(norm("\n\n  \t"), "")
 
     def test_single_identifier(self):
         """Single identifier is returned unchanged."""
-        self.assertEqual(_norm("revenue"), "revenue")
+        self.assertEqual(norm("revenue"), "revenue")
 
     def test_deeply_nested_parens(self):
         """Deeply nested function calls are normalised correctly."""
-        self.assertEqual(_norm("f( g( h( a + b ) ) )"), "f(g(h(a+b)))")
+        self.assertEqual(norm("f( g( h( a + b ) ) )"), "f(g(h(a+b)))")
 
     def test_very_long_multiline_case(self):
         """Realistic multi-branch CASE collapses to a single line."""
@@ -370,7 +298,7 @@ class TestNormSqlStr(  # pylint: disable=too-many-public-methods
             "    ELSE 0\n"
             "END)\n\n    "
         )
-        out = _norm(sql)
+        out = norm(sql)
         self.assertNotIn("\n", out)
         self.assertIn("'Closed Won'", out)
         self.assertIn("'In Progress'", out)
@@ -379,7 +307,7 @@ class TestNormSqlStr(  # pylint: disable=too-many-public-methods
     def test_unclosed_string_literal_no_crash(self):
         """Scanner reaching EOF inside a literal must not raise."""
         try:
-            out = _norm("CASE WHEN x = 'unclosed")
+            out = norm("CASE WHEN x = 'unclosed")
             self.assertIsInstance(out, str)
         except Exception as exc:  # pylint: disable=broad-exception-caught
             self.fail(f"Raised exception on unclosed literal: {exc}")
@@ -387,7 +315,7 @@ class TestNormSqlStr(  # pylint: disable=too-many-public-methods
     def test_unclosed_block_comment_no_crash(self):
         """Scanner reaching EOF inside a block comment must not raise."""
         try:
-            out = _norm("x + /* unclosed comment")
+            out = norm("x + /* unclosed comment")
             self.assertIsInstance(out, str)
         except Exception as exc:  # pylint: disable=broad-exception-caught
             self.fail(f"Raised exception on unclosed comment: {exc}")
@@ -397,8 +325,8 @@ class TestNormSqlStr(  # pylint: disable=too-many-public-methods
         sql = (
             "SUM(CASE\n  WHEN a > 0\n  THEN revenue + cost\n  ELSE 0\nEND)\n\n"
         )
-        once = _norm(sql)
-        self.assertEqual(_norm(once), once)
+        once = norm(sql)
+        self.assertEqual(norm(once), once)
 
 
 # ---------------------------------------------------------------------------
@@ -413,17 +341,17 @@ class TestNormExpr(unittest.TestCase):
         """Non-dict values are returned unchanged."""
         for val in ("raw_string", 42, None, ["list"]):
             with self.subTest(val=val):
-                self.assertIs(_norm_expr(val), val)
+                self.assertIs(norm_expr(val), val)
 
     def test_dict_without_expression_type_passthrough(self):
         """Dict without expressionType is returned unchanged."""
         d = {"label": "m", "sqlExpression": "SUM(x + y)"}
-        self.assertIs(_norm_expr(d), d)
+        self.assertIs(norm_expr(d), d)
 
     def test_dict_with_non_sql_expression_type_passthrough(self):
         """Dict with expressionType != 'SQL' is returned unchanged."""
         d = {"expressionType": "SIMPLE", "column": "revenue"}
-        self.assertIs(_norm_expr(d), d)
+        self.assertIs(norm_expr(d), d)
 
     def test_adhoc_sql_dict_normaliseised(self):
         """Dict with expressionType='SQL' gets sqlExpression normalised."""
@@ -432,13 +360,13 @@ class TestNormExpr(unittest.TestCase):
             "sqlExpression": "SUM( x + y )",
             "label": "m",
         }
-        self.assertEqual(_norm_expr(d)["sqlExpression"], "SUM(x+y)")
+        self.assertEqual(norm_expr(d)["sqlExpression"], "SUM(x+y)")
 
     def test_original_dict_not_mutated(self):
         """The original dict object is not modified in place."""
         original_sql = "SUM( x + y )"
         d = {"expressionType": "SQL", "sqlExpression": original_sql}
-        _norm_expr(d)
+        norm_expr(d)
         self.assertEqual(d["sqlExpression"], original_sql)
 
     def test_other_fields_preserved(self):
@@ -449,20 +377,20 @@ class TestNormExpr(unittest.TestCase):
             "label": "my metric",
             "optionName": "abc123",
         }
-        result = _norm_expr(d)
+        result = norm_expr(d)
         self.assertEqual(result["label"], "my metric")
         self.assertEqual(result["optionName"], "abc123")
 
     def test_result_is_new_dict(self):
         """The returned dict is a new object, not the original."""
         d = {"expressionType": "SQL", "sqlExpression": "SUM( x )"}
-        self.assertIsNot(_norm_expr(d), d)
+        self.assertIsNot(norm_expr(d), d)
 
     def test_production_metric_pattern1(self):
         """Multiline CASE metric is flattened and literal is preserved."""
         sql = "SUM(CASE \n        WHEN \"Stage\" = 'Closed Won'\n    END)\n\n    "
         d = {"expressionType": "SQL", "sqlExpression": sql, "label": "m"}
-        result = _norm_expr(d)
+        result = norm_expr(d)
         self.assertNotIn("\n", result["sqlExpression"])
         self.assertIn("'Closed Won'", result["sqlExpression"])
 
@@ -475,8 +403,8 @@ class TestNormExpr(unittest.TestCase):
             "sqlExpression": sql.replace(" + ", "+"),
         }
         self.assertEqual(
-            _norm_expr(d_spaces)["sqlExpression"],
-            _norm_expr(d_nospace)["sqlExpression"],
+            norm_expr(d_spaces)["sqlExpression"],
+            norm_expr(d_nospace)["sqlExpression"],
         )
 
 
@@ -492,55 +420,55 @@ class TestNormOrderby(unittest.TestCase):
         """Non-list/non-tuple values are returned unchanged."""
         for val in ("string", 42, None):
             with self.subTest(val=val):
-                self.assertIs(_norm_ob(val), val)
+                self.assertIs(norm_orderby(val), val)
 
     def test_empty_list_passthrough(self):
         """Empty list is returned unchanged."""
         val: list = []
-        self.assertIs(_norm_ob(val), val)
+        self.assertIs(norm_orderby(val), val)
 
     def test_empty_tuple_passthrough(self):
         """Empty tuple is returned unchanged."""
         val: tuple = ()
-        self.assertIs(_norm_ob(val), val)
+        self.assertIs(norm_orderby(val), val)
 
     def test_list_item_first_element_normaliseised(self):
         """First element of a list orderby item is normalised."""
-        metric = _mk_metric("SUM( x + y )")
-        result = _norm_ob([metric, True])
+        metric = mk_metric("SUM( x + y )")
+        result = norm_orderby([metric, True])
         self.assertEqual(result[0]["sqlExpression"], "SUM(x+y)")
         self.assertEqual(result[1], True)
 
     def test_tuple_item_converted_to_list(self):
         """Tuple orderby item is converted to list and normalised."""
-        metric = _mk_metric("SUM( x + y )")
-        result = _norm_ob((metric, False))
+        metric = mk_metric("SUM( x + y )")
+        result = norm_orderby((metric, False))
         self.assertIsInstance(result, list)
         self.assertEqual(result[0]["sqlExpression"], "SUM(x+y)")
         self.assertEqual(result[1], False)
 
     def test_non_sql_first_element_passthrough(self):
         """Non-adhoc-SQL first element is passed through unchanged."""
-        result = _norm_ob(["plain_column", True])
+        result = norm_orderby(["plain_column", True])
         self.assertEqual(result[0], "plain_column")
 
     def test_original_metric_dict_not_mutated(self):
         """The original metric dict inside the orderby item is not modified."""
         original_sql = "SUM( x + y )"
-        metric = _mk_metric(original_sql)
-        _norm_ob([metric, True])
+        metric = mk_metric(original_sql)
+        norm_orderby([metric, True])
         self.assertEqual(metric["sqlExpression"], original_sql)
 
     def test_result_is_new_list(self):
         """The returned list is a new object."""
-        metric = _mk_metric("SUM( x )")
+        metric = mk_metric("SUM( x )")
         item = [metric, True]
-        self.assertIsNot(_norm_ob(item), item)
+        self.assertIsNot(norm_orderby(item), item)
 
     def test_extra_elements_preserved(self):
         """Elements beyond [metric, bool] are preserved."""
-        metric = _mk_metric("SUM( x )")
-        result = _norm_ob([metric, True, "extra"])
+        metric = mk_metric("SUM( x )")
+        result = norm_orderby([metric, True, "extra"])
         self.assertEqual(len(result), 3)
         self.assertEqual(result[2], "extra")
 
@@ -554,21 +482,21 @@ class TestPatchedCacheKey(unittest.TestCase):
     """Tests for the save/restore wrapper around QueryObject.cache_key.
 
     _qo_patched_cache_key calls _qo_orig_cache_key via a global lookup in
-    the exec namespace (_P). setUp/tearDown save and restore that slot so
+    the exec namespace (PATCH). setUp/tearDown save and restore that slot so
     each test can inject a stand-in that records what it was called with.
     """
 
     def setUp(self):
         """Save the original _qo_orig_cache_key before each test."""
-        self._saved_orig = _P["_qo_orig_cache_key"]
+        self._saved_orig = PATCH["_qo_orig_cache_key"]
 
     def tearDown(self):
         """Restore _qo_orig_cache_key after each test."""
-        _P["_qo_orig_cache_key"] = self._saved_orig
+        PATCH["_qo_orig_cache_key"] = self._saved_orig
 
     def _set_orig(self, fn):
         """Replace the orig function seen by the patched closure."""
-        _P["_qo_orig_cache_key"] = fn
+        PATCH["_qo_orig_cache_key"] = fn
 
     def _make_obj(self, metrics=None, columns=None, orderby=None, slm=None):
         """Create a minimal stub that patched_cache_key can operate on."""
@@ -594,50 +522,50 @@ class TestPatchedCacheKey(unittest.TestCase):
 
     def test_metrics_restored_after_call(self):
         """Original metrics list and dict objects are restored after hashing."""
-        metric = _mk_metric("SUM( x + y )")
+        metric = mk_metric("SUM( x + y )")
         obj = self._make_obj(metrics=[metric])
         self._set_orig(_orig_returning_h)
 
-        _patched_ck(obj)
+        patched_cache_key(obj)
 
         self.assertIs(obj.metrics[0], metric)
         self.assertEqual(obj.metrics[0]["sqlExpression"], "SUM( x + y )")
 
     def test_columns_restored_after_call(self):
         """Original columns are restored after hashing."""
-        col = _mk_metric("MAX( a )")
+        col = mk_metric("MAX( a )")
         obj = self._make_obj(columns=[col])
         self._set_orig(_orig_returning_h)
-        _patched_ck(obj)
+        patched_cache_key(obj)
         self.assertIs(obj.columns[0], col)
 
     def test_orderby_restored_after_call(self):
         """Original orderby is restored after hashing."""
-        metric = _mk_metric("SUM( x )")
+        metric = mk_metric("SUM( x )")
         ob = [metric, True]
         obj = self._make_obj(orderby=[ob])
         self._set_orig(_orig_returning_h)
-        _patched_ck(obj)
+        patched_cache_key(obj)
         self.assertIs(obj.orderby[0], ob)
 
     def test_series_limit_metric_restored(self):
         """Original series_limit_metric is restored after hashing."""
-        slm = _mk_metric("MAX( z )")
+        slm = mk_metric("MAX( z )")
         obj = self._make_obj(slm=slm)
         self._set_orig(_orig_returning_h)
-        _patched_ck(obj)
+        patched_cache_key(obj)
         self.assertIs(obj.series_limit_metric, slm)
 
     def test_none_series_limit_metric_stays_none(self):
         """None series_limit_metric is not normalised and stays None."""
         obj = self._make_obj(slm=None)
         self._set_orig(_orig_returning_h)
-        _patched_ck(obj)
+        patched_cache_key(obj)
         self.assertIsNone(obj.series_limit_metric)
 
     def test_attributes_restored_even_when_orig_raises(self):
         """Attributes are restored via finally even if orig raises."""
-        metric = _mk_metric("SUM( x + y )")
+        metric = mk_metric("SUM( x + y )")
         obj = self._make_obj(metrics=[metric])
 
         def exploding(*args, **kwargs):
@@ -656,7 +584,7 @@ class TestPatchedCacheKey(unittest.TestCase):
         self._set_orig(exploding)
 
         with self.assertRaises(RuntimeError):
-            _patched_ck(obj)
+            patched_cache_key(obj)
 
         self.assertIs(obj.metrics[0], metric)
         self.assertEqual(obj.metrics[0]["sqlExpression"], "SUM( x + y )")
@@ -686,10 +614,10 @@ class TestPatchedCacheKey(unittest.TestCase):
             return "H"
 
         self._set_orig(recording_orig)
-        metric = _mk_metric("SUM( a + b )")
+        metric = mk_metric("SUM( a + b )")
         obj = self._make_obj(metrics=[metric], orderby=[[metric, True]])
 
-        _patched_ck(obj)
+        patched_cache_key(obj)
 
         self.assertEqual(seen["metrics"], ["SUM(a+b)"])
         self.assertEqual(seen["orderby"], ["SUM(a+b)"])
@@ -697,11 +625,11 @@ class TestPatchedCacheKey(unittest.TestCase):
     def test_original_dict_not_mutated_by_call(self):
         """The original metric dict is not modified in place during hashing."""
         original_sql = "SUM( a + b )"
-        metric = _mk_metric(original_sql)
+        metric = mk_metric(original_sql)
         obj = self._make_obj(metrics=[metric])
         self._set_orig(_orig_returning_h)
 
-        _patched_ck(obj)
+        patched_cache_key(obj)
 
         self.assertEqual(metric["sqlExpression"], original_sql)
 
@@ -711,7 +639,7 @@ class TestPatchedCacheKey(unittest.TestCase):
         """Empty attribute lists are handled without errors."""
         obj = self._make_obj()
         self._set_orig(_orig_returning_h)
-        self.assertEqual(_patched_ck(obj), "H")
+        self.assertEqual(patched_cache_key(obj), "H")
         self.assertEqual(obj.metrics, [])
 
     def test_none_metrics_treated_as_empty(self):
@@ -722,7 +650,7 @@ class TestPatchedCacheKey(unittest.TestCase):
         obj.orderby = None
         self._set_orig(_orig_returning_h)
 
-        _patched_ck(obj)
+        patched_cache_key(obj)
 
         self.assertIsNone(obj.metrics)
 
@@ -747,7 +675,7 @@ class TestPatchedCacheKey(unittest.TestCase):
         self._set_orig(recording_orig)
         obj = self._make_obj(metrics=["count", "sum__amount"])
 
-        _patched_ck(obj)
+        patched_cache_key(obj)
 
         self.assertEqual(seen["metrics"], ["count", "sum__amount"])
         self.assertEqual(obj.metrics, ["count", "sum__amount"])
@@ -772,7 +700,7 @@ class TestPatchedCacheKey(unittest.TestCase):
 
         self._set_orig(returning_specific)
         obj = self._make_obj()
-        self.assertEqual(_patched_ck(obj), "abc123")
+        self.assertEqual(patched_cache_key(obj), "abc123")
 
     def test_extra_kwargs_forwarded(self):
         """Keyword arguments such as datasource and rls are forwarded to orig."""
@@ -794,7 +722,9 @@ class TestPatchedCacheKey(unittest.TestCase):
 
         self._set_orig(capturing_orig)
         obj = self._make_obj()
-        _patched_ck(obj, datasource="ds:1", rls="[]", changed_on="2026-01-01")
+        patched_cache_key(
+            obj, datasource="ds:1", rls="[]", changed_on="2026-01-01"
+        )
         self.assertEqual(received["datasource"], "ds:1")
         self.assertEqual(received["rls"], "[]")
 
@@ -810,7 +740,7 @@ class TestConvergence(unittest.TestCase):
     def _normalise(self, sql):
         """Normalise an sqlExpression string via the adhoc dict wrapper."""
         d = {"expressionType": "SQL", "sqlExpression": sql}
-        return _norm_expr(d)["sqlExpression"]
+        return norm_expr(d)["sqlExpression"]
 
     def test_multiline_case_worker_vs_ui(self):
         """Worker (multiline) and UI (single-line) CASE converge."""
@@ -859,8 +789,8 @@ class TestConvergence(unittest.TestCase):
         metric = {"expressionType": "SQL", "sqlExpression": sql, "label": "m"}
         ob_item = [metric, True]
         self.assertEqual(
-            _norm_expr(metric)["sqlExpression"],
-            _norm_ob(ob_item)[0]["sqlExpression"],
+            norm_expr(metric)["sqlExpression"],
+            norm_orderby(ob_item)[0]["sqlExpression"],
         )
 
     def test_five_metrics_all_converge(self):
@@ -0,0 +1,221 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Equivalence, memoization and throughput of the cache-key SQL tokenizer.
+
+The regex tokenizer of _qo_norm_sql_str is checked byte for byte against
+the character scanner it replaced, on edge cases and random inputs.
+"""
+
+import random
+import time
+import unittest
+
+from tests.unit.cache_key_patch import PATCH, norm
+
+_REF_TIGHT = set("+-*/%(),.=<>!|&~^:[]")
+_REF_QUOTES = ("'", '"', "`")
+
+
+def _ref_quoted_end(s, i):
+    """Find the end of the quoted literal or identifier starting at i.
+
+    Args:
+        s: SQL expression.
+        i: Position of the opening quote.
+
+    Returns:
+        Position after the closing quote, or the end of s if unclosed.
+    """
+    quote = s[i]
+    j = i + 1
+    while j < len(s):
+        if s[j] == quote:
+            if s.startswith(quote * 2, j):
+                j += 2
+                continue
+            return j + 1
+        j += 1
+    return len(s)
+
+
+def _ref_word_end(s, i):
+    """Find the end of the identifier or word run starting at i.
+
+    Args:
+        s: SQL expression.
+        i: Position of the first character.
+
+    Returns:
+        Position after the last character of the run.
+    """
+    j = i
+    while (
+        j < len(s)
+        and not s[j].isspace()
+        and s[j] not in _REF_TIGHT
+        and s[j] not in _REF_QUOTES
+    ):
+        j += 1
+    return j
+
+
+def _ref_next_token(s, i):
+    """Scan the token starting at i.
+
+    Args:
+        s: SQL expression.
+        i: Position of the token.
+
+    Returns:
+        Tuple of the token kind, "value", "tight" or "ws", and its end.
+    """
+    if s.startswith("--", i):
+        j = s.find("\n", i)
+        return "value", len(s) if j == -1 else j
+    if s.startswith("/*", i):
+        j = s.find("*/", i + 2)
+        return "value", len(s) if j == -1 else j + 2
+    if s[i] in _REF_QUOTES:
+        return "value", _ref_quoted_end(s, i)
+    if s[i].isspace():
+        return "ws", i + 1
+    if s[i] in _REF_TIGHT:
+        return "tight", i + 1
+    return "value", _ref_word_end(s, i)
+
+
+def _reference_norm(sql):
+    """Character-by-character scanner that the regex tokenizer replaced.
+
+    Kept as the oracle for byte-identical output.
+
+    Args:
+        sql: SQL expression to normalise.
+
+    Returns:
+        Normalised SQL string.
+    """
+    s = sql.replace("\r\n", "\n").replace("\r", "\n")
+    out: list = []
+    pending_ws = False
+    i = 0
+    while i < len(s):
+        kind, j = _ref_next_token(s, i)
+        text = s[i:j]
+        i = j
+        if kind == "ws":
+            pending_ws = True
+            continue
+        last = out[-1] if out else ""
+        if kind == "tight":
+            # Never fuse two characters into a comment marker
+            if out and (last + text) in ("--", "/*", "*/"):
+                out.append(" ")
+        elif out and pending_ws and last not in _REF_TIGHT:
+            out.append(" ")
+        out.append(text)
+        pending_ws = False
+    return "".join(out)
+
+
+def _realistic_corpus(count):
+    """Build distinct custom-SQL metric expressions like dashboards use.
+
+    Args:
+        count: Number of expressions to build.
+
+    Returns:
+        List of SQL expression strings.
+    """
+    return [
+        (
+            f"SUM(CASE \n        WHEN \"Stage {i}\" = 'Closed - Won' \n"
+            f"        AND amount_{i} > {i} -- note {i}\n"
+            f'        THEN "Y1 Renewal"+"Y1 Not Renewal" * 1.{i}\n'
+            "        ELSE 0 /* fallback */ END)\n\n    "
+        )
+        for i in range(count)
+    ]
+
+
+class TestNormSqlStrTokenizer(unittest.TestCase):
+    """The regex tokenizer matches the scanner and is memoized."""
+
+    _ALPHABET = "ab1_ \t\n\r'\"`-/*+(),.=<>!|&~^:[]%\u00a0\u2003"
+
+    def setUp(self):
+        """Start every test with an empty memo."""
+        norm.cache_clear()
+
+    def test_byte_identical_on_edge_cases(self):
+        """Hand-written edge cases match the reference scanner."""
+        cases = [
+            "",
+            "   ",
+            "a - -b",
+            "a / *b",
+            "a * / b",
+            "x --c\ny",
+            "/*/ x",
+            "'unclosed",
+            "'a''' b",
+            '"a""b" + `c``d`',
+            "SUM(x)\r\n\r",
+            "value :: INT",
+            "COUNT( * )",
+        ] + _realistic_corpus(5)
+        for sql in cases:
+            with self.subTest(sql=sql[:40]):
+                self.assertEqual(norm(sql), _reference_norm(sql))
+
+    def test_byte_identical_on_random_inputs(self):
+        """Randomly generated token soup matches the reference scanner."""
+        rng = random.Random(37114)
+        for _ in range(3000):
+            sql = "".join(
+                rng.choice(self._ALPHABET) for _ in range(rng.randint(0, 40))
+            )
+            self.assertEqual(
+                norm.__wrapped__(sql), _reference_norm(sql), repr(sql)
+            )
+
+    def test_memo_reused_for_same_sql(self):
+        """Repeated expressions are served from the memo."""
+        sql = _realistic_corpus(1)[0]
+        first = norm(sql)
+        for _ in range(10):
+            self.assertEqual(norm(sql), first)
+        info = norm.cache_info()
+        self.assertEqual(info.misses, 1)
+        self.assertEqual(info.hits, 10)
+
+    def test_memo_is_bounded(self):
+        """The memo never grows beyond its configured size."""
+        size = PATCH["_QO_NORM_CACHE_SIZE"]
+        for i in range(size + 10):
+            norm(f"SUM( x_{i} )")
+        self.assertEqual(norm.cache_info().currsize, size)
+
+    def test_throughput_floor(self):
+        """Uncached normalisation keeps a conservative throughput floor."""
+        corpus = _realistic_corpus(2000)
+        start = time.perf_counter()
+        for sql in corpus:
+            norm.__wrapped__(sql)
+        elapsed = time.perf_counter() - start
+        # 1.5 ms per expression is far slower than the tokenizer on CI
+        # hardware, so only a real regression trips this.
+        self.assertLess(elapsed, 3.0, f"2000 exprs in {elapsed:.3f}s")
+
+    def test_memoized_throughput_floor(self):
+        """Memoized lookups stay far cheaper than normalising."""
+        corpus = _realistic_corpus(50)
+        for sql in corpus:
+            norm(sql)
+        start = time.perf_counter()
+        for _ in range(200):
+            for sql in corpus:
+                norm(sql)
+        elapsed = time.perf_counter() - start
+        self.assertLess(elapsed, 1.0, f"10000 lookups in {elapsed:.3f}s")
@@ -0,0 +1,125 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for the Celery queue-wait metrics.
+
+The module lives in templates/celery_metrics.py and is loaded by every
+Superset process at startup via PYTHONPATH. These tests stub out Celery so
+the module can be imported with no installed Celery package.
+"""
+
+import importlib.util
+import pathlib
+import sys
+import types
+import unittest
+from unittest import mock
+
+
+class _Signal:
+    """Celery signal stand-in keeping its connected receivers.
+
+    Attrs:
+        receivers: connected callbacks.
+    """
+
+    def __init__(self):
+        """Initialise with no receivers."""
+        self.receivers = []
+
+    def connect(self, weak=True):
+        """Return a decorator connecting a receiver.
+
+        Args:
+            weak: ignored.
+
+        Returns:
+            The decorator.
+        """
+
+        def decorator(func):
+            self.receivers.append(func)
+            return func
+
+        return decorator
+
+    def send(self, **kwargs):
+        """Call every receiver.
+
+        Args:
+            kwargs: signal arguments.
+        """
+        for receiver in self.receivers:
+            receiver(**kwargs)
+
+
+# Tests send through these references, which pylint can resolve unlike
+# attributes of a stub module
+_before_task_publish = _Signal()
+_task_prerun = _Signal()
+_signals = types.ModuleType("celery.signals")
+setattr(_signals, "before_task_publish", _before_task_publish)
+setattr(_signals, "task_prerun", _task_prerun)
+_celery = types.ModuleType("celery")
+setattr(_celery, "signals", _signals)
+
+_MODULE_PATH = (
+    pathlib.Path(__file__).parent.parent.parent
+    / "templates"
+    / "celery_metrics.py"
+)
+_spec = importlib.util.spec_from_file_location("celery_metrics", _MODULE_PATH)
+assert _spec is not None and _spec.loader is not None
+celery_metrics = importlib.util.module_from_spec(_spec)
+with mock.patch.dict(
+    sys.modules, {"celery": _celery, "celery.signals": _signals}
+):
+    _spec.loader.exec_module(celery_metrics)
+
+
+class TestQueueWait(unittest.TestCase):
+    """Queue waits are measured from publish to start."""
+
+    def setUp(self):
+        """Attach the signal receivers with a mocked socket."""
+        for signal in (_before_task_publish, _task_prerun):
+            signal.receivers.clear()
+        patcher = mock.patch.object(celery_metrics.socket, "socket")
+        self.sock = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        celery_metrics.attach_queue_wait_metrics("localhost", "9125")
+
+    def _task(self, headers):
+        """Build a task whose request carries the given headers.
+
+        Args:
+            headers: message headers.
+
+        Returns:
+            The task.
+        """
+        return types.SimpleNamespace(
+            name="sql_lab.get_sql_results",
+            request=types.SimpleNamespace(**headers),
+        )
+
+    def test_wait_reported_with_task_tag(self):
+        """The wait is sent in milliseconds, tagged with the task name."""
+        headers = {}
+        with mock.patch.object(celery_metrics.time, "time", return_value=100):
+            _before_task_publish.send(headers=headers)
+        with mock.patch.object(
+            celery_metrics.time, "time", return_value=102.5
+        ):
+            _task_prerun.send(task=self._task(headers))
+
+        self.sock.sendto.assert_called_once_with(
+            b"superset.celery.queue_wait:2500.000|ms"
+            b"|#name:sql_lab.get_sql_results",
+            ("localhost", 9125),
+        )
+
+    def test_unstamped_task_ignored(self):
+        """Tasks published without the header report nothing."""
+        _task_prerun.send(task=self._task({}))
+        self.sock.sendto.assert_not_called()
@@ -0,0 +1,76 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for the Gunicorn server hooks.
+
+The hooks live in templates/gunicorn_config.py and are loaded by Gunicorn
+through its --config flag.
+"""
+
+import importlib.util
+import pathlib
+import types
+import unittest
+from unittest import mock
+
+_MODULE_PATH = (
+    pathlib.Path(__file__).parent.parent.parent
+    / "templates"
+    / "gunicorn_config.py"
+)
+_spec = importlib.util.spec_from_file_location("gunicorn_config", _MODULE_PATH)
+assert _spec is not None and _spec.loader is not None
+gunicorn_config = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(gunicorn_config)
+
+
+class TestCapacityGauge(unittest.TestCase):
+    """The server capacity is published on worker changes and periodically."""
+
+    def test_capacity_published(self):
+        """Capacity is workers times connections per worker."""
+        server = types.SimpleNamespace(
+            log=mock.Mock(),
+            cfg=types.SimpleNamespace(worker_connections=10),
+        )
+        gunicorn_config.nworkers_changed(server, 4, None)
+        server.log.gauge.assert_called_once_with("gunicorn.capacity", 40)
+
+    def test_without_statsd(self):
+        """Nothing is published when statsd is not configured."""
+        server = types.SimpleNamespace(
+            log=object(),
+            cfg=types.SimpleNamespace(worker_connections=10),
+        )
+        gunicorn_config.nworkers_changed(server, 4, None)
+
+    def test_capacity_republished(self):
+        """Capacity is sent again until reporting stops."""
+        server = types.SimpleNamespace(
+            log=mock.Mock(),
+            cfg=types.SimpleNamespace(worker_connections=10),
+            num_workers=2,
+        )
+        stopped = mock.Mock()
+        stopped.wait.side_effect = [False, False, True]
+
+        gunicorn_config._report_capacity_periodically(server, stopped)
+
+        stopped.wait.assert_called_with(gunicorn_config.CAPACITY_INTERVAL)
+        self.assertEqual(
+            server.log.gauge.call_args_list,
+            [mock.call("gunicorn.capacity", 20)] * 2,
+        )
+
+    def test_reporter_started_when_ready(self):
+        """The master starts a daemon thread reporting the capacity."""
+        server = mock.Mock()
+        with mock.patch.object(gunicorn_config.threading, "Thread") as thread:
+            gunicorn_config.when_ready(server)
+
+        self.assertIs(
+            thread.call_args.kwargs["target"],
+            gunicorn_config._report_capacity_periodically,
+        )
+        self.assertTrue(thread.call_args.kwargs["daemon"])
+        thread.return_value.start.assert_called_once_with()
@@ -0,0 +1,175 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Request-latency benchmark of Superset logging.
+
+Emits the records of a simulated request, a burst of DEBUG records and
+one INFO record, and measures the time the request spends logging. The
+previous setup logged at DEBUG level with synchronous handlers; it is
+compared with the queue-backed configurator at DEBUG and INFO levels.
+
+The output stream is slowed down to stand in for a busy disk or log
+pipe. Timings are logged for comparison; the assertions check that every
+record is written, and by the listener rather than the request thread.
+"""
+
+# pylint:disable=protected-access
+
+import logging
+import logging.handlers
+import shutil
+import tempfile
+import threading
+import time
+from unittest import TestCase, mock
+
+from tests.unit.test_logging_configurator import (
+    logging_configurator,
+    preserve_root_logger,
+    superset_logging_config,
+)
+
+logger = logging.getLogger(__name__)
+
+REQUESTS = 100
+DEBUG_RECORDS_PER_REQUEST = 20
+# Time a write to the output stream takes
+WRITE_SECONDS = 0.0002
+
+
+class SlowStream:
+    """Output stream taking WRITE_SECONDS per write.
+
+    Attrs:
+        writes: writing thread and text of each write.
+    """
+
+    def __init__(self):
+        """Initialise with no writes."""
+        self.writes = []
+
+    def write(self, text):
+        """Write text.
+
+        Args:
+            text: text to write.
+
+        Returns:
+            Number of characters written.
+        """
+        time.sleep(WRITE_SECONDS)
+        self.writes.append((threading.get_ident(), text))
+        return len(text)
+
+    def flush(self):
+        """Flush the stream."""
+
+
+def request_logging_seconds():
+    """Measure the time requests spend logging.
+
+    Returns:
+        Average logging time of a request, in seconds.
+    """
+    request_logger = logging.getLogger("superset.views.core")
+    start = time.perf_counter()
+    for request in range(REQUESTS):
+        for record in range(DEBUG_RECORDS_PER_REQUEST):
+            request_logger.debug("request %d step %d", request, record)
+        request_logger.info("request %d served", request)
+    return (time.perf_counter() - start) / REQUESTS
+
+
+class TestLoggingLatency(TestCase):
+    """Queued logging keeps log I/O off the request path."""
+
+    def setUp(self):
+        """Send stream output to a slow stream and logs to a temp dir."""
+        preserve_root_logger(self)
+        self.root_handlers = logging.getLogger().handlers[:]
+        self.stream = SlowStream()
+        patcher = mock.patch("sys.stderr", self.stream)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        self.filename = f"{tmp}/superset.log"
+
+    def _request_writers(self):
+        """Collect the threads that wrote request records, then forget them.
+
+        Returns:
+            Writing thread of each request record written to the stream.
+        """
+        writers = [
+            thread for thread, text in self.stream.writes if "request " in text
+        ]
+        self.stream.writes.clear()
+        return writers
+
+    def _synchronous(self):
+        """Measure the previous setup: DEBUG with synchronous handlers.
+
+        Returns:
+            Average logging time of a request, in seconds.
+        """
+        root = logging.getLogger()
+        root.handlers = [
+            logging.StreamHandler(),
+            logging.handlers.TimedRotatingFileHandler(
+                self.filename, when="midnight"
+            ),
+        ]
+        root.setLevel(logging.DEBUG)
+        seconds = request_logging_seconds()
+        for handler in root.handlers:
+            handler.close()
+        root.handlers = self.root_handlers
+        return seconds
+
+    def _queued(self, log_level, log_format):
+        """Measure the queue-backed configurator.
+
+        Args:
+            log_level: root log level.
+            log_format: "text" or "json".
+
+        Returns:
+            Average logging time of a request, in seconds.
+        """
+        configurator = logging_configurator.QueueLoggingConfigurator(
+            log_format=log_format
+        )
+        configurator.configure_logging(
+            superset_logging_config(log_level, self.filename),
+            debug_mode=False,
+        )
+        try:
+            return request_logging_seconds()
+        finally:
+            configurator._stop_listener()
+            logging.getLogger().handlers = self.root_handlers
+
+    def test_request_latency(self):
+        """Queued records are all written, off the request thread."""
+        request_thread = threading.get_ident()
+        synchronous = self._synchronous()
+        self.assertEqual(set(self._request_writers()), {request_thread})
+        queued_debug = self._queued("DEBUG", "json")
+        debug_writers = self._request_writers()
+        queued_info = self._queued("INFO", "json")
+        info_writers = self._request_writers()
+        logger.info(
+            "logging per request: synchronous DEBUG %.3f ms, "
+            "queued DEBUG %.3f ms, queued INFO %.3f ms",
+            synchronous * 1000,
+            queued_debug * 1000,
+            queued_info * 1000,
+        )
+
+        self.assertEqual(
+            len(debug_writers), REQUESTS * (DEBUG_RECORDS_PER_REQUEST + 1)
+        )
+        self.assertNotIn(request_thread, debug_writers)
+        self.assertEqual(len(info_writers), REQUESTS)
+        self.assertNotIn(request_thread, info_writers)
@@ -0,0 +1,218 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for the queue-backed Superset logging configurator.
+
+The module lives in templates/logging_configurator.py and is loaded by
+every Superset process at startup via PYTHONPATH.
+"""
+
+import importlib.util
+import io
+import json
+import logging
+import pathlib
+import subprocess  # nosec B404
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+_MODULE_PATH = (
+    pathlib.Path(__file__).parent.parent.parent
+    / "templates"
+    / "logging_configurator.py"
+)
+_spec = importlib.util.spec_from_file_location(
+    "logging_configurator", _MODULE_PATH
+)
+assert _spec is not None and _spec.loader is not None
+logging_configurator = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(logging_configurator)
+
+
+# Logs from a gevent-patched process, as in Gunicorn's gevent workers, and
+# prints the listener class and the OS threads that wrote and logged
+_GEVENT_SCRIPT = """
+from gevent import monkey
+
+monkey.patch_all()
+
+import importlib.util
+import json
+import logging
+import sys
+
+get_ident = monkey.get_original("_thread", "get_ident")
+writers = set()
+
+
+class Stream:
+    def write(self, text):
+        writers.add(get_ident())
+
+    def flush(self):
+        pass
+
+
+sys.stderr = Stream()
+spec = importlib.util.spec_from_file_location("configurator", sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+configurator = module.QueueLoggingConfigurator()
+configurator.configure_logging(
+    {
+        "LOG_FORMAT": "%(message)s",
+        "LOG_LEVEL": "INFO",
+        "ENABLE_TIME_ROTATE": False,
+        "SILENCE_FAB": False,
+    },
+    debug_mode=False,
+)
+listener = type(configurator.listener).__name__
+logging.getLogger("superset.views").info("chart loaded")
+configurator._stop_listener()
+print(json.dumps(
+    {"listener": listener, "logger": get_ident(), "writers": list(writers)}
+))
+"""
+
+
+def superset_logging_config(log_level="INFO", filename=None):
+    """Build the logging part of a Superset configuration.
+
+    Args:
+        log_level: root log level.
+        filename: file logs are rotated in, if any.
+
+    Returns:
+        The configuration.
+    """
+    return {
+        "LOG_FORMAT": "%(levelname)s:%(name)s:%(message)s",
+        "LOG_LEVEL": log_level,
+        "ENABLE_TIME_ROTATE": filename is not None,
+        "FILENAME": filename,
+        "ROLLOVER": "midnight",
+        "INTERVAL": 1,
+        "BACKUP_COUNT": 30,
+        "SILENCE_FAB": True,
+    }
+
+
+def preserve_root_logger(test_case):
+    """Restore the root logger once a test is done.
+
+    Args:
+        test_case: the running test case.
+    """
+    root = logging.getLogger()
+    test_case.addCleanup(setattr, root, "handlers", root.handlers[:])
+    test_case.addCleanup(root.setLevel, root.level)
+
+
+class TestQueueLoggingConfigurator(unittest.TestCase):
+    """Records are written by the listener thread."""
+
+    def setUp(self):
+        """Capture the stream handler output."""
+        preserve_root_logger(self)
+        self.stream = io.StringIO()
+        patcher = mock.patch("sys.stderr", self.stream)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _configure(self, log_format, **kwargs):
+        """Configure logging through a new configurator.
+
+        Args:
+            log_format: "text" or "json".
+            kwargs: Superset logging configuration.
+
+        Returns:
+            The configurator.
+        """
+        configurator = logging_configurator.QueueLoggingConfigurator(
+            log_format=log_format
+        )
+        configurator.configure_logging(
+            superset_logging_config(**kwargs), debug_mode=False
+        )
+        self.addCleanup(configurator._stop_listener)
+        return configurator
+
+    def test_records_queued_and_filtered(self):
+        """Records go through the queue and honour the level."""
+        with tempfile.TemporaryDirectory() as tmp:
+            filename = f"{tmp}/superset.log"
+            configurator = self._configure(
+                "text", log_level="INFO", filename=filename
+            )
+            root = logging.getLogger()
+            self.assertEqual(len(root.handlers), 1)
+            self.assertIsInstance(
+                root.handlers[0], logging_configurator.LocalQueueHandler
+            )
+
+            logger = logging.getLogger("superset.views")
+            logger.debug("dropped")
+            logger.info("chart %s loaded", 42)
+            configurator._stop_listener()
+
+            self.assertNotIn("dropped", self.stream.getvalue())
+            self.assertIn(
+                "INFO:superset.views:chart 42 loaded", self.stream.getvalue()
+            )
+            with open(filename, encoding="utf-8") as log_file:
+                self.assertIn("chart 42 loaded", log_file.read())
+
+    def test_json_format(self):
+        """JSON logs have one object per line, with the exception."""
+        configurator = self._configure("json")
+
+        logger = logging.getLogger("superset.views")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("query %s failed", "q1")
+        configurator._stop_listener()
+
+        lines = [
+            json.loads(line)
+            for line in self.stream.getvalue().splitlines()
+            if "superset.views" in line
+        ]
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0]["level"], "ERROR")
+        self.assertEqual(lines[0]["logger"], "superset.views")
+        self.assertEqual(lines[0]["message"], "query q1 failed")
+        self.assertIn("ValueError: boom", lines[0]["exception"])
+
+    def test_message_resolved_when_queued(self):
+        """Arguments changed after logging do not alter the message."""
+        configurator = self._configure("text")
+
+        params = {"slice_id": 1}
+        logging.getLogger("superset.views").info("params %s", params)
+        params["slice_id"] = 2
+        configurator._stop_listener()
+
+        self.assertIn("params {'slice_id': 1}", self.stream.getvalue())
+
+
+class TestGeventListener(unittest.TestCase):
+    """The listener stays off the gevent loop serving requests."""
+
+    def test_listener_in_os_thread(self):
+        """Records are written by an OS thread, not a greenlet."""
+        result = subprocess.run(  # nosec B603
+            [sys.executable, "-c", _GEVENT_SCRIPT, str(_MODULE_PATH)],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        output = json.loads(result.stdout)
+
+        self.assertEqual(output["listener"], "ThreadPoolQueueListener")
+        self.assertTrue(output["writers"])
+        self.assertNotIn(output["logger"], output["writers"])
@@ -0,0 +1,184 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for the read-only metadata query routing.
+
+The routing lives in templates/metadata_read_routing.py and is loaded by
+every Superset process at startup via PYTHONPATH. These tests stub out Flask
+so the module can be imported with no installed Flask/Superset package.
+"""
+
+import importlib.util
+import pathlib
+import sys
+import types
+import unittest
+from unittest import mock
+
+from sqlalchemy import column, select, table
+
+# ---------------------------------------------------------------------------
+# Bootstrap: import the module with a stubbed `flask` package
+# ---------------------------------------------------------------------------
+
+_flask_stub = types.ModuleType("flask")
+setattr(_flask_stub, "request", types.SimpleNamespace(path="", method="GET"))
+setattr(_flask_stub, "g", types.SimpleNamespace())
+setattr(_flask_stub, "has_request_context", lambda: True)
+
+_MODULE_PATH = (
+    pathlib.Path(__file__).parent.parent.parent
+    / "templates"
+    / "metadata_read_routing.py"
+)
+_spec = importlib.util.spec_from_file_location(
+    "metadata_read_routing", _MODULE_PATH
+)
+assert _spec is not None and _spec.loader is not None
+mrr = importlib.util.module_from_spec(_spec)
+with mock.patch.dict(sys.modules, {"flask": _flask_stub}):
+    _spec.loader.exec_module(mrr)
+
+
+# ---------------------------------------------------------------------------
+# Test doubles for the Flask app and Flask-SQLAlchemy extension
+# ---------------------------------------------------------------------------
+
+
+class _FakeG(dict):
+    """Flask `g` stand-in supporting both get() and attribute assignment."""
+
+    def __setattr__(self, name, value):
+        """Store attributes as dict items.
+
+        Args:
+            name: attribute name.
+            value: attribute value.
+        """
+        self[name] = value
+
+
+class _FakeSession:
+    """Session class whose get_bind always returns the primary engine.
+
+    Attrs:
+        new: pending new objects.
+        dirty: pending modified objects.
+        deleted: pending deleted objects.
+    """
+
+    _flushing = False
+
+    def __init__(self):
+        """Initialise a clean session."""
+        self.new = []
+        self.dirty = []
+        self.deleted = []
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        """Return the primary engine.
+
+        Args:
+            mapper: ignored mapper.
+            clause: ignored clause.
+            kwargs: ignored arguments.
+
+        Returns:
+            The primary engine marker.
+        """
+        return "primary"
+
+
+class _FakeApp:
+    """Captures the before_request hook so tests can invoke it directly.
+
+    Attrs:
+        hook: the function registered via before_request.
+    """
+
+    def __init__(self):
+        """Initialise with no hook registered."""
+        self.hook = None
+
+    def before_request(self, func):
+        """Store the registered hook and return it unchanged.
+
+        Args:
+            func: the before_request callback.
+
+        Returns:
+            The callback.
+        """
+        self.hook = func
+        return func
+
+
+class TestReadOnlyRequests(unittest.TestCase):
+    """Only metadata reads of the listed APIs are flagged."""
+
+    def test_metadata_reads_flagged(self):
+        """Dashboard, chart and dataset API reads are flagged."""
+        for path in (
+            "/api/v1/dashboard/",
+            "/api/v1/chart/12",
+            "/api/v1/dataset/related/owners",
+        ):
+            self.assertTrue(mrr._is_read_only_request("GET", path), path)
+
+    def test_writes_and_data_not_flagged(self):
+        """Writes, chart data and other APIs stay on the primary."""
+        for method, path in (
+            ("PUT", "/api/v1/dashboard/1"),
+            ("GET", "/api/v1/chart/data"),
+            ("GET", "/api/v1/chart/3/data/"),
+            ("GET", "/api/v1/sqllab/"),
+            ("GET", ""),
+        ):
+            self.assertFalse(mrr._is_read_only_request(method, path), path)
+
+
+class TestGetBind(unittest.TestCase):
+    """SELECTs of flagged requests use the read-only engine."""
+
+    def setUp(self):
+        """Attach the routing to a fake app and session class."""
+        self.g = _FakeG()
+        self.request = types.SimpleNamespace(
+            method="GET", path="/api/v1/dashboard/"
+        )
+        for name, value in (("g", self.g), ("request", self.request)):
+            original = getattr(mrr, name)
+            setattr(mrr, name, value)
+            self.addCleanup(setattr, mrr, name, original)
+
+        session_cls = type("Session", (_FakeSession,), {})
+        db = types.SimpleNamespace(
+            session=types.SimpleNamespace(
+                session_factory=types.SimpleNamespace(class_=session_cls)
+            ),
+            get_engine=lambda bind: bind,
+        )
+        self.app = _FakeApp()
+        mrr.attach_read_only_routing(self.app, db)
+        self.session = session_cls()
+        self.select = select(column("id")).select_from(table("dashboards"))
+
+    def test_flagged_select_uses_read_only(self):
+        """A SELECT in a flagged request goes to the read-only bind."""
+        self.app.hook()
+        self.assertEqual(
+            self.session.get_bind(clause=self.select), mrr.READ_ONLY_BIND
+        )
+        self.assertEqual(self.session.get_bind(clause=None), "primary")
+
+    def test_unflagged_request_uses_primary(self):
+        """A SELECT in a write request stays on the primary."""
+        self.request.method = "POST"
+        self.app.hook()
+        self.assertEqual(self.session.get_bind(clause=self.select), "primary")
+
+    def test_pending_changes_use_primary(self):
+        """A session with pending writes reads its own writes."""
+        self.app.hook()
+        self.session.new.append(object())
+        self.assertEqual(self.session.get_bind(clause=self.select), "primary")
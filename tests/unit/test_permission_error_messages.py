@@ -10,8 +10,11 @@ package or running Juju model required.
 """
 
 import importlib.util
+import json
+import logging
 import pathlib
 import sys
+import time
 import types
 import unittest
 
@@ -36,6 +39,8 @@ assert _spec is not None and _spec.loader is not None
 pem = importlib.util.module_from_spec(_spec)
 _spec.loader.exec_module(pem)
 
+logger = logging.getLogger(__name__)
+
 
 # ---------------------------------------------------------------------------
 # Test doubles for the Flask app/response used by attach_error_rewriter
@@ -73,6 +78,7 @@ class _FakeResponse:
         status_code: the HTTP status code of the response.
         headers: the response headers.
         direct_passthrough: whether the response streams data directly.
+        data_set: whether the body was replaced via set_data.
     """
 
     def __init__(
@@ -81,29 +87,18 @@ class _FakeResponse:
         """Initialise with a JSON payload and metadata.
 
         Args:
-            payload: the object returned by get_json.
+            payload: the object serialised as the response body.
             status_code: the HTTP status code.
             content_type: the Content-Type header value.
         """
-        self._payload = payload
-        self._data = b""
+        self._data = json.dumps(payload).encode()
         self.status_code = status_code
         self.headers = {"Content-Type": content_type}
         self.direct_passthrough = False
-
-    def get_json(self, silent=False):
-        """Return the stored payload.
-
-        Args:
-            silent: ignored; present for API compatibility.
-
-        Returns:
-            The stored payload.
-        """
-        return self._payload
+        self.data_set = False
 
     def get_data(self):
-        """Return the bytes set via set_data.
+        """Return the response body.
 
         Returns:
             The stored response body bytes.
@@ -117,6 +112,7 @@ class _FakeResponse:
             data: the new body, as str or bytes.
         """
         self._data = data.encode() if isinstance(data, str) else data
+        self.data_set = True
 
 
 class TestRequestMessage(unittest.TestCase):
@@ -176,6 +172,27 @@ class TestRewriteString(unittest.TestCase):
         out = pem._rewrite_any(payload, REQ)
         self.assertIn("catalog 'sales'", out["errors"][0]["message"])
 
+    def test_rewrite_any_copy_on_write(self):
+        """Only containers on the path of a rewritten string are copied."""
+        untouched = {"status": "done", "result_url": "/api/v1/chart/data/1"}
+        denied = {"errors": [{"message": "Cannot access catalog sales"}]}
+        payload = {"result": [untouched, denied]}
+
+        out = pem._rewrite_any(payload, REQ)
+        self.assertIsNot(out, payload)
+        self.assertIs(out["result"][0], untouched)
+        self.assertIn(
+            "catalog 'sales'", out["result"][1]["errors"][0]["message"]
+        )
+        self.assertEqual(
+            denied["errors"][0]["message"], "Cannot access catalog sales"
+        )
+
+    def test_rewrite_any_unchanged_returned_as_is(self):
+        """An object with nothing to rewrite is returned, not copied."""
+        payload = {"result": [{"status": "error", "errors": ["timeout"]}]}
+        self.assertIs(pem._rewrite_any(payload, REQ), payload)
+
 
 class TestHookGating(unittest.TestCase):
     """The after_request hook only rewrites the intended responses."""
@@ -215,6 +232,16 @@ class TestHookGating(unittest.TestCase):
         self._run(resp, "/api/v1/async_event/")
         self.assertIn("catalog 'sales'", resp.get_data().decode())
 
+    def test_error_without_denial_untouched(self):
+        """An error response with no denial is not re-serialised."""
+        resp = _FakeResponse(
+            {"message": "Query timed out after 30 seconds"}, status_code=500
+        )
+        body = resp.get_data()
+        self._run(resp, "/api/v1/chart/data")
+        self.assertFalse(resp.data_set)
+        self.assertIs(resp.get_data(), body)
+
     def test_successful_non_async_response_untouched(self):
         """A 2xx non-async response is left untouched."""
         resp = _FakeResponse(
@@ -222,7 +249,7 @@ class TestHookGating(unittest.TestCase):
         )
         self._run(resp, "/api/v1/chart/data")
         # Hook returned early without re-serialising the body.
-        self.assertEqual(resp.get_data(), b"")
+        self.assertFalse(resp.data_set)
 
     def test_non_json_untouched(self):
         """A non-JSON response is left untouched."""
@@ -232,7 +259,7 @@ class TestHookGating(unittest.TestCase):
             content_type="text/html",
         )
         self._run(resp, "/api/v1/chart/data")
-        self.assertEqual(resp.get_data(), b"")
+        self.assertFalse(resp.data_set)
 
     def test_non_api_path_untouched(self):
         """A response on a non-API path is left untouched."""
@@ -240,7 +267,151 @@ class TestHookGating(unittest.TestCase):
             {"message": "Cannot access catalog sales"}, status_code=500
         )
         self._run(resp, "/static/something")
-        self.assertEqual(resp.get_data(), b"")
+        self.assertFalse(resp.data_set)
+
+
+def _async_event(index, status="done", errors=None):
+    """Build an async-event entry as queued by a GLOBAL_ASYNC_QUERIES job.
+
+    Args:
+        index: position of the event in the stream.
+        status: job status.
+        errors: errors of a failed job.
+
+    Returns:
+        The event.
+    """
+    event = {
+        "id": f"1700000000000-{index}",
+        "channel_id": "3b9c2a4e-5d6f-4a1b-9c8d-7e6f5a4b3c2d",
+        "job_id": f"8f7e6d5c-4b3a-4291-8a7b-{index:012d}",
+        "user_id": 1,
+        "status": status,
+        "errors": errors or [],
+        "result_url": f"/api/v1/chart/data/qc-{index:032x}",
+    }
+    return event
+
+
+# Polls of a dashboard: mostly empty, some with finished charts, a few with
+# query errors unrelated to permissions
+ASYNC_EVENT_POLLS = (
+    [{"result": []}] * 6
+    + [{"result": [_async_event(i) for i in range(8)]}] * 3
+    + [
+        {
+            "result": [
+                _async_event(0),
+                _async_event(
+                    1,
+                    status="error",
+                    errors=[
+                        {
+                            "message": "Query exceeded the 60 second timeout",
+                            "error_type": "GENERIC_DB_ENGINE_ERROR",
+                            "level": "error",
+                            "extra": {"engine_name": "Trino"},
+                        }
+                    ],
+                ),
+            ]
+        }
+    ]
+)
+BENCHMARK_ROUNDS = 500
+
+
+def _previous_rewrite(body):
+    """Rewrite a body as done before the marker pre-scan.
+
+    Every body was parsed, walked, copied and re-serialised.
+
+    Args:
+        body: the response body.
+
+    Returns:
+        The new response body.
+    """
+    return json.dumps(pem._rewrite_any(json.loads(body), REQ)).encode()
+
+
+class TestAsyncEventBenchmark(unittest.TestCase):
+    """Polls without denials cost a byte scan, not a JSON round trip."""
+
+    def setUp(self):
+        """Register the hook on a fake app for async-event requests."""
+        app = _FakeApp()
+        pem.attach_error_rewriter(app, request_url=None)
+        self.hook = app.hook
+        _request_stub.path = "/api/v1/async_event/"
+        self.bodies = [json.dumps(p).encode() for p in ASYNC_EVENT_POLLS]
+
+    def _hook_seconds(self):
+        """Measure the hook over every poll.
+
+        Returns:
+            Average time the hook takes per poll, in seconds.
+        """
+        responses = [
+            _FakeResponse(p)
+            for p in ASYNC_EVENT_POLLS
+            for _ in range(BENCHMARK_ROUNDS)
+        ]
+        start = time.perf_counter()
+        for response in responses:
+            self.hook(response)
+        seconds = (time.perf_counter() - start) / len(responses)
+        self.assertFalse(any(r.data_set for r in responses))
+        return seconds
+
+    def _previous_seconds(self):
+        """Measure the previous rewrite over every poll.
+
+        Returns:
+            Average time the rewrite takes per poll, in seconds.
+        """
+        start = time.perf_counter()
+        for _ in range(BENCHMARK_ROUNDS):
+            for body in self.bodies:
+                _previous_rewrite(body)
+        return (time.perf_counter() - start) / (
+            BENCHMARK_ROUNDS * len(self.bodies)
+        )
+
+    def test_poll_latency(self):
+        """The pre-scan is several times cheaper than parsing every poll."""
+        previous = self._previous_seconds()
+        current = self._hook_seconds()
+        logger.info(
+            "async_event rewrite per poll: previous %.2f us, current %.2f us",
+            previous * 1e6,
+            current * 1e6,
+        )
+
+        self.assertLess(current, previous / 3)
+
+    def test_denied_event_still_rewritten(self):
+        """A denial among other events is rewritten, the rest kept."""
+        payload = {
+            "result": [
+                _async_event(0),
+                _async_event(
+                    1,
+                    status="error",
+                    errors=[
+                        {
+                            "message": "Access Denied: Cannot access catalog sales"
+                        }
+                    ],
+                ),
+            ]
+        }
+        response = _FakeResponse(payload)
+        self.hook(response)
+
+        result = json.loads(response.get_data())["result"]
+        self.assertEqual(result[0], payload["result"][0])
+        self.assertIn("catalog 'sales'", result[1]["errors"][0]["message"])
 
 
 if __name__ == "__main__":
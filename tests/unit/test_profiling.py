@@ -0,0 +1,90 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for the py-spy profile helpers."""
+
+from unittest import TestCase
+
+from profiling import build_record_command, summarize_profile
+
+COLLAPSED = """\
+process 1:"gunicorn";handle (gevent.py:10);run_query (sql.py:5) 2
+process 1:"gunicorn";handle (gevent.py:10);run_query (sql.py:5);run_query (sql.py:5) 4
+process 1:"gunicorn";handle (gevent.py:10);render (view.py:7) 3
+process 2:"gunicorn";idle (hub.py:1) 1
+"""
+
+
+def _svg_frame(title, start, width):
+    """Build an inferno flamegraph frame.
+
+    Args:
+        title: frame name.
+        start: offset of the frame in samples.
+        width: samples including the frame.
+
+    Returns:
+        The frame's SVG group.
+    """
+    return (
+        f"<g><title>{title} ({width} samples, {width * 10:.2f}%)</title>"
+        f'<rect x="{start * 10}%" y="0" width="{width * 10}%" height="15" '
+        f'fg:x="{start}" fg:w="{width}"/></g>\n'
+    )
+
+
+# The same samples as COLLAPSED, with the recursive run_query call nested
+# in the box of its caller
+FLAMEGRAPH = (
+    "<svg>"
+    + _svg_frame("all", 0, 10)
+    + _svg_frame("process 1:&quot;gunicorn&quot;", 0, 9)
+    + _svg_frame("handle (gevent.py:10)", 0, 9)
+    + _svg_frame("render (view.py:7)", 0, 3)
+    + _svg_frame("run_query (sql.py:5)", 3, 6)
+    + _svg_frame("run_query (sql.py:5)", 3, 4)
+    + _svg_frame("process 2:&quot;gunicorn&quot;", 9, 1)
+    + _svg_frame("idle (hub.py:1)", 9, 1)
+    + "</svg>"
+)
+
+
+class TestSummarizeProfile(TestCase):
+    """Summaries rank frames by the share of samples including them."""
+
+    def test_collapsed(self):
+        """Collapsed stacks are summarised without process entries."""
+        samples, rows = summarize_profile(COLLAPSED, "collapsed", 2)
+
+        self.assertEqual(samples, 10)
+        self.assertEqual(
+            rows,
+            [(0.9, "handle (gevent.py:10)"), (0.6, "run_query (sql.py:5)")],
+        )
+
+    def test_flamegraph_matches_collapsed(self):
+        """A flamegraph of the same samples gives the same summary.
+
+        Both count a recursive frame once per sample.
+        """
+        self.assertEqual(
+            summarize_profile(FLAMEGRAPH, "flamegraph", 5),
+            summarize_profile(COLLAPSED, "collapsed", 5),
+        )
+
+    def test_empty_profile(self):
+        """A profile without samples has an empty summary."""
+        self.assertEqual(summarize_profile("", "collapsed", 5), (0, []))
+
+
+class TestRecordCommand(TestCase):
+    """py-spy never pauses the profiled processes."""
+
+    def test_nonblocking_with_children(self):
+        """The master and its workers are sampled without pausing them."""
+        command = build_record_command("42", 10, "collapsed", "/tmp/p.txt")
+
+        self.assertIn("--nonblocking", command)
+        self.assertIn("--subprocesses", command)
+        self.assertEqual(command[command.index("--format") + 1], "raw")
+        self.assertEqual(command[command.index("--pid") + 1], "42")
@@ -0,0 +1,124 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for the Sentry sampling and redaction hooks.
+
+The module lives in templates/sentry_interceptor.py and is loaded by every
+Superset process at startup via PYTHONPATH.
+"""
+
+import importlib.util
+import pathlib
+import unittest
+from unittest import mock
+
+_MODULE_PATH = (
+    pathlib.Path(__file__).parent.parent.parent
+    / "templates"
+    / "sentry_interceptor.py"
+)
+_spec = importlib.util.spec_from_file_location(
+    "sentry_interceptor", _MODULE_PATH
+)
+assert _spec is not None and _spec.loader is not None
+sentry_interceptor = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(sentry_interceptor)
+
+
+def error_event():
+    """Build an error event with local variables.
+
+    Returns:
+        The event.
+    """
+    return {
+        "exception": {
+            "values": [
+                {
+                    "stacktrace": {
+                        "frames": [
+                            {"function": "run"},
+                            {"function": "query", "vars": {"password": "x"}},
+                        ]
+                    }
+                }
+            ]
+        }
+    }
+
+
+class TestBeforeSend(unittest.TestCase):
+    """Errors are sampled before being redacted."""
+
+    def test_not_needed(self):
+        """No hook is installed when every event is sent unchanged."""
+        self.assertIsNone(sentry_interceptor.build_before_send(1.0, False))
+
+    def test_sent_events_redacted(self):
+        """Sampled events have their frame variables redacted."""
+        before_send = sentry_interceptor.build_before_send(0.5, True)
+        with mock.patch.object(
+            sentry_interceptor.random, "random", return_value=0.25
+        ):
+            event = before_send(error_event(), {})
+
+        frames = event["exception"]["values"][0]["stacktrace"]["frames"]
+        self.assertEqual(frames[1]["vars"], {"password": "REDACTED"})
+
+    def test_dropped_events_not_redacted(self):
+        """Events dropped by sampling are never redacted."""
+        before_send = sentry_interceptor.build_before_send(0.5, True)
+        with mock.patch.object(
+            sentry_interceptor.random, "random", return_value=0.75
+        ), mock.patch.object(sentry_interceptor, "redact_params") as redact:
+            self.assertIsNone(before_send(error_event(), {}))
+        redact.assert_not_called()
+
+
+class TestTracesSampler(unittest.TestCase):
+    """Transactions are sampled by route and task name."""
+
+    def setUp(self):
+        """Build a sampler with chart data and SQL Lab rules."""
+        self.sampler = sentry_interceptor.build_traces_sampler(
+            0.05,
+            {
+                "/api/v1/chart/": 0.2,
+                "/api/v1/chart/data": 0.5,
+                "sql_lab.": 1.0,
+            },
+        )
+
+    def _request(self, path):
+        """Build the sampling context of a web request.
+
+        Args:
+            path: request path.
+
+        Returns:
+            The sampling context.
+        """
+        return {"parent_sampled": None, "wsgi_environ": {"PATH_INFO": path}}
+
+    def test_longest_prefix_wins(self):
+        """The most specific rule applies."""
+        self.assertEqual(
+            self.sampler(self._request("/api/v1/chart/data")), 0.5
+        )
+        self.assertEqual(self.sampler(self._request("/api/v1/chart/42")), 0.2)
+
+    def test_default_rate(self):
+        """Requests matching no rule use the default rate."""
+        self.assertEqual(
+            self.sampler(self._request("/superset/welcome/")), 0.05
+        )
+
+    def test_health_checks_untraced(self):
+        """Health checks are never traced."""
+        self.assertEqual(self.sampler(self._request("/health")), 0.0)
+
+    def test_celery_tasks(self):
+        """Tasks are matched on their name and follow their parent."""
+        task = {"celery_job": {"task": "sql_lab.get_sql_results"}}
+        self.assertEqual(self.sampler(task), 1.0)
+        self.assertEqual(self.sampler({**task, "parent_sampled": False}), 0.0)
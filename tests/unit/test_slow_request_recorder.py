@@ -0,0 +1,295 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for the slow-request recorder.
+
+The module lives in templates/slow_request_recorder.py and is loaded by
+Superset at startup via PYTHONPATH. These tests stub out Flask so the
+module can be imported with no installed Flask package, and drive its
+request hooks directly.
+"""
+
+import importlib.util
+import itertools
+import json
+import pathlib
+import sys
+import types
+import unittest
+from unittest import mock
+
+import sqlalchemy
+
+
+class _G(types.SimpleNamespace):
+    """flask.g stand-in."""
+
+    def get(self, name, default=None):
+        """Get an attribute, like flask.g.get.
+
+        Args:
+            name: attribute name.
+            default: value returned when the attribute is unset.
+
+        Returns:
+            The attribute value.
+        """
+        return getattr(self, name, default)
+
+
+# Tests drive these references, which pylint can resolve unlike attributes
+# of a stub module
+_flask_g = _G()
+_flask_request = types.SimpleNamespace()
+_flask = types.ModuleType("flask")
+setattr(_flask, "g", _flask_g)
+setattr(_flask, "request", _flask_request)
+setattr(_flask, "has_request_context", lambda: True)
+
+_MODULE_PATH = (
+    pathlib.Path(__file__).parent.parent.parent
+    / "templates"
+    / "slow_request_recorder.py"
+)
+_spec = importlib.util.spec_from_file_location(
+    "slow_request_recorder", _MODULE_PATH
+)
+assert _spec is not None and _spec.loader is not None
+slow_request_recorder = importlib.util.module_from_spec(_spec)
+with mock.patch.dict(sys.modules, {"flask": _flask}):
+    _spec.loader.exec_module(slow_request_recorder)
+
+
+class _App:
+    """Flask app stand-in keeping its request hooks.
+
+    Attrs:
+        config: application config.
+        before: before_request hooks.
+        after: after_request hooks.
+    """
+
+    def __init__(self):
+        """Initialise with no hooks."""
+        self.config = {}
+        self.before = []
+        self.after = []
+
+    def before_request(self, func):
+        """Register a before_request hook.
+
+        Args:
+            func: the hook.
+
+        Returns:
+            The hook.
+        """
+        self.before.append(func)
+        return func
+
+    def after_request(self, func):
+        """Register an after_request hook.
+
+        Args:
+            func: the hook.
+
+        Returns:
+            The hook.
+        """
+        self.after.append(func)
+        return func
+
+
+class TestSlowRequestRecorder(unittest.TestCase):
+    """Slow requests are logged with their phase breakdown and counted."""
+
+    def setUp(self):
+        """Attach the recorder to a stand-in app without patching clients."""
+        for name in (
+            "_time_sqlalchemy",
+            "_time_analytics_execution",
+            "_time_redis",
+        ):
+            patcher = mock.patch.object(slow_request_recorder, name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        _flask_g.__dict__.clear()
+        _flask_g.user = types.SimpleNamespace(username="alice")
+        self.stats_logger = mock.MagicMock()
+        self.app = _App()
+        slow_request_recorder.attach_slow_request_recorder(
+            self.app, mock.MagicMock(), 1000, stats_logger=self.stats_logger
+        )
+
+    def _request(self, path, duration, phases=None, **kwargs):
+        """Run a request through the recorder hooks.
+
+        Args:
+            path: request path.
+            duration: request duration in seconds.
+            phases: seconds spent per phase during the request.
+            kwargs: other request attributes.
+
+        Returns:
+            The mocked recorder logger.
+        """
+        request = _flask_request
+        request.__dict__.clear()
+        request.__dict__.update(
+            {
+                "method": "GET",
+                "path": path,
+                "url_rule": types.SimpleNamespace(rule=path),
+                "view_args": {},
+                "is_json": False,
+                **kwargs,
+            }
+        )
+        with mock.patch.object(
+            slow_request_recorder.time, "perf_counter", return_value=100.0
+        ):
+            self.app.before[0]()
+        for phase, seconds in (phases or {}).items():
+            slow_request_recorder._add_phase_time(phase, seconds)
+
+        response = types.SimpleNamespace(status_code=200)
+        with mock.patch.object(
+            slow_request_recorder.time,
+            "perf_counter",
+            return_value=100.0 + duration,
+        ):
+            with mock.patch.object(slow_request_recorder, "logger") as logger:
+                self.assertIs(self.app.after[0](response), response)
+        return logger
+
+    def test_slow_request_recorded(self):
+        """The record breaks the request down by phase."""
+        logger = self._request(
+            "/api/v1/dashboard/<id_or_slug>/charts",
+            2.5,
+            phases={"metadata_db": 0.5, "analytics_db": 1.25, "cache": 0.25},
+            view_args={"id_or_slug": "sales"},
+        )
+
+        record = json.loads(logger.warning.call_args.args[0])
+        self.assertEqual(
+            record,
+            {
+                "event": "slow_request",
+                "method": "GET",
+                "route": "/api/v1/dashboard/<id_or_slug>/charts",
+                "path": "/api/v1/dashboard/<id_or_slug>/charts",
+                "status": 200,
+                "user": "alice",
+                "duration_ms": 2500.0,
+                "dashboard_id": "sales",
+                "metadata_db_ms": 500.0,
+                "analytics_db_ms": 1250.0,
+                "cache_ms": 250.0,
+                "other_ms": 500.0,
+            },
+        )
+        self.stats_logger.incr.assert_called_once_with("slow_request")
+
+    def test_chart_id_from_data_payload(self):
+        """Chart data requests are attributed to the chart of the payload."""
+        logger = self._request(
+            "/api/v1/chart/data",
+            1.5,
+            method="POST",
+            is_json=True,
+            get_json=lambda silent: {"form_data": {"slice_id": 42}},
+        )
+
+        record = json.loads(logger.warning.call_args.args[0])
+        self.assertEqual(record["chart_id"], 42)
+        self.assertNotIn("dashboard_id", record)
+
+    def test_fast_request_ignored(self):
+        """Requests under the threshold are neither logged nor counted."""
+        logger = self._request("/api/v1/chart/<pk>", 0.5)
+
+        logger.warning.assert_not_called()
+        self.stats_logger.incr.assert_not_called()
+
+
+class TestPhaseTiming(unittest.TestCase):
+    """Phases are timed without double counting or leaked timers."""
+
+    def setUp(self):
+        """Start a request with no phase time."""
+        _flask_g.__dict__.clear()
+        _flask_g.slow_request_phases = dict.fromkeys(
+            slow_request_recorder.PHASES, 0.0
+        )
+
+    def test_failed_statement_start_dropped(self):
+        """A failing statement leaves no start time on its connection."""
+        engine = sqlalchemy.create_engine("sqlite://")
+        self.addCleanup(engine.dispose)
+        slow_request_recorder._time_sqlalchemy(lambda: {engine}, engine)
+
+        with engine.connect() as conn:
+            with self.assertRaises(sqlalchemy.exc.OperationalError):
+                conn.exec_driver_sql("SELECT * FROM missing")
+            self.assertEqual(conn.info[slow_request_recorder._STARTS_KEY], [])
+
+            conn.exec_driver_sql("SELECT 1")
+            self.assertEqual(conn.info[slow_request_recorder._STARTS_KEY], [])
+        self.assertGreater(_flask_g.slow_request_phases["metadata_db"], 0)
+
+    def test_engine_spec_overrides_timed_once(self):
+        """Overrides are timed, and calls to wrapped parents count once."""
+
+        class BaseEngineSpec:
+            """BaseEngineSpec stand-in."""
+
+            @classmethod
+            def execute(cls, cursor, query, **kwargs):
+                """Run the query.
+
+                Args:
+                    cursor: DBAPI cursor.
+                    query: SQL to run.
+                    kwargs: ignored.
+                """
+                cursor.execute(query)
+
+        class TrinoEngineSpec(BaseEngineSpec):
+            """Spec overriding execute_with_cursor, like Trino's."""
+
+            @classmethod
+            def execute_with_cursor(cls, cursor, sql, query):
+                """Run the query through execute.
+
+                Args:
+                    cursor: DBAPI cursor.
+                    sql: SQL to run.
+                    query: ignored.
+                """
+                cls.execute(cursor, sql)
+
+        base = types.ModuleType("superset.db_engine_specs.base")
+        setattr(base, "BaseEngineSpec", BaseEngineSpec)
+        specs = types.ModuleType("superset.db_engine_specs")
+        setattr(specs, "load_engine_specs", lambda: [TrinoEngineSpec])
+        with mock.patch.dict(
+            sys.modules,
+            {
+                "superset": types.ModuleType("superset"),
+                "superset.db_engine_specs": specs,
+                "superset.db_engine_specs.base": base,
+            },
+        ):
+            slow_request_recorder._time_analytics_execution()
+
+        # Every clock read advances one second
+        with mock.patch.object(
+            slow_request_recorder.time,
+            "perf_counter",
+            side_effect=itertools.count(),
+        ):
+            TrinoEngineSpec.execute_with_cursor(mock.Mock(), "SELECT 1", None)
+
+        self.assertEqual(_flask_g.slow_request_phases["analytics_db"], 1)
@@ -32,8 +32,10 @@ def test_config_parsing_parameters_integer_values(_harness) -> None:
         "sqlalchemy-max-overflow": [42, 100, 1],
         "webserver-timeout": [60, 170, 300],
         "server-worker-amount": [1, 8, 32],
+        "sqlalchemy-pool-recycle": [0, 1800, 86400],
         "gunicorn-timeout": [30, 120, 600],
         "celery-worker-concurrency": [0, 16, 128],
+        "trino-sync-concurrency": [1, 4, 32],
     }
     erroneus_values = [2147483648, -2147483649]
     for field, valid_values in integer_fields.items():
@@ -46,14 +48,30 @@ def test_config_parsing_parameters_out_of_range_values(_harness) -> None:
     invalid_ranges = {
         "webserver-timeout": [59, 301],
         "server-worker-amount": [0, 33],
+        "sqlalchemy-pool-recycle": [-1, 86401],
         "gunicorn-timeout": [29, 601],
         "celery-worker-concurrency": [-1, 129],
+        "trino-sync-concurrency": [0, 33],
     }
 
     for field, invalid_values in invalid_ranges.items():
         check_invalid_values(_harness, field, invalid_values)
 
 
+def test_config_parsing_parameters_non_negative_values(_harness) -> None:
+    """Check optional non-negative fields."""
+    non_negative_fields = {
+        "trino-request-timeout": [0, 30, 600],
+        "trino-metadata-cache-timeout": [0, 600, 86400],
+        "trino-cache-timeout": [0, 300, 86400],
+        "sqlalchemy-statement-timeout": [0, 30, 600],
+        "sqlalchemy-keepalives-idle": [0, 60, 7200],
+    }
+    for field, valid_values in non_negative_fields.items():
+        check_invalid_values(_harness, field, [-1])
+        check_valid_values(_harness, field, valid_values)
+
+
 def test_product_related_values(_harness) -> None:
     """Test specific parameters for each field."""
     erroneus_values = ["test-value", "foo", "bar"]
@@ -63,6 +81,62 @@ def test_product_related_values(_harness) -> None:
     accepted_values = ["app-gunicorn", "worker", "beat"]
     check_valid_values(_harness, "charm-function", accepted_values)
 
+    # log levels and format
+    for field in ("log-level", "celery-log-level", "gunicorn-log-level"):
+        check_invalid_values(_harness, field, erroneus_values)
+        check_valid_values(_harness, field, ["DEBUG", "WARNING", "INFO"])
+    check_invalid_values(_harness, "log-format", erroneus_values)
+    check_valid_values(_harness, "log-format", ["json", "text"])
+
+
+def test_config_metrics_histogram_buckets(_harness) -> None:
+    """Check histogram buckets are parsed and must be increasing."""
+    _harness.update_config({"metrics-histogram-buckets": "0.1, 1,10"})
+    assert _harness.charm.config["metrics-histogram-buckets"] == [
+        0.1,
+        1.0,
+        10.0,
+    ]
+    check_invalid_values(
+        _harness, "metrics-histogram-buckets", ["1,0.5", "0,1", "", "a"]
+    )
+
+
+def test_config_tracing(_harness) -> None:
+    """Check the tracing endpoint and sample rate are validated."""
+    check_valid_values(
+        _harness, "tracing-otlp-endpoint", ["http://otel-collector:4318"]
+    )
+    _harness.update_config({"tracing-sample-rate": "0.25"})
+    assert _harness.charm.config["tracing-sample-rate"] == 0.25
+    check_invalid_values(_harness, "tracing-sample-rate", ["-0.1", "1.5"])
+    _harness.update_config({"tracing-sample-rate": "0.1"})
+    check_invalid_values(
+        _harness, "tracing-otlp-endpoint", ["otel-collector:4318"]
+    )
+
+
+def test_config_sentry_sampling(_harness) -> None:
+    """Check Sentry sample rates and per-route rules are validated."""
+    for field in ("sentry-traces-sample-rate", "sentry-profiles-sample-rate"):
+        _harness.update_config({field: "0.5"})
+        assert _harness.charm.config[field] == 0.5
+        check_invalid_values(_harness, field, ["1.5", "-1"])
+        _harness.update_config({field: "0"})
+
+    _harness.update_config(
+        {"sentry-traces-sample-rules": "/api/v1/chart/data=0.5, sql_lab=1"}
+    )
+    assert _harness.charm.config["sentry-traces-sample-rules"] == {
+        "/api/v1/chart/data": 0.5,
+        "sql_lab": 1.0,
+    }
+    check_invalid_values(
+        _harness,
+        "sentry-traces-sample-rules",
+        ["/api/v1/chart/data", "=0.5", "sql_lab=2", "sql_lab=a"],
+    )
+
 
 def test_config_feature_flags(_harness) -> None:
     """Test feature flags configuration."""
@@ -0,0 +1,349 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for the Superset REST API client."""
+
+# pylint:disable=protected-access
+
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from unittest import TestCase, mock
+
+import jwt
+import requests
+
+from http_session import RETRY_STATUS_CODES
+from superset_api import SupersetApiClient, SupersetApiError
+from trino_database import TrinoDatabaseSettings
+
+
+class TestTransport(TestCase):
+    """The HTTP transport is pooled, retrying and timed."""
+
+    def setUp(self):
+        """Build a client with non-default transport settings."""
+        self.api = SupersetApiClient(
+            "admin",
+            "admin",
+            connect_timeout=2,
+            read_timeout=20,
+            pool_size=4,
+            max_retries=5,
+            backoff_factor=0.1,
+        )
+
+    def test_adapter_pool_and_retry(self):
+        """Both schemes share a pooled adapter with a retry policy."""
+        adapter = self.api._session.get_adapter("http://localhost:8088/")
+        self.assertIs(
+            adapter, self.api._session.get_adapter("https://example.com/")
+        )
+        self.assertEqual(adapter._pool_maxsize, 4)
+
+        retry = adapter.max_retries
+        self.assertEqual(retry.total, 5)
+        self.assertEqual(retry.backoff_factor, 0.1)
+        self.assertGreater(retry.backoff_jitter, 0)
+        self.assertEqual(set(retry.status_forcelist), set(RETRY_STATUS_CODES))
+        self.assertIn("GET", retry.allowed_methods)
+        self.assertIn("PUT", retry.allowed_methods)
+        self.assertNotIn("POST", retry.allowed_methods)
+
+    def test_request_uses_split_timeouts_and_logs_latency(self):
+        """Requests pass (connect, read) timeouts and log endpoint latency."""
+        response = requests.Response()
+        response.status_code = 200
+        with mock.patch.object(
+            self.api._session, "request", return_value=response
+        ) as request, self.assertLogs("superset_api", logging.DEBUG) as logs:
+            self.api._request(
+                "GET", "http://localhost:8088/api/v1/database/?q=(page:0)"
+            )
+
+        self.assertEqual(request.call_args.kwargs["timeout"], (2, 20))
+        self.assertIn("GET /api/v1/database/ -> 200", logs.output[0])
+
+
+def _jwt(exp):
+    """Build an unsigned JWT expiring at the given timestamp.
+
+    Args:
+        exp: Expiry as a datetime.
+
+    Returns:
+        Encoded JWT.
+    """
+    return jwt.encode({"exp": int(exp.timestamp())}, "k", algorithm="HS256")
+
+
+class TestTokenCache(TestCase):
+    """API tokens can be exported and reused by a later client."""
+
+    def setUp(self):
+        """Build a client holding valid tokens and a session cookie."""
+        now = datetime.now(timezone.utc)
+        self.api = SupersetApiClient("admin", "admin")
+        self.api._access_token = _jwt(now + timedelta(minutes=15))
+        self.api._refresh_token = _jwt(now + timedelta(days=30))
+        self.api._access_exp = now + timedelta(minutes=15)
+        self.api._refresh_exp = now + timedelta(days=30)
+        self.api._csrf_token = "csrf"
+        self.api._session.cookies.set("session", "cookie-value")
+
+    def test_round_trip_skips_login(self):
+        """A client restored from exported tokens does not log in."""
+        tokens = self.api.export_tokens()
+        self.assertTrue(all(isinstance(v, str) for v in tokens.values()))
+
+        restored = SupersetApiClient("admin", "admin")
+        restored.import_tokens(tokens)
+        with mock.patch.object(
+            restored, "_authenticate"
+        ) as login, mock.patch.object(
+            restored, "_refresh_access_token"
+        ) as refresh:
+            restored._ensure_authenticated()
+
+        login.assert_not_called()
+        refresh.assert_not_called()
+        self.assertEqual(restored._csrf_token, "csrf")
+        self.assertEqual(
+            restored._session.cookies.get("session"), "cookie-value"
+        )
+        self.assertEqual(restored.export_tokens(), tokens)
+
+    def test_expired_access_token_refreshes(self):
+        """An expired access token is refreshed rather than re-issued."""
+        self.api._access_exp = datetime.now(timezone.utc)
+        with mock.patch.object(
+            self.api, "_authenticate"
+        ) as login, mock.patch.object(
+            self.api, "_refresh_access_token"
+        ) as refresh:
+            self.api._ensure_authenticated()
+        login.assert_not_called()
+        refresh.assert_called_once()
+
+    def test_expired_refresh_token_logs_in(self):
+        """An expired refresh token forces a full login."""
+        self.api._refresh_exp = datetime.now(timezone.utc)
+        with mock.patch.object(self.api, "_authenticate") as login:
+            self.api._ensure_authenticated()
+        login.assert_called_once()
+
+    def test_malformed_tokens_ignored(self):
+        """Malformed cached state leaves the client unauthenticated."""
+        api = SupersetApiClient("admin", "admin")
+        api.import_tokens({"access-expiry": "not-a-date"})
+        self.assertIsNone(api.export_tokens())
+
+    def test_rejected_tokens_trigger_login(self):
+        """A 401 with cached tokens logs in once and retries the call."""
+        rejected = SupersetApiError("unauthorized", status_code=401)
+        with mock.patch.object(
+            self.api,
+            "_send_authenticated_request",
+            side_effect=[rejected, {"result": []}],
+        ) as send, mock.patch.object(self.api, "_authenticate") as login:
+            result = self.api._send_request("GET", "/api/v1/database/")
+
+        self.assertEqual(result, {"result": []})
+        self.assertEqual(send.call_count, 2)
+        login.assert_called_once()
+
+
+def _perm(perm_id, perm_name, view_name):
+    """Build a permissions-resources result row.
+
+    Args:
+        perm_id: permission_view_menu ID.
+        perm_name: Permission name.
+        view_name: View-menu name.
+
+    Returns:
+        Result dict as returned by the Superset API.
+    """
+    return {
+        "id": perm_id,
+        "permission": {"name": perm_name},
+        "view_menu": {"name": view_name},
+    }
+
+
+class TestDatabaseAccessLookup(TestCase):
+    """database_access permissions are looked up with server-side filters."""
+
+    def setUp(self):
+        """Build a client with pagination stubbed out."""
+        self.api = SupersetApiClient("admin", "admin")
+        patcher = mock.patch.object(self.api, "_iter_paginated")
+        self.paginated_get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_single_lookup_filters_on_view_menu(self):
+        """A single lookup filters on the database's view-menu name."""
+        self.paginated_get.return_value = [
+            _perm(7, "database_access", "[Sales (sales)].(id:3)")
+        ]
+
+        self.assertEqual(
+            self.api.get_database_access_permission_id("Sales (sales)"), 7
+        )
+        filters = self.paginated_get.call_args.kwargs["filters"]
+        self.assertIn(
+            {"col": "view_menu.name", "opr": "ct", "value": "[Sales (sales)]"},
+            filters,
+        )
+
+    def test_index_maps_names_to_ids(self):
+        """The index maps each database name to its permission ID."""
+        self.paginated_get.return_value = [
+            _perm(7, "database_access", "[Sales (sales)].(id:3)"),
+            _perm(8, "database_access", "[Google Ads (google_ads)].(id:4)"),
+            _perm(9, "schema_access", "[Sales (sales)].[public]"),
+            _perm(10, "database_access", "malformed"),
+        ]
+
+        self.assertEqual(
+            self.api.get_database_access_permission_index(),
+            {"Sales (sales)": 7, "Google Ads (google_ads)": 8},
+        )
+        self.paginated_get.assert_called_once()
+
+
+class TestGrantRolePermissions(TestCase):
+    """Role permissions are granted as one union per role."""
+
+    def setUp(self):
+        """Build a client with the role's current permissions stubbed."""
+        self.api = SupersetApiClient("admin", "admin")
+        patcher = mock.patch.object(
+            self.api, "get_role_permission_ids", return_value=[1, 2]
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(self.api, "_send_request")
+        self.send = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_union_posted_once(self):
+        """Missing IDs are added in one POST and returned."""
+        added = self.api.grant_role_permissions(5, [2, 3, 4, 3])
+
+        self.assertEqual(added, [3, 4])
+        self.send.assert_called_once_with(
+            "POST",
+            "/api/v1/security/roles/5/permissions",
+            payload={"permission_view_menu_ids": [1, 2, 3, 4]},
+        )
+
+    def test_nothing_to_add_skips_post(self):
+        """No POST is sent when every ID is already granted."""
+        self.assertEqual(self.api.grant_role_permissions(5, [1, 2]), [])
+        self.send.assert_not_called()
+
+
+class TestPagination(TestCase):
+    """Paginated endpoints are fetched lazily, or prefetched on request."""
+
+    def setUp(self):
+        """Build a client whose pages each hold two of five results."""
+        self.api = SupersetApiClient("admin", "admin")
+        self.requested: list[int] = []
+
+        def get_page(endpoint, page, page_size, filters):
+            """Return a page of the fake five-result listing.
+
+            Args:
+                endpoint: Ignored endpoint path.
+                page: Requested page number.
+                page_size: Results per page.
+                filters: Ignored filters.
+
+            Returns:
+                Page response dict.
+            """
+            del endpoint, filters
+            self.requested.append(page)
+            ids = range(page * page_size, min(5, (page + 1) * page_size))
+            return {"count": 5, "result": [{"id": i} for i in ids]}
+
+        patcher = mock.patch.object(self.api, "_get_page", get_page)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_all_pages_in_order(self):
+        """Every page is fetched and results keep page order."""
+        for prefetch in (False, True):
+            self.requested.clear()
+            results = self.api._paginated_get(
+                "/x", page_size=2, prefetch=prefetch
+            )
+            self.assertEqual([r["id"] for r in results], [0, 1, 2, 3, 4])
+            self.assertEqual(sorted(self.requested), [0, 1, 2])
+
+    def test_early_exit_stops_fetching(self):
+        """Stopping after the first result fetches only one page."""
+        results = self.api._iter_paginated("/x", page_size=2)
+        self.assertEqual(next(results), {"id": 0})
+        results.close()
+        self.assertEqual(self.requested, [0])
+
+    def test_max_pages_caps_requests(self):
+        """No more than max_pages pages are requested."""
+        results = self.api._paginated_get(
+            "/x", page_size=2, max_pages=2, prefetch=True
+        )
+        self.assertEqual(len(results), 4)
+        self.assertEqual(sorted(self.requested), [0, 1])
+
+
+class TestTrinoDatabaseSettings(TestCase):
+    """Managed settings are merged into a database's existing extra."""
+
+    def setUp(self):
+        """Build settings managing every field."""
+        self.settings = TrinoDatabaseSettings(
+            request_timeout=60, metadata_cache_timeout=600, cache_timeout=300
+        )
+
+    def test_create_payload_includes_settings(self):
+        """New databases get engine params and cache timeouts."""
+        payload = SupersetApiClient._get_default_trino_database_payload(
+            "Sales (sales)", "trino://u@h:443/sales", self.settings
+        )
+        extra = json.loads(payload["extra"])
+
+        self.assertTrue(extra["allows_virtual_table_explore"])
+        self.assertEqual(
+            extra["engine_params"]["connect_args"]["request_timeout"], 60
+        )
+        self.assertEqual(
+            extra["metadata_cache_timeout"],
+            {"schema_cache_timeout": 600, "table_cache_timeout": 600},
+        )
+        self.assertEqual(payload["cache_timeout"], 300)
+
+    def test_update_payload_preserves_admin_settings(self):
+        """Unmanaged keys set in Superset are kept on update."""
+        extra = json.dumps(
+            {"engine_params": {"connect_args": {"http_scheme": "https"}}}
+        )
+
+        payload = self.settings.update_payload(extra, None)
+
+        merged = json.loads(payload["extra"])
+        self.assertEqual(
+            merged["engine_params"]["connect_args"],
+            {"http_scheme": "https", "request_timeout": 60},
+        )
+        self.assertEqual(
+            self.settings.update_payload(payload["extra"], 300), {}
+        )
+
+    def test_unset_settings_are_not_managed(self):
+        """Default settings leave the database untouched."""
+        self.assertEqual(
+            TrinoDatabaseSettings().update_payload('{"x": 1}', 5), {}
+        )
@@ -0,0 +1,340 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for the OpenTelemetry tracing setup.
+
+The module lives in templates/tracing.py and is loaded by every Superset
+process at startup via PYTHONPATH. OpenTelemetry is only imported when
+tracing is configured, so the module imports without it.
+
+Superset and the instrumentation packages are stubbed out; spans are
+exported with the SDK and OTLP exporter of the Superset image to a
+collector run by the tests.
+"""
+
+import contextlib
+import importlib.util
+import pathlib
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from opentelemetry import trace
+from opentelemetry.proto.collector.trace.v1.trace_service_pb2 import (
+    ExportTraceServiceRequest,
+)
+
+_MODULE_PATH = (
+    pathlib.Path(__file__).parent.parent.parent / "templates" / "tracing.py"
+)
+_spec = importlib.util.spec_from_file_location("tracing", _MODULE_PATH)
+assert _spec is not None and _spec.loader is not None
+tracing = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(tracing)
+
+
+class TestTracesUrl(unittest.TestCase):
+    """Spans are exported to the collector's trace receiver."""
+
+    def test_signal_path_appended(self):
+        """The trace path is added to a bare collector endpoint."""
+        self.assertEqual(
+            tracing.traces_url("http://otel-collector:4318/"),
+            "http://otel-collector:4318/v1/traces",
+        )
+
+    def test_full_url_kept(self):
+        """Endpoints already pointing at the receiver are used as is."""
+        self.assertEqual(
+            tracing.traces_url("https://collector.example.com/v1/traces"),
+            "https://collector.example.com/v1/traces",
+        )
+
+
+def _stub_modules(*names):
+    """Stub out modules and the packages they belong to.
+
+    Args:
+        names: dotted names of the modules to stub.
+
+    Returns:
+        Stub of every module and package, by name.
+    """
+    modules = {}
+    for name in names:
+        parts = name.split(".")
+        for i in range(1, len(parts) + 1):
+            modules.setdefault(".".join(parts[:i]), mock.MagicMock())
+    # "from package import module" reads the package attribute
+    for name, module in modules.items():
+        package, _, attr = name.rpartition(".")
+        if package:
+            setattr(modules[package], attr, module)
+    return modules
+
+
+def _engine_spec_modules():
+    """Stub Superset's engine spec module with a Trino-like spec.
+
+    Returns:
+        Stub of the module and its packages, by name.
+    """
+
+    class BaseEngineSpec:
+        """BaseEngineSpec stand-in running queries on the cursor."""
+
+        engine = "trino"
+
+        @classmethod
+        def execute(cls, cursor, query, **kwargs):
+            """Run the query.
+
+            Args:
+                cursor: DBAPI cursor.
+                query: SQL to run.
+                kwargs: ignored.
+            """
+            cursor.execute(query)
+
+    modules = _stub_modules("superset.db_engine_specs.base")
+    modules["superset.db_engine_specs.base"].BaseEngineSpec = BaseEngineSpec
+    return modules
+
+
+class _RecordingTracer:
+    """Tracer stand-in exporting finished spans to a list.
+
+    Attrs:
+        finished_spans: name, kind and attributes of each finished span.
+    """
+
+    def __init__(self):
+        """Initialise with no spans."""
+        self.finished_spans = []
+
+    @contextlib.contextmanager
+    def start_as_current_span(self, name, kind=None, attributes=None):
+        """Record a span once its block exits.
+
+        Args:
+            name: span name.
+            kind: span kind.
+            attributes: span attributes.
+
+        Yields:
+            None.
+        """
+        yield
+        self.finished_spans.append((name, kind, attributes))
+
+
+class TestConfigureTracing(unittest.TestCase):
+    """The tracer provider follows the configured sample rate."""
+
+    def setUp(self):
+        """Stub out the OpenTelemetry SDK, exporter and instrumentors."""
+        self.modules = _stub_modules(
+            "opentelemetry.trace",
+            "opentelemetry.exporter.otlp.proto.http.trace_exporter",
+            "opentelemetry.instrumentation.celery",
+            "opentelemetry.instrumentation.redis",
+            "opentelemetry.instrumentation.sqlalchemy",
+            "opentelemetry.sdk.resources",
+            "opentelemetry.sdk.trace.export",
+            "opentelemetry.sdk.trace.sampling",
+        )
+        patcher = mock.patch.dict(sys.modules, self.modules)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_parent_based_ratio_sampler(self):
+        """Root spans are sampled at the rate; children follow parents."""
+        tracing.configure_tracing(
+            "http://otel-collector:4318", 0.25, "superset", "superset/0"
+        )
+
+        sampling = self.modules["opentelemetry.sdk.trace.sampling"]
+        sampling.TraceIdRatioBased.assert_called_once_with(0.25)
+        sampling.ParentBased.assert_called_once_with(
+            sampling.TraceIdRatioBased.return_value
+        )
+        sdk_trace = self.modules["opentelemetry.sdk.trace"]
+        self.assertIs(
+            sdk_trace.TracerProvider.call_args.kwargs["sampler"],
+            sampling.ParentBased.return_value,
+        )
+        otel_trace = self.modules["opentelemetry.trace"]
+        otel_trace.set_tracer_provider.assert_called_once_with(
+            sdk_trace.TracerProvider.return_value
+        )
+
+    def test_spans_exported_to_trace_receiver(self):
+        """Spans are batched to the collector's trace receiver."""
+        tracing.configure_tracing(
+            "http://otel-collector:4318", 0.25, "superset", "superset/0"
+        )
+
+        otlp = self.modules[
+            "opentelemetry.exporter.otlp.proto.http.trace_exporter"
+        ]
+        otlp.OTLPSpanExporter.assert_called_once_with(
+            endpoint="http://otel-collector:4318/v1/traces"
+        )
+        export = self.modules["opentelemetry.sdk.trace.export"]
+        export.BatchSpanProcessor.assert_called_once_with(
+            otlp.OTLPSpanExporter.return_value
+        )
+
+
+class TestInstrumentApp(unittest.TestCase):
+    """Flask requests and analytics queries are traced."""
+
+    def setUp(self):
+        """Stub out OpenTelemetry and Superset's engine specs."""
+        self.modules = _engine_spec_modules()
+        self.modules.update(
+            _stub_modules(
+                "opentelemetry.trace", "opentelemetry.instrumentation.flask"
+            )
+        )
+        self.tracer = _RecordingTracer()
+        self.modules[
+            "opentelemetry.trace"
+        ].get_tracer.return_value = self.tracer
+        patcher = mock.patch.dict(sys.modules, self.modules)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.spec = self.modules[
+            "superset.db_engine_specs.base"
+        ].BaseEngineSpec
+
+    def test_flask_app_instrumented(self):
+        """Requests are traced, except health checks and static files."""
+        app = mock.Mock()
+        tracing.instrument_app(app)
+
+        flask = self.modules["opentelemetry.instrumentation.flask"]
+        instrumentor = flask.FlaskInstrumentor.return_value
+        instrumentor.instrument_app.assert_called_once_with(
+            app, excluded_urls=tracing.EXCLUDED_URLS
+        )
+
+    def test_engine_spec_execute_wrapped(self):
+        """Analytics queries still run, inside a client span."""
+        execute = self.spec.execute.__func__
+        tracing.instrument_app(mock.Mock())
+        cursor = mock.Mock()
+
+        self.spec.execute(cursor, "SELECT 1", database=None)
+
+        self.assertIs(self.spec.execute.__func__.__wrapped__, execute)
+        cursor.execute.assert_called_once_with("SELECT 1")
+        self.assertEqual(
+            self.tracer.finished_spans,
+            [
+                (
+                    "trino execute",
+                    self.modules["opentelemetry.trace"].SpanKind.CLIENT,
+                    {"db.system": "trino", "db.statement": "SELECT 1"},
+                )
+            ],
+        )
+
+
+class _CollectorHandler(BaseHTTPRequestHandler):
+    """OTLP/HTTP trace receiver keeping the spans it is sent."""
+
+    def do_POST(self):  # noqa: N802
+        """Decode an export request and record its spans."""
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        request = ExportTraceServiceRequest.FromString(body)
+        self.server.requests.append((self.path, request))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-protobuf")
+        self.end_headers()
+
+    def log_message(self, *args):
+        """Keep the test output quiet.
+
+        Args:
+            args: ignored.
+        """
+
+
+class TestSpanExport(unittest.TestCase):
+    """Spans reach a collector through the configured pipeline."""
+
+    def setUp(self):
+        """Start a local OTLP/HTTP collector."""
+        self.collector = ThreadingHTTPServer(
+            ("127.0.0.1", 0), _CollectorHandler
+        )
+        self.collector.requests = []
+        thread = threading.Thread(
+            target=self.collector.serve_forever, daemon=True
+        )
+        thread.start()
+        self.addCleanup(self.collector.server_close)
+        self.addCleanup(self.collector.shutdown)
+
+    def _configure(self, modules):
+        """Configure tracing against the collector, without instrumentors.
+
+        The tracer provider is returned rather than installed, as the
+        global one can only be set once per process.
+
+        Args:
+            modules: stub modules to import from.
+
+        Returns:
+            The tracer provider.
+        """
+        instrumentors = {
+            name: mock.MagicMock()
+            for name in (
+                "opentelemetry.instrumentation",
+                "opentelemetry.instrumentation.celery",
+                "opentelemetry.instrumentation.redis",
+                "opentelemetry.instrumentation.sqlalchemy",
+            )
+        }
+        port = self.collector.server_address[1]
+        with mock.patch.dict(sys.modules, {**modules, **instrumentors}):
+            with mock.patch.object(trace, "set_tracer_provider") as install:
+                tracing.configure_tracing(
+                    f"http://127.0.0.1:{port}", 1.0, "superset", "superset/0"
+                )
+        provider = install.call_args.args[0]
+        self.addCleanup(provider.shutdown)
+        return provider
+
+    def test_query_span_exported(self):
+        """An analytics query span is posted to the trace receiver."""
+        modules = _engine_spec_modules()
+        spec = modules["superset.db_engine_specs.base"].BaseEngineSpec
+        provider = self._configure(modules)
+        with mock.patch.dict(sys.modules, modules):
+            tracing._trace_analytics_execution(provider.get_tracer(__name__))
+
+        spec.execute(mock.Mock(), "SELECT 1")
+        self.assertTrue(provider.force_flush())
+
+        self.assertEqual(len(self.collector.requests), 1)
+        path, request = self.collector.requests[0]
+        self.assertEqual(path, "/v1/traces")
+        (resource_spans,) = request.resource_spans
+        resource = {
+            attribute.key: attribute.value.string_value
+            for attribute in resource_spans.resource.attributes
+        }
+        self.assertEqual(resource["service.name"], "superset")
+        self.assertEqual(resource["service.instance.id"], "superset/0")
+        (span,) = resource_spans.scope_spans[0].spans
+        self.assertEqual(span.name, "trino execute")
+        attributes = {
+            attribute.key: attribute.value.string_value
+            for attribute in span.attributes
+        }
+        self.assertEqual(attributes["db.statement"], "SELECT 1")
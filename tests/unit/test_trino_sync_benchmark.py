@@ -0,0 +1,145 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Sync-scale benchmarks of the Trino catalog sync.
+
+Runs ``sync_databases`` end to end against the local Superset stand-in
+for growing catalog counts, measuring HTTP requests, body bytes and wall
+time. The request and byte bounds catch regressions such as per-catalog
+lookups creeping back into the sync path; wall time depends on the
+machine, so it is only logged.
+"""
+
+# pylint:disable=protected-access
+
+import logging
+import math
+import time
+from unittest import TestCase, mock
+
+from charms.trino_k8s.v0.trino_catalog import TrinoCatalog
+from ops.testing import Harness
+
+from charm import SupersetK8SCharm
+from superset_api import MAX_PAGE_SIZE, SupersetApiClient
+from tests.unit.superset_stub import SupersetStub
+from trino_database import TrinoDatabaseSettings
+
+logger = logging.getLogger(__name__)
+
+CATALOG_COUNTS = (10, 100, 1000)
+# Login, CSRF token, role lookup, role permissions GET and POST
+FIXED_REQUESTS = 5
+# Create payload plus response, with headroom for payload growth
+BYTES_PER_CATALOG = 2000
+
+
+class TestSyncScale(TestCase):
+    """A sync costs one request per change plus a bounded overhead."""
+
+    def setUp(self):
+        """Set up a leader charm with the Juju-facing inputs stubbed."""
+        self.harness = Harness(SupersetK8SCharm)
+        self.addCleanup(self.harness.cleanup)
+        self.harness.set_leader(True)
+        self.harness.update_config({"superset-secret-key": "example-pass"})
+        self.harness.begin()
+        self.handler = self.harness.charm.trino_catalog_handler
+
+        for name, value in (
+            ("_should_sync", True),
+            ("_load_api_tokens", None),
+            ("_store_api_tokens", None),
+        ):
+            patcher = mock.patch.object(self.handler, name, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        # Keep per-catalog INFO logs out of the measurement
+        logging.disable(logging.INFO)
+        self.addCleanup(logging.disable, logging.NOTSET)
+
+    def _run(self, stub, catalogs, **kwargs):
+        """Sync the catalogs into the stand-in.
+
+        Args:
+            stub: Running Superset stand-in.
+            catalogs: Catalog names on the relation.
+            kwargs: Arguments to ``sync_databases``.
+
+        Returns:
+            Tuple of (requests, bytes sent and received, seconds).
+        """
+        sync_config = {
+            "catalogs": [
+                TrinoCatalog(name=c, connector="x") for c in catalogs
+            ],
+            "trino_url": "trino:443",
+            "username": "user",
+            "password": "pass",
+            "use_ssl": True,
+            "settings": TrinoDatabaseSettings(),
+        }
+        stub.reset_counters()
+        with mock.patch.object(
+            self.handler, "_prepare_sync_config", return_value=sync_config
+        ), mock.patch.object(
+            self.handler,
+            "_create_api_client",
+            return_value=SupersetApiClient(
+                "admin", "admin", base_url=stub.url
+            ),
+        ), mock.patch.object(
+            self.harness.charm.database,
+            "get_db_uri",
+            return_value=stub.metadata_db_uri,
+        ):
+            start = time.perf_counter()
+            self.handler.sync_databases(**kwargs)
+            elapsed = time.perf_counter() - start
+        return stub.requests, stub.bytes_in + stub.bytes_out, elapsed
+
+    def test_sync_scale(self):
+        """Requests and bytes grow linearly with created catalogs."""
+        for count in CATALOG_COUNTS:
+            with self.subTest(catalogs=count), SupersetStub() as stub:
+                catalogs = [f"catalog_{i:04d}" for i in range(count)]
+
+                requests, size, elapsed = self._run(stub, catalogs)
+                logging.disable(logging.NOTSET)
+                logger.info(
+                    "Initial sync of %d catalogs: %d requests, %d bytes, "
+                    "%.2fs; %s",
+                    count,
+                    requests,
+                    size,
+                    elapsed,
+                    stub.endpoints,
+                )
+                logging.disable(logging.INFO)
+
+                # all_database_access also matches the index filter
+                index_pages = math.ceil((count + 1) / MAX_PAGE_SIZE)
+                self.assertLessEqual(
+                    requests, count + FIXED_REQUESTS + index_pages
+                )
+                self.assertLess(size, 10_000 + count * BYTES_PER_CATALOG)
+                self.assertEqual(len(stub.role_permissions[2]), count)
+
+                # Converged state costs no Superset requests at all
+                requests, _, _ = self._run(stub, catalogs, reconcile=True)
+                self.assertEqual(requests, 0)
+
+    def test_credential_rotation_scale(self):
+        """A forced rotation sends exactly one update per catalog."""
+        with SupersetStub() as stub:
+            catalogs = [f"catalog_{i:04d}" for i in range(100)]
+            self._run(stub, catalogs)
+
+            requests, _, _ = self._run(
+                stub, catalogs, force_update_credentials=True
+            )
+
+            self.assertEqual(stub.endpoints["PUT /api/v1/database/<id>"], 100)
+            # Plus login and CSRF token for the fresh client
+            self.assertEqual(requests, 102)
@@ -0,0 +1,135 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Unit tests for charm helper utilities."""
+
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+from unittest import TestCase, mock
+
+import yaml
+from ops.testing import Harness
+
+from charm import SupersetK8SCharm
+from utils import (
+    MetadataDatabase,
+    query_metadata_database,
+    render_slo_alert_rules,
+    write_alert_rules,
+)
+
+SLO_THRESHOLDS = {
+    "slo-chart-data-latency": 20,
+    "slo-dashboard-load-latency": 5,
+    "slo-sqllab-latency": 0,
+    "slo-cache-hit-ratio": 0.5,
+    "slo-celery-backlog-growth": 50,
+    "slo-error-budget": 0.001,
+}
+
+
+class TestMetadataDatabase(TestCase):
+    """Metadata queries share one pooled engine per URI."""
+
+    def setUp(self):
+        """Create a SQLite database with an ab_role table."""
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        path = Path(tmp) / "superset.db"
+        with sqlite3.connect(path) as conn:
+            conn.execute("CREATE TABLE ab_role (name TEXT)")
+            conn.execute("INSERT INTO ab_role VALUES ('Admin'), ('Public')")
+        self.uri = f"sqlite:///{path}"
+        self.db = MetadataDatabase()
+        self.addCleanup(self.db.dispose)
+
+    def test_engine_cached_and_pre_pinged(self):
+        """Queries reuse one engine whose pool pre-pings connections."""
+        engine = self.db.engine(self.uri)
+
+        self.assertEqual(
+            query_metadata_database(
+                self.uri, "SELECT name FROM ab_role;", self.db
+            ),
+            ["Admin", "Public"],
+        )
+        self.assertIs(self.db.engine(self.uri), engine)
+        self.assertTrue(engine.pool._pre_ping)
+        self.assertEqual(engine.pool.size(), 2)
+
+    def test_dispose_drops_engines(self):
+        """Disposing closes the pool and a later query gets a new engine."""
+        engine = self.db.engine(self.uri)
+        with mock.patch.object(engine, "dispose") as dispose:
+            self.db.dispose()
+        dispose.assert_called_once()
+        self.assertIsNot(self.db.engine(self.uri), engine)
+
+    def test_errors_return_empty(self):
+        """A failing query is logged and returns no values."""
+        with self.assertLogs("utils", "ERROR"):
+            self.assertEqual(
+                query_metadata_database(self.uri, "SELECT * FROM missing"),
+                [],
+            )
+
+    def test_disposed_at_commit(self):
+        """The charm disposes of its engines when the dispatch commits."""
+        harness = Harness(SupersetK8SCharm)
+        self.addCleanup(harness.cleanup)
+        harness.begin()
+        with mock.patch.object(
+            harness.charm.metadata_db, "dispose"
+        ) as dispose:
+            harness.framework.on.commit.emit()
+        dispose.assert_called_once()
+
+
+class TestSloAlertRules(TestCase):
+    """SLO alert rules are rendered with the configured thresholds."""
+
+    def test_thresholds_substituted(self):
+        """Thresholds fill rule expressions and annotations."""
+        rules = {
+            rule["alert"]: rule
+            for group in yaml.safe_load(
+                render_slo_alert_rules(SLO_THRESHOLDS)
+            )["groups"]
+            for rule in group["rules"]
+        }
+
+        chart_data = rules["SupersetChartDataLatencySlo"]
+        self.assertTrue(chart_data["expr"].endswith("> 20"))
+        self.assertIn(
+            "over 20 seconds", chart_data["annotations"]["description"]
+        )
+        self.assertIn("{{ $value }}", chart_data["annotations"]["description"])
+        self.assertNotIn("slo", chart_data)
+        self.assertIn(
+            "> 6 * 0.001", rules["SupersetErrorBudgetSlowBurn"]["expr"]
+        )
+        # A threshold of 0 disables the rule
+        self.assertNotIn("SupersetSqlLabLatencySlo", rules)
+        self.assertEqual(len(rules), 6)
+
+    def test_rules_gathered_outside_charm(self):
+        """Static and SLO rules are written to the temporary directory."""
+        with tempfile.TemporaryDirectory() as tmp, mock.patch(
+            "tempfile.gettempdir", return_value=tmp
+        ):
+            rules_dir = Path(write_alert_rules(SLO_THRESHOLDS))
+            self.assertTrue(rules_dir.is_relative_to(tmp))
+            self.assertEqual(
+                sorted(path.name for path in rules_dir.iterdir()),
+                ["slo_alert_rules.yaml", "superset_rules.yaml"],
+            )
+            slo_rules = (rules_dir / "slo_alert_rules.yaml").read_text()
+            self.assertIn("> 20", slo_rules)
+
+            # Invalid configurations keep the previous SLO rules
+            write_alert_rules(None)
+            self.assertEqual(
+                (rules_dir / "slo_alert_rules.yaml").read_text(), slo_rules
+            )